@@ -0,0 +1,28 @@
+"""add trips version
+
+Revision ID: 0b0945639fc3
+Revises: 473655be755b
+Create Date: 2026-10-19 13:04:50.088776
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b0945639fc3'
+down_revision: Union[str, Sequence[str], None] = '473655be755b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('trips', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trips', 'version')
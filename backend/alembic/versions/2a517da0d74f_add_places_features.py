@@ -0,0 +1,74 @@
+"""add places features
+
+Revision ID: 2a517da0d74f
+Revises: 79bfafaf8548
+Create Date: 2026-10-19 12:56:09.466284
+
+"""
+from typing import Sequence, Union
+
+from array import array
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a517da0d74f'
+down_revision: Union[str, Sequence[str], None] = '79bfafaf8548'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# frozen copy of the place feature layout in app.services.scoring as of this
+# revision, so replaying the migration never depends on the current app code
+_GROUPS = {
+    "food": ["restaurant", "cafe", "food", "bakery", "meal"],
+    "shopping": ["mall", "shopping", "store", "market"],
+    "nightlife": ["bar", "night_club", "nightclub", "pub", "lounge"],
+    "sights": ["tour", "attract", "point_of_interest", "landmark"],
+    "culture": ["museum", "art_gallery", "gallery", "temple", "church", "mosque", "historic", "monument"],
+    "nature": ["park", "garden", "beach", "natural_feature", "zoo", "lake"],
+}
+_STRENUOUS = ["hiking", "trail", "natural_feature", "mountain", "trek", "climbing"]
+_INDEX = {name: i for i, name in enumerate(
+    list(_GROUPS) + ["rating", "price_low", "price_mid", "price_high", "strenuous"])}
+
+
+def _features(category, rating, price_level) -> bytes:
+    vec = [0.0] * len(_INDEX)
+    cat = (category or "").lower()
+    for group, patterns in _GROUPS.items():
+        if any(p in cat for p in patterns):
+            vec[_INDEX[group]] = 1.0
+    if rating is not None:
+        vec[_INDEX["rating"]] = min(rating / (10.0 if rating > 5 else 5.0), 1.0)
+    if price_level is not None:
+        band = "price_low" if price_level <= 1 else "price_mid" if price_level == 2 else "price_high"
+        vec[_INDEX[band]] = 1.0
+    if any(p in cat for p in _STRENUOUS):
+        vec[_INDEX["strenuous"]] = 1.0
+    return array("f", vec).tobytes()  # float32
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('places', sa.Column('features', sa.LargeBinary(), nullable=True))
+
+    # backfill scoring vectors for existing rows
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, category, rating, price_level FROM places")).fetchall()
+    update = sa.text("UPDATE places SET features = :f WHERE id = :id").bindparams(sa.bindparam("f", type_=sa.LargeBinary))
+    batch = []
+    for pid, category, rating, price_level in rows:
+        batch.append({"id": pid, "f": _features(category, rating, price_level)})
+        if len(batch) >= 5000:
+            conn.execute(update, batch)
+            batch = []
+    if batch:
+        conn.execute(update, batch)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('places', 'features')
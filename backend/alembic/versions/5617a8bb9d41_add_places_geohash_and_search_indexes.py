@@ -0,0 +1,85 @@
+"""add places geohash and search indexes
+
+Revision ID: 5617a8bb9d41
+Revises: cd60f6c97a68
+Create Date: 2026-10-19 12:49:25.334603
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5617a8bb9d41'
+down_revision: Union[str, Sequence[str], None] = 'cd60f6c97a68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# frozen copy of app.services.geo.geohash_encode as of this revision (precision 9),
+# so replaying the migration never depends on the current app code
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _geohash(lat: float, lon: float, precision: int = 9) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out = []
+    bits = ch = 0
+    even = True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch, lon_lo = (ch << 1) | 1, mid
+            else:
+                ch, lon_hi = ch << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch, lat_lo = (ch << 1) | 1, mid
+            else:
+                ch, lat_hi = ch << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits = ch = 0
+    return "".join(out)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('places', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_places_geohash', 'places', ['geohash'], unique=False,
+                    postgresql_ops={'geohash': 'varchar_pattern_ops'})
+
+    # backfill geohash for existing rows
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, latitude, longitude FROM places WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+    batch = []
+    for pid, lat, lon in rows:
+        batch.append({"id": pid, "gh": _geohash(lat, lon)})
+        if len(batch) >= 5000:
+            conn.execute(sa.text("UPDATE places SET geohash = :gh WHERE id = :id"), batch)
+            batch = []
+    if batch:
+        conn.execute(sa.text("UPDATE places SET geohash = :gh WHERE id = :id"), batch)
+
+    # full-text index on name + category, must match SEARCH_TSVECTOR in services/places/local.py
+    op.execute(
+        "CREATE INDEX ix_places_search_tsv ON places USING gin "
+        "(to_tsvector('english', coalesce(name, '') || ' ' || coalesce(category, '')))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_places_search_tsv', table_name='places')
+    op.drop_index('ix_places_geohash', table_name='places')
+    op.drop_column('places', 'geohash')
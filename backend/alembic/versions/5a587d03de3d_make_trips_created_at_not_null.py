@@ -0,0 +1,36 @@
+"""make trips created_at not null
+
+Revision ID: 5a587d03de3d
+Revises: 789d66ca818e
+Create Date: 2026-10-19 13:29:53.729258
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a587d03de3d'
+down_revision: Union[str, Sequence[str], None] = '789d66ca818e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # legacy / raw-SQL rows: best known creation time, else the migration time
+    op.execute("UPDATE trips SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('trips', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=sa.text('now()'),
+               nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('trips', 'created_at',
+               existing_type=sa.DateTime(),
+               server_default=None,
+               nullable=True)
@@ -0,0 +1,32 @@
+"""rate limits
+
+Revision ID: 789d66ca818e
+Revises: a97612c4bdb2
+Create Date: 2026-10-19 13:17:10.107348
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '789d66ca818e'
+down_revision: Union[str, Sequence[str], None] = 'a97612c4bdb2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limits',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('tat', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limits')
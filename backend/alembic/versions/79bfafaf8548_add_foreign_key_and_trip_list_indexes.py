@@ -0,0 +1,38 @@
+"""add foreign key and trip list indexes
+
+Revision ID: 79bfafaf8548
+Revises: faae21664666
+Create Date: 2026-10-19 12:53:26.779814
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '79bfafaf8548'
+down_revision: Union[str, Sequence[str], None] = 'faae21664666'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_trips_user_created_id', 'trips', ['user_id', 'created_at', 'id'], unique=False,
+                    postgresql_include=['title', 'start_date', 'end_date', 'budget'])
+    op.create_index(op.f('ix_trip_segments_trip_id'), 'trip_segments', ['trip_id'], unique=False)
+    op.create_index(op.f('ix_trip_days_segment_id'), 'trip_days', ['segment_id'], unique=False)
+    op.create_index(op.f('ix_activities_day_id'), 'activities', ['day_id'], unique=False)
+    op.create_index(op.f('ix_activities_place_id'), 'activities', ['place_id'], unique=False)
+    op.create_index(op.f('ix_transport_options_segment_id'), 'transport_options', ['segment_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transport_options_segment_id'), table_name='transport_options')
+    op.drop_index(op.f('ix_activities_place_id'), table_name='activities')
+    op.drop_index(op.f('ix_activities_day_id'), table_name='activities')
+    op.drop_index(op.f('ix_trip_days_segment_id'), table_name='trip_days')
+    op.drop_index(op.f('ix_trip_segments_trip_id'), table_name='trip_segments')
+    op.drop_index('ix_trips_user_created_id', table_name='trips')
@@ -0,0 +1,53 @@
+"""add place raws
+
+Revision ID: 7c295a75781e
+Revises: e51770be6060
+Create Date: 2026-10-19 13:08:31.857197
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c295a75781e'
+down_revision: Union[str, Sequence[str], None] = 'e51770be6060'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('raw_dictionaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('codec', sa.String(length=16), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_raw_dictionaries_id'), 'raw_dictionaries', ['id'], unique=False)
+    op.create_index(op.f('ix_raw_dictionaries_source'), 'raw_dictionaries', ['source'], unique=False)
+    op.create_table('place_raws',
+    sa.Column('place_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('codec', sa.String(length=16), nullable=False),
+    sa.Column('dictionary_id', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('raw_size', sa.Integer(), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['dictionary_id'], ['raw_dictionaries.id'], ),
+    sa.ForeignKeyConstraint(['place_id'], ['places.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('place_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('place_raws')
+    op.drop_index(op.f('ix_raw_dictionaries_source'), table_name='raw_dictionaries')
+    op.drop_index(op.f('ix_raw_dictionaries_id'), table_name='raw_dictionaries')
+    op.drop_table('raw_dictionaries')
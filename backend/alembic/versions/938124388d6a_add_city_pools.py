@@ -0,0 +1,38 @@
+"""add city pools
+
+Revision ID: 938124388d6a
+Revises: bddb5dab4974
+Create Date: 2026-10-19 12:46:30.379521
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '938124388d6a'
+down_revision: Union[str, Sequence[str], None] = 'bddb5dab4974'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('city_pools',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=256), nullable=False),
+    sa.Column('place_count', sa.Integer(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('city')
+    )
+    op.create_index(op.f('ix_city_pools_id'), 'city_pools', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_city_pools_id'), table_name='city_pools')
+    op.drop_table('city_pools')
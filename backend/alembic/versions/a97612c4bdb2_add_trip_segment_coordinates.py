@@ -0,0 +1,32 @@
+"""add trip segment coordinates
+
+Revision ID: a97612c4bdb2
+Revises: 7c295a75781e
+Create Date: 2026-10-19 13:13:48.550667
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a97612c4bdb2'
+down_revision: Union[str, Sequence[str], None] = '7c295a75781e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('trip_segments', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('trip_segments', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('trip_segments', sa.Column('geoname_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trip_segments', 'geoname_id')
+    op.drop_column('trip_segments', 'longitude')
+    op.drop_column('trip_segments', 'latitude')
@@ -0,0 +1,27 @@
+"""add places source external_id index
+
+Revision ID: bddb5dab4974
+Revises: 3a762212c75f
+Create Date: 2026-10-19 12:45:29.902237
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bddb5dab4974'
+down_revision: Union[str, Sequence[str], None] = '3a762212c75f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_places_source_external_id', 'places', ['source', 'external_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_places_source_external_id', table_name='places')
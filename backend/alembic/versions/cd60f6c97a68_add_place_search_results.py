@@ -0,0 +1,33 @@
+"""add place search results
+
+Revision ID: cd60f6c97a68
+Revises: e908b4b34850
+Create Date: 2026-10-19 12:48:43.174583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cd60f6c97a68'
+down_revision: Union[str, Sequence[str], None] = 'e908b4b34850'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('place_search_results',
+    sa.Column('key', sa.String(length=40), nullable=False),
+    sa.Column('place_ids', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('place_search_results')
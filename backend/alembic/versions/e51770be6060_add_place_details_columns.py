@@ -0,0 +1,40 @@
+"""add place details columns
+
+Revision ID: e51770be6060
+Revises: 0b0945639fc3
+Create Date: 2026-10-19 13:06:47.717761
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e51770be6060'
+down_revision: Union[str, Sequence[str], None] = '0b0945639fc3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('places', sa.Column('user_ratings_total', sa.Integer(), nullable=True))
+    op.add_column('places', sa.Column('opening_hours', sa.JSON(), nullable=True))
+    op.add_column('places', sa.Column('photos', sa.JSON(), nullable=True))
+    op.add_column('places', sa.Column('website', sa.String(length=512), nullable=True))
+    op.add_column('places', sa.Column('phone', sa.String(length=64), nullable=True))
+    op.add_column('places', sa.Column('details_updated_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_places_details_updated_at'), 'places', ['details_updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_places_details_updated_at'), table_name='places')
+    op.drop_column('places', 'details_updated_at')
+    op.drop_column('places', 'phone')
+    op.drop_column('places', 'website')
+    op.drop_column('places', 'photos')
+    op.drop_column('places', 'opening_hours')
+    op.drop_column('places', 'user_ratings_total')
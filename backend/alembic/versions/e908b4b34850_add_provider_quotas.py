@@ -0,0 +1,37 @@
+"""add provider quotas
+
+Revision ID: e908b4b34850
+Revises: 938124388d6a
+Create Date: 2026-10-19 12:47:36.321675
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e908b4b34850'
+down_revision: Union[str, Sequence[str], None] = '938124388d6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('provider_quotas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(length=64), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider', 'day', name='uq_provider_quotas_provider_day')
+    )
+    op.create_index(op.f('ix_provider_quotas_id'), 'provider_quotas', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_provider_quotas_id'), table_name='provider_quotas')
+    op.drop_table('provider_quotas')
@@ -0,0 +1,35 @@
+"""add travel costs
+
+Revision ID: faae21664666
+Revises: 5617a8bb9d41
+Create Date: 2026-10-19 12:52:00.368051
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'faae21664666'
+down_revision: Union[str, Sequence[str], None] = '5617a8bb9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('travel_costs',
+    sa.Column('from_place_id', sa.Integer(), nullable=False),
+    sa.Column('to_place_id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(length=16), nullable=False),
+    sa.Column('distance_km', sa.Float(), nullable=False),
+    sa.Column('duration_min', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('from_place_id', 'to_place_id', 'mode')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('travel_costs')
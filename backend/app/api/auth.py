@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.db import SessionLocal
+from app.api.deps import get_db
 from app.schemas.user import UserCreate, UserOut
 from app.schemas.auth import Token
 from app.crud.user import get_user_by_email, create_user
@@ -9,13 +9,6 @@ from app.services.auth import verify_password, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register", response_model=UserOut)
 def register(user_in: UserCreate, db: Session = Depends(get_db)):
     user = get_user_by_email(db, user_in.email)
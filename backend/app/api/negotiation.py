@@ -0,0 +1,197 @@
+# app/api/negotiation.py
+"""
+Response content negotiation.
+
+Body format: clients that send `Accept: application/msgpack` get MessagePack
+instead of JSON. NegotiatedResponse is the app's default response class, so
+every route that returns plain data follows Accept without changes. Routes
+that build their own Response from a pydantic model use `model_response`.
+Streams (NDJSON, exports) and error responses stay in their own format.
+
+Compression: bodies of at least COMPRESS_MIN_SIZE bytes are compressed with
+brotli when the client accepts it and the `brotli` package is installed, else
+with gzip. Streamed bodies are compressed chunk by chunk and flushed after each
+chunk, so NDJSON lines still reach the client as they are produced.
+Compression turns strong ETags into weak ones, since the bytes differ from
+the identity encoding.
+"""
+import os
+import zlib
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+from app.services.serialization import msgpack_dumps
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MSGPACK = "application/msgpack"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # 4-5: near gzip speed, smaller output
+COMPRESSIBLE = (b"application/json", b"application/msgpack", b"application/x-ndjson", b"application/gpx+xml",
+                b"application/xml", b"text/")
+
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def wants_msgpack() -> bool:
+    return _wants_msgpack.get()
+
+
+class NegotiatedResponse(ORJSONResponse):
+    """JSON via orjson, or MessagePack when the request's Accept asks for it."""
+
+    def __init__(self, content=None, status_code: int = 200, headers=None, **kw):
+        super().__init__(content, status_code=status_code, headers={"Vary": "Accept", **(headers or {})}, **kw)
+
+    def render(self, content) -> bytes:
+        if _wants_msgpack.get():
+            self.media_type = MSGPACK
+            return msgpack_dumps(content)
+        return super().render(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Encode a pydantic model in the negotiated format, without going through dicts for JSON."""
+    if _wants_msgpack.get():
+        body, media_type = msgpack_dumps(model.model_dump(mode="json")), MSGPACK
+    else:
+        body, media_type = model.model_dump_json(), "application/json"
+    return Response(body, status_code=status_code, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _accepted(header: bytes):
+    """Lowercased values of an Accept-style header, minus those with q=0."""
+    for item in header.lower().split(b","):
+        value, _, params = item.partition(b";")
+        q = params.replace(b" ", b"")
+        if q.startswith(b"q=") and q[2:].strip(b"0.") == b"":
+            continue
+        yield value.strip()
+
+
+def _accepts_msgpack(accept: bytes) -> bool:
+    return any(v in (b"application/msgpack", b"application/x-msgpack") for v in _accepted(accept))
+
+
+def _pick_encoding(accept_encoding: bytes) -> Optional[str]:
+    accepted = set(_accepted(accept_encoding))
+    if brotli is not None and b"br" in accepted:
+        return "br"
+    if b"gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so the client can decode everything sent so far."""
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush()
+
+
+class NegotiationMiddleware:
+    def __init__(self, app, min_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = accept_encoding = b""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value
+            elif name == b"accept-encoding":
+                accept_encoding = value
+        token = _wants_msgpack.set(_accepts_msgpack(accept)) if accept else None
+        try:
+            encoding = _pick_encoding(accept_encoding) if accept_encoding else None
+            if encoding is None:
+                return await self.app(scope, receive, send)
+            await self.app(scope, receive, _CompressingSend(send, encoding, self.min_size))
+        finally:
+            if token is not None:
+                _wants_msgpack.reset(token)
+
+
+class _CompressingSend:
+    """Holds the response start until the first body chunk tells whether (and how) to compress."""
+
+    def __init__(self, send, encoding: str, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.min_size = min_size
+        self.start = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = message.get("headers", [])
+            content_type = b""
+            for name, value in headers:
+                if name == b"content-encoding":
+                    self.passthrough = True
+                elif name == b"content-type":
+                    content_type = value
+            if message["status"] < 200 or message["status"] in (204, 304) or not content_type.startswith(COMPRESSIBLE):
+                self.passthrough = True
+            if self.passthrough:
+                return await self.send(message)
+            self.start = message
+            return
+        if kind != "http.response.body" or self.passthrough:
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more and len(body) < self.min_size:
+                self.passthrough = True
+                await self.send(start)
+                return await self.send(message)
+            self.compressor = _Compressor(self.encoding)
+            body = self.compressor.finish(body) if not more else self.compressor.chunk(body)
+            await self.send(dict(start, headers=self._headers(start["headers"], None if more else len(body))))
+            return await self.send({"type": "http.response.body", "body": body, "more_body": more})
+        body = self.compressor.chunk(body) if more else self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more})
+
+    def _headers(self, headers, length: Optional[int]):
+        out, vary = [], None
+        for name, value in headers:
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            if name == b"vary":
+                vary = value
+                continue
+            out.append((name, value))
+        out.append((b"content-encoding", self.encoding.encode()))
+        out.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        if length is not None:
+            out.append((b"content-length", str(length).encode()))
+        return out
@@ -1,8 +1,13 @@
 # app/api/places.py
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from app.services.places.service import search_and_maybe_cache
-from app.api.deps import get_db  # if you need db usage in future
+from app.services.places.service import search_and_maybe_cache, iter_search_and_maybe_cache, search_batch
+from app.services.places.governance import provider_stats
+from app.services.serialization import ndjson_lines
+from app.api.deps import get_current_user
+from app.api.rate_limit import charge
+from app.schemas.place import PlaceSearchBatch
 
 router = APIRouter(prefix="/places", tags=["places"])
 
@@ -13,13 +18,66 @@ def places_search(
     lon: Optional[float] = Query(None),
     radius: int = Query(5000, description="radius in meters"),
     limit: int = Query(20, description="max number of results"),
-    cache: bool = Query(True, description="whether to cache results in DB")
+    cache: bool = Query(True, description="whether to cache results in DB"),
+    stream: bool = Query(False, description="stream results as NDJSON as each provider returns"),
+    local: bool = Query(False, description="answer from cached places near lat/lon when there are enough of them (results also carry distance_km)")
 ):
     ll = None
     if lat is not None and lon is not None:
         ll = f"{lat},{lon}"
+    if stream:
+        batches = iter_search_and_maybe_cache(query=q, ll=ll, radius=radius, limit=limit, use_cache=cache, local_first=local)
+        return StreamingResponse(ndjson_lines(_flatten(batches)), media_type="application/x-ndjson")
     try:
-        res = search_and_maybe_cache(query=q, ll=ll, radius=radius, limit=limit, use_cache=cache)
+        res = search_and_maybe_cache(query=q, ll=ll, radius=radius, limit=limit, use_cache=cache, local_first=local)
         return {"count": len(res), "results": res}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search/batch")
+def places_search_batch(batch: PlaceSearchBatch, request: Request):
+    """Several searches sharing one lat/lon and radius; results come back per query, in request order."""
+    # each query counts against the places-search limit, like a separate request
+    charge(request, len(batch.queries) - 1)
+    ll = None
+    if batch.lat is not None and batch.lon is not None:
+        ll = f"{batch.lat},{batch.lon}"
+    queries = [(sub.q, sub.limit or batch.limit) for sub in batch.queries]
+    try:
+        per_query = search_batch(queries, ll=ll, radius=batch.radius, use_cache=batch.cache, local_first=batch.local)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "count": sum(len(res) for res in per_query),
+        "results": [{"q": q, "count": len(res), "results": res} for (q, _), res in zip(queries, per_query)],
+    }
+
+
+@router.get("/cities/autocomplete")
+def cities_autocomplete(
+    q: str = Query(..., min_length=1, description="start of a city name, e.g. 'san fr'"),
+    country: Optional[str] = Query(None, description="country name or ISO code to restrict to"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Cities from the offline gazetteer, most populous first."""
+    from app.services.gazetteer import get_gazetteer
+    gaz = get_gazetteer()
+    if gaz is None:
+        raise HTTPException(status_code=503, detail="City gazetteer is not configured")
+    return {"results": gaz.autocomplete(q, country=country, limit=limit)}
+
+
+@router.get("/providers/stats")
+def places_provider_stats(current_user=Depends(get_current_user)):
+    """Per-provider call counts, failures, and calls saved by short-circuiting."""
+    return provider_stats()
+
+
+def _flatten(batches):
+    try:
+        for batch in batches:
+            yield from batch
+    except Exception as e:
+        # headers are already sent, so report the failure as the last line
+        yield {"error": str(e)}
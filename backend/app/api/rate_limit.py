@@ -0,0 +1,144 @@
+# app/api/rate_limit.py
+"""
+ASGI middleware applying the policies of services/rate_limit.py.
+
+Requests whose method and path match no policy pass straight through (one
+dict lookup and a few regex matches). A matched request costs one store
+update (in a worker thread for stores that do I/O), plus one JWT decode the
+first time a token is seen. Limited requests get a 429 with Retry-After.
+Allowed ones get RateLimit-Limit, RateLimit-Remaining and RateLimit-Reset
+headers. Endpoints whose requests cost more than one unit (batches) charge
+the rest with `charge` once they know the size.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import anyio
+import orjson
+from fastapi import HTTPException, Request
+
+from app.services.auth import decode_token
+from app.services.rate_limit import RateLimiter, TRUST_PROXY, get_limiter
+
+TOKEN_CACHE_SIZE = 10000
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self._limiter = limiter
+        # token -> (sub, exp): decoding a JWT costs more than the limiter itself
+        self._subjects: "OrderedDict[bytes, Tuple[Optional[str], float]]" = OrderedDict()
+
+    @property
+    def limiter(self) -> RateLimiter:
+        if self._limiter is None:
+            self._limiter = get_limiter()
+        return self._limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        policy = self.limiter.match(scope["method"], scope["path"])
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        client = None
+        if policy.by == "user":
+            sub = self._subject(scope)
+            client = f"user:{sub}" if sub else None
+        if client is None:
+            client = f"ip:{self._ip(scope)}"
+        state = scope.setdefault("state", {})
+        state["rate_limit"] = (self.limiter, policy, client)
+        if getattr(self.limiter.store, "blocking", False):
+            decision = await anyio.to_thread.run_sync(self.limiter.hit, policy, client)
+        else:
+            decision = self.limiter.hit(policy, client)
+
+        if not decision.allowed:
+            retry_after = str(max(math.ceil(decision.retry_after), 1))
+            body = orjson.dumps({"detail": "Too many requests", "retry_after": int(retry_after)})
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", retry_after.encode()),
+                    (b"ratelimit-limit", str(decision.limit).encode()),
+                    (b"ratelimit-remaining", b"0"),
+                    (b"ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        state["rate_limit_decision"] = decision
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                # the endpoint may have charged more units since (see charge)
+                latest = state.get("rate_limit_decision", decision)
+                extra = [
+                    (b"ratelimit-limit", str(latest.limit).encode()),
+                    (b"ratelimit-remaining", str(latest.remaining).encode()),
+                    (b"ratelimit-reset", str(math.ceil(latest.reset_after)).encode()),
+                ]
+                message = dict(message, headers=list(message.get("headers", [])) + extra)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _subject(self, scope) -> Optional[str]:
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                if value[:7].lower() == b"bearer ":
+                    token = value[7:].strip()
+                break
+        if not token:
+            return None
+        now = time.time()
+        cached = self._subjects.get(token)
+        if cached is not None and cached[1] > now:
+            self._subjects.move_to_end(token)
+            return cached[0]
+        try:
+            payload = decode_token(token.decode("latin-1"))
+        except Exception:
+            # invalid or expired: limited by IP, the endpoint itself answers 401
+            return None
+        sub = payload.get("sub")
+        self._subjects[token] = (str(sub) if sub else None, float(payload.get("exp") or now + 60))
+        if len(self._subjects) > TOKEN_CACHE_SIZE:
+            self._subjects.popitem(last=False)
+        return self._subjects[token][0]
+
+    @staticmethod
+    def _ip(scope) -> str:
+        if TRUST_PROXY:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.split(b",")[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+
+def charge(request: Request, cost: int):
+    """
+    Charge `cost` more units to the policy the middleware matched for this
+    request (the middleware already took one). Raises a 429 when the client
+    is out of allowance; a no-op when rate limiting is off.
+    """
+    matched = request.scope.get("state", {}).get("rate_limit")
+    if matched is None or cost <= 0:
+        return
+    limiter, policy, client = matched
+    decision = limiter.hit(policy, client, cost=cost)
+    request.scope["state"]["rate_limit_decision"] = decision
+    if not decision.allowed:
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(max(math.ceil(decision.retry_after), 1))})
@@ -1,38 +1,180 @@
 # app/api/trips.py
 
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from datetime import datetime
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.api.deps import get_db, get_current_user
-from app.schemas.trip import TripCreate, PreferenceCreate
-from app.crud.trip import create_trip, get_trip, upsert_preferences
+from app.api.negotiation import NegotiatedResponse, model_response
+from app.schemas.trip import TripCreate, PreferenceCreate, TripSummary, TripPage, TripPatch, TripGraph, TripView
+from app.crud.trip import (
+    create_trip, get_trip, upsert_preferences, list_trips,
+    get_trip_view, get_trip_graph, patch_trip, TripPatchError, TripVersionConflict,
+)
 from app.models.trip import Place
-from app.services.itinerary import build_itinerary_for_trip
+from app.services.serialization import ndjson_lines
+from app.services import idempotency
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
 
+# -----------------------
+# Idempotency-Key handling
+# -----------------------
+def _claim(db: Session, user_id: int, scope: str, key: str, payload):
+    try:
+        return idempotency.begin(db, user_id, scope, key, payload)
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+def _replay(record):
+    return NegotiatedResponse(record.response, status_code=record.status_code, headers={"Idempotent-Replayed": "true"})
+
+
+def _idempotent(db: Session, user_id: int, key: Optional[str], scope: str, payload, run: Callable, status_code: int = 200):
+    """Run `run()` once per Idempotency-Key; retries get the stored response."""
+    if key is None:
+        return run()
+    record = _claim(db, user_id, scope, key, payload)
+    if record is not None:
+        return _replay(record)
+    try:
+        result = jsonable_encoder(run())
+    except Exception:
+        idempotency.release(db, user_id, scope, key)
+        raise
+    idempotency.complete(db, user_id, scope, key, status_code, result)
+    return result
+
+
 # -----------------------
 # Create Trip (Authenticated)
 # -----------------------
 @router.post("/", status_code=201)
 def create_new_trip(
     trip_in: TripCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     # Force trip owner to the logged-in user
     trip_in.user_id = current_user.id
 
-    trip = create_trip(db, trip_in)
-    return {"id": trip.id}
+    def run():
+        trip = create_trip(db, trip_in)
+        return {"id": trip.id}
+
+    return _idempotent(db, current_user.id, idempotency_key, "POST /trips/",
+                       trip_in.model_dump(mode="json"), run, status_code=201)
+
+
+# -----------------------
+# List Trips (Authenticated, keyset pagination)
+# -----------------------
+def _encode_cursor(created_at: datetime, trip_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{trip_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, trip_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(trip_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=TripPage)
+def list_my_trips(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    after = _decode_cursor(cursor) if cursor else None
+    rows, has_more = list_trips(db, current_user.id, limit=limit, after=after)
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = _encode_cursor(last.created_at, last.id)
+    return TripPage(items=[TripSummary(**row._mapping) for row in rows], next_cursor=next_cursor)
 
 
 # -----------------------
 # Get Trip (Authenticated + Owner-only)
 # -----------------------
-@router.get("/{trip_id}")
+@router.get("/{trip_id}", response_model=None, responses={
+    200: {"model": TripGraph, "description": "The trip with only the requested relationships and fields"},
+})
 def read_trip(
     trip_id: int,
+    include: Optional[str] = Query(None, description="relationships to embed, e.g. segments.days,preferences"),
+    fields: Optional[str] = Query(None, description="columns to send per level, e.g. title,segments.city"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    try:
+        view = TripView.parse(include, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    trip = get_trip_view(db, trip_id, view)
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    if trip.user_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You do not have permission to view this trip"
+        )
+
+    # the view's model only has the requested fields, so reading the ORM rows never lazy-loads
+    return model_response(view.model.model_validate(trip))
+
+
+# -----------------------
+# Patch Trip (partial nested update, optimistic concurrency)
+# -----------------------
+@router.patch("/{trip_id}")
+def update_trip(
+    trip_id: int,
+    patch: TripPatch,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    trip = get_trip_graph(db, trip_id)
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    if trip.user_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You do not have permission to modify this trip"
+        )
+
+    try:
+        return patch_trip(db, trip, patch)
+    except TripVersionConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Trip was modified by another request", "version": e.current_version}
+        )
+    except TripPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# -----------------------
+# Export itinerary (iCal / GPX / CSV)
+# -----------------------
+@router.get("/{trip_id}/export")
+def export_trip(
+    trip_id: int,
+    format: str = Query("ics", pattern="^(ics|gpx|csv)$"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
@@ -46,7 +188,19 @@ def read_trip(
             detail="You do not have permission to view this trip"
         )
 
-    return trip
+    from app.services.export import FORMATS, export_stream, place_fingerprint
+    # the export only changes with the trip version and the data of its places
+    fingerprint = place_fingerprint(db, trip.id)
+    etag = f'"trip-{trip.id}-v{trip.version}-{fingerprint}-{format}"'
+    headers = {
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="trip-{trip.id}.{format}"',
+    }
+    # compressed responses carry the weak form of the tag
+    if if_none_match in (etag, "W/" + etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return StreamingResponse(export_stream(db, trip.id, trip.version, fingerprint, format),
+                             media_type=FORMATS[format][1], headers=headers)
 
 
 # -----------------------
@@ -56,6 +210,7 @@ def read_trip(
 def update_preferences(
     trip_id: int,
     prefs: PreferenceCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
@@ -69,8 +224,8 @@ def update_preferences(
             detail="You do not have permission to modify this trip"
         )
 
-    pref = upsert_preferences(db, trip_id, prefs)
-    return pref
+    return _idempotent(db, current_user.id, idempotency_key, f"POST /trips/{trip_id}/preferences",
+                       prefs.model_dump(mode="json"), lambda: upsert_preferences(db, trip_id, prefs))
 
 
 # -----------------------
@@ -79,6 +234,8 @@ def update_preferences(
 @router.post("/{trip_id}/generate_itinerary")
 def generate_itinerary(
     trip_id: int,
+    stream: bool = Query(False, description="stream days as NDJSON as each one is computed"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
@@ -94,10 +251,56 @@ def generate_itinerary(
             detail="You cannot generate itinerary for this trip"
         )
 
-    # 3. call smart itinerary service
-    itinerary = build_itinerary_for_trip(db, trip)
+    # 3. call smart itinerary service (imported here: numpy & co. load on first use, not at boot)
+    from app.services.itinerary import build_itinerary_for_trip, iter_itinerary_days
+    scope = f"POST /trips/{trip_id}/generate_itinerary"
+    if not stream:
+        return _idempotent(db, current_user.id, idempotency_key, scope, {}, lambda: build_itinerary_for_trip(db, trip))
+
+    if idempotency_key is None:
+        return StreamingResponse(ndjson_lines(iter_itinerary_days(db, trip)), media_type="application/x-ndjson")
+
+    # streamed and plain requests share the stored {"itinerary": [...]} response
+    record = _claim(db, current_user.id, scope, idempotency_key, {})
+    if record is not None:
+        return StreamingResponse(ndjson_lines(record.response["itinerary"]), media_type="application/x-ndjson",
+                                 headers={"Idempotent-Replayed": "true"})
+
+    def days():
+        done = []
+        try:
+            for day in iter_itinerary_days(db, trip):
+                done.append(day)
+                yield day
+        except BaseException:
+            idempotency.release(db, current_user.id, scope, idempotency_key)
+            raise
+        idempotency.complete(db, current_user.id, scope, idempotency_key, 200, jsonable_encoder({"itinerary": done}))
+
+    return StreamingResponse(ndjson_lines(days()), media_type="application/x-ndjson")
+
+
+# -----------------------
+# Plan Transport between segments
+# -----------------------
+@router.post("/{trip_id}/transport")
+def plan_trip_transport(
+    trip_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    trip = get_trip(db, trip_id)
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    if trip.user_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You cannot plan transport for this trip"
+        )
 
-    return itinerary
+    from app.services.transport.planner import plan_transport
+    return {"hops": plan_transport(db, trip)}
 
 
 
@@ -1,7 +1,55 @@
 # backend/app/crud/trip.py
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
 from app.models.trip import Trip, TripSegment, TripDay, Activity, Place, Preference, TransportOption
-from datetime import date
+from app.services.geo import geohash_encode
+from app.services.scoring import features_for_place
+from datetime import date, datetime
+from typing import Dict, List
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+TRIP_FIELDS = ["title", "description", "start_date", "end_date", "budget"]
+SEGMENT_FIELDS = ["city", "country", "start_date", "end_date", "notes"]
+DAY_FIELDS = ["day_number", "date"]
+ACTIVITY_FIELDS = ["name", "type", "start_time", "end_time", "latitude", "longitude", "estimated_cost", "notes", "place_id"]
+SEGMENT_REQUIRED = ["city", "start_date", "end_date"]
+DAY_REQUIRED = ["day_number", "date"]
+ACTIVITY_REQUIRED = ["name"]
+
+
+class TripVersionConflict(Exception):
+    """The trip changed since the client read it."""
+    def __init__(self, current_version: int):
+        super().__init__(f"trip is at version {current_version}")
+        self.current_version = current_version
+
+
+class TripPatchError(ValueError):
+    """The patch document does not fit the stored trip."""
+
+
+def _new_place(place_in):
+    place = Place(
+        name=place_in.name,
+        category=place_in.category,
+        latitude=place_in.latitude,
+        longitude=place_in.longitude,
+        external_id=place_in.external_id,
+        source=place_in.source
+    )
+    if place.latitude is not None and place.longitude is not None:
+        place.geohash = geohash_encode(place.latitude, place.longitude)
+    place.features = features_for_place(place)
+    return place
+
+def _locate(city: str, country) -> Dict:
+    """Segment coordinates from the offline gazetteer; all None when it has no match (or none is configured)."""
+    from app.services.gazetteer import resolve_city
+    hit = resolve_city(city, country) if city else None
+    if hit is None:
+        return {"latitude": None, "longitude": None, "geoname_id": None}
+    return {"latitude": hit["lat"], "longitude": hit["lon"], "geoname_id": hit["id"]}
 
 def create_trip(db: Session, trip_in):
     trip = Trip(
@@ -22,7 +70,8 @@ def create_trip(db: Session, trip_in):
             city=seg_in.city,
             country=seg_in.country,
             start_date=seg_in.start_date,
-            end_date=seg_in.end_date
+            end_date=seg_in.end_date,
+            **_locate(seg_in.city, seg_in.country)
         )
         db.add(seg)
         db.flush()
@@ -33,14 +82,7 @@ def create_trip(db: Session, trip_in):
             for act_in in day_in.activities:
                 place = None
                 if act_in.place:
-                    place = Place(
-                        name=act_in.place.name,
-                        category=act_in.place.category,
-                        latitude=act_in.place.latitude,
-                        longitude=act_in.place.longitude,
-                        external_id=act_in.place.external_id,
-                        source=act_in.place.source
-                    )
+                    place = _new_place(act_in.place)
                     db.add(place)
                     db.flush()
                 activity = Activity(
@@ -62,6 +104,27 @@ def create_trip(db: Session, trip_in):
 def get_trip(db: Session, trip_id: int):
     return db.query(Trip).filter(Trip.id == trip_id).first()
 
+def list_trips(db: Session, user_id: int, limit: int = 20, after=None):
+    """
+    One page of a user's trips, newest first, as lightweight rows (no segments loaded).
+    after: (created_at, id) of the last trip on the previous page.
+    Returns (rows, has_more).
+    """
+    segment_count = (
+        select(func.count(TripSegment.id))
+        .where(TripSegment.trip_id == Trip.id)
+        .correlate(Trip)
+        .scalar_subquery()
+    )
+    q = db.query(
+        Trip.id, Trip.title, Trip.start_date, Trip.end_date, Trip.budget, Trip.created_at,
+        segment_count.label("segment_count"),
+    ).filter(Trip.user_id == user_id)
+    if after:
+        q = q.filter(tuple_(Trip.created_at, Trip.id) < tuple_(*after))
+    rows = q.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
 def upsert_preferences(db: Session, trip_id: int, prefs_in):
     pref = db.query(Preference).filter(Preference.trip_id == trip_id).one_or_none()
     if not pref:
@@ -75,3 +138,229 @@ def upsert_preferences(db: Session, trip_id: int, prefs_in):
     db.commit()
     db.refresh(pref)
     return pref
+
+# trip graph path -> (ORM class, relationship on the parent, FK columns the loader needs)
+_GRAPH_PATHS = {
+    "": (Trip, None, ["user_id", "version"]),  # owner check, mapper version counter
+    "segments": (TripSegment, Trip.segments, ["trip_id"]),
+    "segments.days": (TripDay, TripSegment.days, ["segment_id"]),
+    "segments.days.activities": (Activity, TripDay.activities, ["day_id", "place_id"]),
+    "segments.days.activities.place": (Place, Activity.place, []),
+    "segments.transport_options": (TransportOption, TripSegment.transport_options, ["segment_id"]),
+    "preferences": (Preference, Trip.preferences, ["trip_id"]),
+}
+
+
+def _load_only(view, path: str):
+    cls, _, keys = _GRAPH_PATHS[path]
+    names = dict.fromkeys(["id"] + keys + view.columns(path))
+    return load_only(*(getattr(cls, n) for n in names))
+
+
+def trip_load_options(view) -> List:
+    """Eager-load plan for a schemas.trip.TripView: one SELECT per included level, only the columns sent."""
+    def level(path):
+        return [_load_only(view, path)] + [
+            selectinload(_GRAPH_PATHS[child][1]).options(*level(child)) for child in view.children(path)
+        ]
+    return level("")
+
+
+def get_trip_view(db: Session, trip_id: int, view):
+    return db.query(Trip).options(*trip_load_options(view)).filter(Trip.id == trip_id).first()
+
+
+def get_trip_graph(db: Session, trip_id: int):
+    """Trip with segments, days and activities loaded in one query per level."""
+    return db.query(Trip).options(
+        selectinload(Trip.segments).selectinload(TripSegment.days).selectinload(TripDay.activities)
+    ).filter(Trip.id == trip_id).first()
+
+
+def _changed(row, values: Dict, fields: List[str]) -> Dict:
+    return {f: values[f] for f in fields if f in values and getattr(row, f) != values[f]}
+
+
+def _require(values: Dict, fields: List[str], what: str, new: bool = True):
+    """New rows must set `fields`; existing rows may omit them but not null them."""
+    missing = [f for f in fields if (new or f in values) and values.get(f) is None]
+    if missing:
+        raise TripPatchError(f"{'new ' if new else ''}{what} needs {', '.join(missing)}")
+
+
+def _pick(values: Dict, fields: List[str]) -> Dict:
+    return {f: values[f] for f in fields if f in values}
+
+
+class _TripDiff:
+    """Minimal set of row changes between a stored trip graph and a patch document."""
+
+    def __init__(self):
+        self.updates = {TripSegment: [], TripDay: [], Activity: []}
+        self.deletes = {TripSegment: [], TripDay: [], Activity: []}
+        # new rows, each with a callable that returns its parent id once the parent exists
+        self.new_segments = []
+        self.new_days = []
+        self.new_activities = []
+        self.new_places = []
+
+    def _diff_children(self, stored, items: List[Dict], fields: List[str], required: List[str], model, what: str,
+                       on_existing, on_new):
+        by_id = {row.id: row for row in stored}
+        seen = set()
+        for item in items:
+            row_id = item.get("id")
+            if row_id is None:
+                on_new(item)
+                continue
+            row = by_id.get(row_id)
+            if row is None or row_id in seen:
+                raise TripPatchError(f"{what} {row_id} is not part of this trip" if row is None else f"{what} {row_id} is listed twice")
+            seen.add(row_id)
+            _require(item, required, what, new=False)
+            changes = _changed(row, item, fields)
+            if changes:
+                self.updates[model].append({"id": row_id, **changes})
+            on_existing(row, item)
+        self.deletes[model].extend(i for i in by_id if i not in seen)
+
+    def segments(self, trip, items: List[Dict]):
+        self._diff_children(
+            trip.segments, items, SEGMENT_FIELDS, SEGMENT_REQUIRED, TripSegment, "segment",
+            lambda seg, item: item.get("days") is not None and self.days(seg, item["days"], lambda seg=seg: seg.id),
+            lambda item: self.add_segment(trip, item),
+        )
+        # a renamed city (or country) moves the segment
+        stored = {seg.id: seg for seg in trip.segments}
+        for update in self.updates[TripSegment]:
+            if "city" in update or "country" in update:
+                seg = stored[update["id"]]
+                update.update(_locate(update.get("city", seg.city), update.get("country", seg.country)))
+
+    def days(self, segment, items: List[Dict], segment_id):
+        self._diff_children(
+            segment.days, items, DAY_FIELDS, DAY_REQUIRED, TripDay, "day",
+            lambda day, item: item.get("activities") is not None and self.activities(day, item["activities"], lambda day=day: day.id),
+            lambda item: self.add_day(item, segment_id),
+        )
+
+    def activities(self, day, items: List[Dict], day_id):
+        def existing(act, item):
+            if item.get("place"):
+                self.add_place(item, act.id)
+
+        self._diff_children(day.activities, items, ACTIVITY_FIELDS, ACTIVITY_REQUIRED, Activity, "activity", existing,
+                            lambda item: self.add_activity(item, day_id))
+
+    def add_segment(self, trip, item: Dict):
+        _require(item, SEGMENT_REQUIRED, "segment")
+        seg = TripSegment(trip_id=trip.id, **_pick(item, SEGMENT_FIELDS), **_locate(item["city"], item.get("country")))
+        self.new_segments.append(seg)
+        for day in item.get("days") or []:
+            self.add_day(day, lambda seg=seg: seg.id)
+
+    def add_day(self, item: Dict, segment_id):
+        _require(item, DAY_REQUIRED, "day")
+        day = TripDay(**_pick(item, DAY_FIELDS))
+        self.new_days.append((day, segment_id))
+        for act in item.get("activities") or []:
+            self.add_activity(act, lambda day=day: day.id)
+
+    def add_activity(self, item: Dict, day_id):
+        _require(item, ACTIVITY_REQUIRED, "activity")
+        act = Activity(**_pick(item, ACTIVITY_FIELDS))
+        self.new_activities.append((act, day_id))
+        if item.get("place"):
+            self.add_place(item, act)
+
+    def add_place(self, item: Dict, activity):
+        """`activity` is a new Activity or the id of a stored one."""
+        from app.schemas.trip import PlaceCreate
+        self.new_places.append((_new_place(PlaceCreate(**item["place"])), activity))
+
+    def link_places(self):
+        """Once places have ids: set them on new activities, fold them into stored activities' updates."""
+        updates = {u["id"]: u for u in self.updates[Activity]}
+        for place, activity in self.new_places:
+            if isinstance(activity, Activity):
+                activity.place_id = place.id
+            elif activity in updates:
+                updates[activity]["place_id"] = place.id
+            else:
+                updates[activity] = {"id": activity, "place_id": place.id}
+                self.updates[Activity].append(updates[activity])
+
+    def empty(self) -> bool:
+        return not (self.new_segments or self.new_days or self.new_activities or self.new_places
+                    or any(self.updates.values()) or any(self.deletes.values()))
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        inserted = {TripSegment: len(self.new_segments), TripDay: len(self.new_days), Activity: len(self.new_activities)}
+        return {
+            model.__tablename__: {
+                "inserted": inserted[model],
+                "updated": len(self.updates[model]),
+                "deleted": len(self.deletes[model]),
+            } for model in (TripSegment, TripDay, Activity)
+        }
+
+
+def patch_trip(db: Session, trip: Trip, patch) -> Dict:
+    """
+    Apply a TripPatch to a trip loaded with get_trip_graph, issuing only the
+    statements the diff needs: one batched INSERT per level and table, one
+    executemany UPDATE per table and one DELETE per table (children of
+    deleted rows go with the FK cascade). Bumps trip.version.
+    """
+    if patch.version != trip.version:
+        raise TripVersionConflict(trip.version)
+    values = patch.model_dump(exclude_unset=True)
+
+    diff = _TripDiff()
+    _require(values, ["start_date", "end_date"], "trip", new=False)
+    if values.get("segments") is not None:
+        diff.segments(trip, values["segments"])
+
+    trip_changes = _changed(trip, values, TRIP_FIELDS)
+    if not trip_changes and diff.empty():
+        return {"id": trip.id, "version": trip.version, "changes": diff.counts()}
+
+    try:
+        # the trip row is always touched so its version moves; the UPDATE is
+        # guarded by the version we read, which catches concurrent writers
+        for field, value in trip_changes.items():
+            setattr(trip, field, value)
+        trip.updated_at = datetime.utcnow()
+        db.flush()
+
+        for model in (Activity, TripDay, TripSegment):
+            if diff.deletes[model]:
+                db.query(model).filter(model.id.in_(diff.deletes[model])).delete(synchronize_session=False)
+        # parents first so children can take their ids; each flush is one batched INSERT per table
+        if diff.new_segments or diff.new_places:
+            db.add_all(diff.new_segments)
+            db.add_all([place for place, _ in diff.new_places])
+            db.flush()
+            diff.link_places()
+        for day, segment_id in diff.new_days:
+            day.segment_id = segment_id()
+        if diff.new_days:
+            db.add_all([day for day, _ in diff.new_days])
+            db.flush()
+        for act, day_id in diff.new_activities:
+            act.day_id = day_id()
+        if diff.new_activities:
+            db.add_all([act for act, _ in diff.new_activities])
+            db.flush()
+
+        for model in (TripSegment, TripDay, Activity):
+            if diff.updates[model]:
+                db.bulk_update_mappings(model, diff.updates[model])
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        current = db.query(Trip.version).filter(Trip.id == trip.id).scalar()
+        raise TripVersionConflict(current)
+
+    db.expire_all()
+    return {"id": trip.id, "version": trip.version, "changes": diff.counts()}
@@ -1,13 +1,49 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import threading
 from dotenv import load_dotenv
 
-load_dotenv()
+# The engine (and the DB driver behind it) is only created on first use, so
+# importing models or this module stays cheap. Use get_engine(); `engine` is
+# still importable and resolves to the same lazily created object.
+_engine = None
+_engine_lock = threading.Lock()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                load_dotenv()
+                _engine = create_engine(os.getenv("DATABASE_URL"))
+    return _engine
+
+
+def dispose_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **kw):
+        kw.setdefault("bind", get_engine())
+        return super().__call__(**kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
+
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "DATABASE_URL":
+        load_dotenv()
+        return os.getenv("DATABASE_URL")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
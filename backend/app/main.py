@@ -12,23 +12,64 @@
 
 ###second version
 
-from fastapi import FastAPI
-from app.api.auth import router as auth_router
-from app.db import Base, engine
-
-from app.api import trips  # ensure import
+import os
+from contextlib import asynccontextmanager
 
-from app.api import places
+from dotenv import load_dotenv
+from fastapi import FastAPI
 
 # Auto-create DB tables (temporary for Week 1; migrations later)
 
 # Base.metadata.create_all(bind=engine) #### commented out to use Alembic migrations
 
-app = FastAPI(title="OneTrip API")
 
-app.include_router(auth_router)
-app.include_router(trips.router)
-app.include_router(places.router)
-@app.get("/")
-def home():
-    return {"message": "OneTrip backend running!"}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.db import get_engine, dispose_engine
+    from app.services.http import close_session
+
+    # the engine is cheap to build (no connection is opened until the first query)
+    get_engine()
+    if os.getenv("POOL_SNAPSHOT_PATH"):
+        # map the city pool snapshot now instead of on the first itinerary request
+        from app.services import pool_snapshot
+        pool_snapshot.load(os.getenv("POOL_SNAPSHOT_PATH"))
+    if os.getenv("GAZETTEER_PATH"):
+        from app.services import gazetteer
+        gazetteer.load(os.getenv("GAZETTEER_PATH"))
+    try:
+        yield
+    finally:
+        close_session()
+        dispose_engine()
+
+
+def create_app() -> FastAPI:
+    # .env must be loaded before the routers import modules that read settings
+    load_dotenv()
+
+    from app.api.auth import router as auth_router
+    from app.api import trips, places
+    from app.api.negotiation import NegotiatedResponse, NegotiationMiddleware
+
+    app = FastAPI(title="OneTrip API", default_response_class=NegotiatedResponse, lifespan=lifespan)
+    app.add_middleware(NegotiationMiddleware)
+
+    from app.services.rate_limit import RATE_LIMIT_ENABLED
+    if RATE_LIMIT_ENABLED:
+        # outermost: limited requests are turned away before any other work
+        from app.api.rate_limit import RateLimitMiddleware
+        app.add_middleware(RateLimitMiddleware)
+
+    app.include_router(auth_router)
+    app.include_router(trips.router)
+    app.include_router(places.router)
+
+    @app.get("/")
+    def home():
+        return {"message": "OneTrip backend running!"}
+
+    return app
+
+
+app = create_app()
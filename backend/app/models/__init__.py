@@ -1,2 +1,6 @@
 from .user import User
-from .trip import Trip, TripSegment, TripDay, Activity, TransportOption, Preference, Place
\ No newline at end of file
+from .trip import Trip, TripSegment, TripDay, Activity, TransportOption, Preference, Place, CityPool, PlaceSearchResult, TravelCost
+from .provider import ProviderQuota
+from .idempotency import IdempotencyRecord
+from .place_raw import PlaceRaw, RawDictionary
+from .rate_limit import RateLimitState
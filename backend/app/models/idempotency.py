@@ -0,0 +1,21 @@
+# backend/app/models/idempotency.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, UniqueConstraint
+from app.db import Base
+
+class IdempotencyRecord(Base):
+    """Stored response of a request sent with an Idempotency-Key, replayed to retries until it expires."""
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    scope = Column(String(128), nullable=False)  # method + path, e.g. "POST /trips/"
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request payload
+    status_code = Column(Integer, nullable=True)  # null while the first request is still running
+    response = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_keys_user_scope_key"),
+    )
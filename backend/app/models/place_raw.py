@@ -0,0 +1,35 @@
+# backend/app/models/place_raw.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary
+from app.db import Base
+
+class PlaceRaw(Base):
+    """Compressed provider payload a place was normalized from (see services/places/raw_store.py)."""
+    __tablename__ = "place_raws"
+    place_id = Column(Integer, ForeignKey("places.id", ondelete="CASCADE"), primary_key=True)
+    source = Column(String(50), nullable=False)  # google/foursquare
+    codec = Column(String(16), nullable=False)  # zlib/zstd
+    dictionary_id = Column(Integer, ForeignKey("raw_dictionaries.id"), nullable=True)
+    payload = Column(LargeBinary, nullable=False)
+    raw_size = Column(Integer, nullable=False)  # uncompressed JSON bytes
+    fetched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    _decoded = None
+
+    @property
+    def raw(self):
+        """The payload as a dict, decompressed on first access."""
+        if self._decoded is None:
+            from app.services.places.raw_store import decode
+            self._decoded = decode(self)
+        return self._decoded
+
+class RawDictionary(Base):
+    """Compression dictionary trained on one provider's payloads."""
+    __tablename__ = "raw_dictionaries"
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50), nullable=False, index=True)
+    codec = Column(String(16), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    samples = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,15 @@
+# backend/app/models/provider.py
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint
+from app.db import Base
+
+class ProviderQuota(Base):
+    """Calls made to an external provider per UTC day, shared by all workers."""
+    __tablename__ = "provider_quotas"
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(64), nullable=False)  # google/foursquare
+    day = Column(Date, nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("provider", "day", name="uq_provider_quotas_provider_day"),
+    )
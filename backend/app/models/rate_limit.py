@@ -0,0 +1,9 @@
+# backend/app/models/rate_limit.py
+from sqlalchemy import Column, String, Float
+from app.db import Base
+
+class RateLimitState(Base):
+    """GCRA state of one client under one policy, when RATE_LIMIT_STORE=postgres (see services/rate_limit.py)."""
+    __tablename__ = "rate_limits"
+    key = Column(String(255), primary_key=True)  # "<policy>:<user id or ip>"
+    tat = Column(Float, nullable=False)  # theoretical arrival time, unix seconds
@@ -1,8 +1,9 @@
 # backend/app/models/trip.py
 from sqlalchemy import (
-    Column, Integer, String, Date, DateTime, ForeignKey, Float, Boolean, Text
+    Column, Integer, String, Date, DateTime, ForeignKey, Float, Boolean, Text, Index, JSON, LargeBinary
 )
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from datetime import datetime
 from app.db import Base
 
@@ -15,23 +16,37 @@ class Trip(Base):
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     budget = Column(Float, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # never NULL: it is the keyset of the trip list (raw inserts get the server default)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # optimistic concurrency for PATCH
 
     # relationships
     segments = relationship("TripSegment", back_populates="trip", cascade="all, delete-orphan")
     preferences = relationship("Preference", back_populates="trip", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # keyset pagination of a user's trips; INCLUDE makes the list an index-only scan
+        Index("ix_trips_user_created_id", "user_id", "created_at", "id",
+              postgresql_include=["title", "start_date", "end_date", "budget"]),
+    )
+    # every UPDATE of the row checks and bumps the version
+    __mapper_args__ = {"version_id_col": version}
+
 class TripSegment(Base):
     __tablename__ = "trip_segments"
     id = Column(Integer, primary_key=True, index=True)
-    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, index=True)
     city = Column(String(256), nullable=False)
     country = Column(String(128), nullable=True)
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     suggested_transport = Column(String(64), nullable=True)  # e.g., flight/train/bus
     notes = Column(Text, nullable=True)
+    # resolved from city/country by the offline gazetteer (services/gazetteer.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geoname_id = Column(Integer, nullable=True)
 
     trip = relationship("Trip", back_populates="segments")
     days = relationship("TripDay", back_populates="segment", cascade="all, delete-orphan")
@@ -40,7 +55,7 @@ class TripSegment(Base):
 class TripDay(Base):
     __tablename__ = "trip_days"
     id = Column(Integer, primary_key=True, index=True)
-    segment_id = Column(Integer, ForeignKey("trip_segments.id", ondelete="CASCADE"), nullable=False)
+    segment_id = Column(Integer, ForeignKey("trip_segments.id", ondelete="CASCADE"), nullable=False, index=True)
     day_number = Column(Integer, nullable=False)  # 1..n within that segment
     date = Column(Date, nullable=False)
 
@@ -50,8 +65,8 @@ class TripDay(Base):
 class Activity(Base):
     __tablename__ = "activities"
     id = Column(Integer, primary_key=True, index=True)
-    day_id = Column(Integer, ForeignKey("trip_days.id", ondelete="CASCADE"), nullable=False)
-    place_id = Column(Integer, ForeignKey("places.id"), nullable=True)
+    day_id = Column(Integer, ForeignKey("trip_days.id", ondelete="CASCADE"), nullable=False, index=True)
+    place_id = Column(Integer, ForeignKey("places.id"), nullable=True, index=True)
     name = Column(String(256), nullable=False)
     type = Column(String(64), nullable=True)  # food/sight/shopping/nature
     start_time = Column(String(16), nullable=True)
@@ -67,7 +82,7 @@ class Activity(Base):
 class TransportOption(Base):
     __tablename__ = "transport_options"
     id = Column(Integer, primary_key=True, index=True)
-    segment_id = Column(Integer, ForeignKey("trip_segments.id", ondelete="CASCADE"), nullable=False)
+    segment_id = Column(Integer, ForeignKey("trip_segments.id", ondelete="CASCADE"), nullable=False, index=True)
     mode = Column(String(32), nullable=False)  # flight/train/bus/car
     provider = Column(String(128), nullable=True)  # e.g., Skyscanner, Amtrak
     price = Column(Float, nullable=True)
@@ -103,5 +118,46 @@ class Place(Base):
     longitude = Column(Float, nullable=True)
     external_id = Column(String(256), nullable=True)  # provider id (Google/Yelp)
     source = Column(String(64), nullable=True)  # google/yelp/foursquare
+    geohash = Column(String(12), nullable=True)  # from latitude/longitude, for prefix (nearby) lookups
+    features = Column(LargeBinary, nullable=True)  # float32 scoring vector, see services/scoring.py
+    # filled by the details enrichment worker (services/places/enrichment.py)
+    user_ratings_total = Column(Integer, nullable=True)
+    opening_hours = Column(JSON, nullable=True)  # {"weekday_text": [...], "periods": [...]}
+    photos = Column(JSON, nullable=True)  # [{"ref", "width", "height"}, ...]
+    website = Column(String(512), nullable=True)
+    phone = Column(String(64), nullable=True)
+    details_updated_at = Column(DateTime, nullable=True, index=True)  # last details fetch
 
     activities = relationship("Activity", back_populates="place")
+    # compressed provider payload; loaded (and decompressed) only when accessed
+    raw_payload = relationship("PlaceRaw", uselist=False, lazy="select", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_places_source_external_id", "source", "external_id"),
+        Index("ix_places_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+    )
+
+class CityPool(Base):
+    """Precomputed candidate pool for one city: place snapshots, per-category top lists and clusters."""
+    __tablename__ = "city_pools"
+    id = Column(Integer, primary_key=True, index=True)
+    city = Column(String(256), nullable=False, unique=True)  # normalized (lowercased) city name
+    place_count = Column(Integer, nullable=False, default=0)
+    data = Column(JSON, nullable=False)  # {"places": {id: {...}}, "top": {group: [ids]}, "clusters": [[ids]]}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PlaceSearchResult(Base):
+    """Short-lived result of a place search, shared between workers by the single-flight layer."""
+    __tablename__ = "place_search_results"
+    key = Column(String(40), primary_key=True)  # sha1 of the normalized (query, ll, radius, limit, cache)
+    place_ids = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class TravelCost(Base):
+    """Cached travel cost between two places for one mode (directed pair)."""
+    __tablename__ = "travel_costs"
+    from_place_id = Column(Integer, primary_key=True)
+    to_place_id = Column(Integer, primary_key=True)
+    mode = Column(String(16), primary_key=True)  # walk/drive/transit
+    distance_km = Column(Float, nullable=False)
+    duration_min = Column(Float, nullable=False)
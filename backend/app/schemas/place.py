@@ -0,0 +1,18 @@
+# backend/app/schemas/place.py
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+MAX_BATCH_QUERIES = 20
+
+class PlaceSubQuery(BaseModel):
+    q: str = Field(..., min_length=1, description="text query e.g. 'museum'")
+    limit: Optional[int] = Field(None, ge=1, le=60, description="max results for this query (default: the batch limit)")
+
+class PlaceSearchBatch(BaseModel):
+    queries: List[PlaceSubQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    radius: int = Field(5000, description="radius in meters, shared by every query")
+    limit: int = Field(20, ge=1, le=60, description="max results per query")
+    cache: bool = True
+    local: bool = Field(False, description="answer from cached places near lat/lon when there are enough of them (results also carry distance_km)")
@@ -1,7 +1,10 @@
 # backend/app/schemas/trip.py
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import date
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from typing import Dict, FrozenSet, List, Optional, Tuple, Type
+from datetime import date, datetime
+
+DateType = date  # for optional fields named "date", which would shadow the type
 
 class PlaceCreate(BaseModel):
     name: str
@@ -52,9 +55,243 @@ class TripCreate(BaseModel):
     segments: List[TripSegmentCreate] = []
 
 
+# PATCH documents: only the fields that are sent are changed. A child list,
+# when sent, is the complete new set: items with an id update that row,
+# items without one are created, and stored rows left out are deleted.
+class ActivityPatch(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    type: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    estimated_cost: Optional[float] = None
+    notes: Optional[str] = None
+    place_id: Optional[int] = None
+    place: Optional[PlaceCreate] = None
+
+class TripDayPatch(BaseModel):
+    id: Optional[int] = None
+    day_number: Optional[int] = None
+    date: Optional[DateType] = None
+    activities: Optional[List[ActivityPatch]] = None
+
+class TripSegmentPatch(BaseModel):
+    id: Optional[int] = None
+    city: Optional[str] = None
+    country: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    notes: Optional[str] = None
+    days: Optional[List[TripDayPatch]] = None
+
+class TripPatch(BaseModel):
+    version: int = Field(..., description="version the client last read; a newer stored version is a conflict")
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    budget: Optional[float] = None
+    segments: Optional[List[TripSegmentPatch]] = None
+
+
 class PreferenceCreate(BaseModel):
     pace: Optional[str] = "normal"
     foodie: Optional[bool] = False
     shopping: Optional[bool] = False
     nightlife: Optional[bool] = False
     budget_level: Optional[str] = None
+
+
+class TripSummary(BaseModel):
+    id: int
+    title: Optional[str] = None
+    start_date: date
+    end_date: date
+    budget: Optional[float] = None
+    created_at: Optional[datetime] = None
+    segment_count: int = 0
+
+
+class TripPage(BaseModel):
+    items: List[TripSummary]
+    next_cursor: Optional[str] = None
+
+
+# -----------------------
+# Trip graph responses
+# -----------------------
+# Column-only models of each level, read straight from the ORM rows.
+class _Orm(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class PlaceOut(_Orm):
+    id: int
+    name: str
+    category: Optional[str] = None
+    rating: Optional[float] = None
+    price_level: Optional[int] = None
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    source: Optional[str] = None
+    external_id: Optional[str] = None
+
+class ActivityOut(_Orm):
+    id: int
+    day_id: int
+    place_id: Optional[int] = None
+    name: str
+    type: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    estimated_cost: Optional[float] = None
+    notes: Optional[str] = None
+
+class TripDayOut(_Orm):
+    id: int
+    segment_id: int
+    day_number: int
+    date: DateType
+
+class TransportOptionOut(_Orm):
+    id: int
+    segment_id: int
+    mode: str
+    provider: Optional[str] = None
+    price: Optional[float] = None
+    duration_minutes: Optional[int] = None
+    departure: Optional[str] = None
+    arrival: Optional[str] = None
+    booking_url: Optional[str] = None
+
+class TripSegmentOut(_Orm):
+    id: int
+    trip_id: int
+    city: str
+    country: Optional[str] = None
+    start_date: date
+    end_date: date
+    suggested_transport: Optional[str] = None
+    notes: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    geoname_id: Optional[int] = None
+
+class PreferenceOut(_Orm):
+    id: int
+    trip_id: int
+    pace: Optional[str] = None
+    foodie: Optional[bool] = None
+    shopping: Optional[bool] = None
+    nightlife: Optional[bool] = None
+    accessibility_needs: Optional[str] = None
+    budget_level: Optional[str] = None
+
+class TripOut(_Orm):
+    id: int
+    user_id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_date: date
+    end_date: date
+    budget: Optional[float] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int
+
+# path in the trip graph -> (columns model, list relationship?)
+TRIP_GRAPH = {
+    "": (TripOut, False),
+    "segments": (TripSegmentOut, True),
+    "segments.days": (TripDayOut, True),
+    "segments.days.activities": (ActivityOut, True),
+    "segments.days.activities.place": (PlaceOut, False),
+    "segments.transport_options": (TransportOptionOut, True),
+    "preferences": (PreferenceOut, False),
+}
+
+# Full graph, for the OpenAPI schema; responses only carry the included parts.
+class ActivityGraph(ActivityOut):
+    place: Optional[PlaceOut] = None
+
+class TripDayGraph(TripDayOut):
+    activities: Optional[List[ActivityGraph]] = None
+
+class TripSegmentGraph(TripSegmentOut):
+    days: Optional[List[TripDayGraph]] = None
+    transport_options: Optional[List[TransportOptionOut]] = None
+
+class TripGraph(TripOut):
+    segments: Optional[List[TripSegmentGraph]] = None
+    preferences: Optional[PreferenceOut] = None
+
+
+class TripView:
+    """
+    Which parts of a trip graph a read asks for:
+    include=segments.days,preferences picks relationships (parents come along)
+    and fields=title,segments.city picks columns per level (id is always sent).
+    crud.trip.trip_load_options turns it into the eager-load plan and `model`
+    into the matching response model.
+    """
+    def __init__(self, include: FrozenSet[str], fields: Tuple[Tuple[str, FrozenSet[str]], ...] = ()):
+        self.include = include
+        self.fields = dict(fields)
+        self.key = (include, fields)
+
+    @classmethod
+    def parse(cls, include: Optional[str] = None, fields: Optional[str] = None) -> "TripView":
+        """Raises ValueError on unknown paths or columns."""
+        paths = set()
+        for path in filter(None, (p.strip() for p in (include or "").split(","))):
+            if path not in TRIP_GRAPH:
+                raise ValueError(f"unknown include path: {path}")
+            paths.add(path)
+        picked: Dict[str, set] = {}
+        for item in filter(None, (f.strip() for f in (fields or "").split(","))):
+            path, _, name = item.rpartition(".")
+            if path not in TRIP_GRAPH or name not in TRIP_GRAPH[path][0].model_fields:
+                raise ValueError(f"unknown field: {item}")
+            picked.setdefault(path, {"id"}).add(name)
+            if path:
+                paths.add(path)
+        for path in list(paths):
+            # segments.days.activities implies segments and segments.days
+            parts = path.split(".")
+            paths.update(".".join(parts[:i]) for i in range(1, len(parts)))
+        return cls(frozenset(paths), tuple(sorted((p, frozenset(f)) for p, f in picked.items())))
+
+    def columns(self, path: str) -> List[str]:
+        model = TRIP_GRAPH[path][0]
+        return [f for f in model.model_fields if path not in self.fields or f in self.fields[path]]
+
+    def children(self, path: str) -> List[str]:
+        depth = path.count(".") + 1 if path else 0
+        return [p for p in sorted(self.include) if p.count(".") == depth and (not path or p.startswith(path + "."))]
+
+    @property
+    def model(self) -> Type[BaseModel]:
+        return _view_model(self.key)
+
+
+@lru_cache(maxsize=256)
+def _view_model(key) -> Type[BaseModel]:
+    # one model per distinct include/fields combination, built once per process
+    view = TripView(*key)
+
+    def build(path: str) -> Type[BaseModel]:
+        base, _ = TRIP_GRAPH[path]
+        spec = {f: (base.model_fields[f].annotation, base.model_fields[f]) for f in view.columns(path)}
+        for child in view.children(path):
+            child_model = build(child)
+            many = TRIP_GRAPH[child][1]
+            spec[child.rpartition(".")[2]] = (List[child_model] if many else Optional[child_model], None if not many else [])
+        name = base.__name__ + "_" + (path.replace(".", "_") or "root")
+        return create_model(name, __base__=_Orm, **spec)
+
+    return build("")
+
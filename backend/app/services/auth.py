@@ -24,10 +24,9 @@
 ########SECOND VERSION OF THE FILE (auth.py) BELOW#####
 
 import os
-from passlib.context import CryptContext
+from functools import lru_cache
 from jose import jwt
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -43,16 +42,20 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 #     return pwd_context.verify(plain_password, hashed_password)
 
 # Use Argon2 (modern + strong + no 72-byte limit)
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto"
-)
+# built on first use: passlib + argon2 are slow to import and only login/register need them
+@lru_cache(maxsize=1)
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto"
+    )
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def create_access_token(data: dict):
     """Create a JWT token with expiration"""
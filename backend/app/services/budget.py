@@ -0,0 +1,145 @@
+# app/services/budget.py
+"""
+Budget-constrained selection of a day's activities.
+
+When the trip has a budget (Trip.budget, or a daily allowance derived from
+Preference.budget_level), each day's geographically grouped candidates go
+through a multi-constraint 0/1 knapsack:
+
+    maximize   sum(score + FILL_BONUS)
+    subject to sum(slots) <= per_day      (time: museums and parks take 2)
+               sum(cost)  <= day allowance
+
+Activity costs come from Activity-style "estimated_cost" when a candidate
+has one, else from its price level. The allowance is what is left of the
+budget spread over the remaining days, so money a cheap day leaves unspent
+goes to the following days.
+
+The DP runs over (slots, cost bucket) with one vectorized numpy update per
+item: O(items * slots * COST_BUCKETS), after dropping items that cannot
+be part of any best plan (per slot size, only items beaten on both cost and
+value by fewer than per_day others survive). Costs are rounded *up* to buckets of
+allowance / COST_BUCKETS, so every plan is within budget. The value lost to
+rounding is bounded: the plan scores at least as well as the best exact plan
+under allowance - per_day * bucket (under 0.5% of the allowance per slot at
+200 buckets).
+"""
+import heapq
+from typing import Dict, List, Optional
+
+from app.services.scoring import FEATURE_GROUPS
+
+# typical spend per person for a visit, by Google price level (0 = free)
+PRICE_LEVEL_COST = {0: 0.0, 1: 10.0, 2: 25.0, 3: 60.0, 4: 120.0}
+DEFAULT_COST = 15.0  # unknown price level
+# daily activity allowance when the trip has no budget but a budget level
+BUDGET_LEVEL_DAILY = {"low": 40.0, "medium": 120.0}
+# candidates handed to each day's knapsack, per slot
+OVERSUBSCRIBE = 2
+COST_BUCKETS = 200
+FILL_BONUS = 1.0  # an affordable visit beats an empty slot
+LONG_VISIT = FEATURE_GROUPS["culture"] + FEATURE_GROUPS["nature"]
+
+
+def activity_cost(c: Dict) -> float:
+    # a negative estimate is bad data, not a refund: fall back to the price level
+    if c.get("estimated_cost") is not None and float(c["estimated_cost"]) >= 0:
+        return float(c["estimated_cost"])
+    level = c.get("price_level")
+    return PRICE_LEVEL_COST.get(level, DEFAULT_COST) if level is not None else DEFAULT_COST
+
+
+def activity_slots(c: Dict) -> int:
+    cat = (c.get("category") or "").lower()
+    return 2 if any(p in cat for p in LONG_VISIT) else 1
+
+
+def knapsack(values: List[float], slots: List[int], costs: List[float], max_slots: int, max_cost: float,
+             buckets: int = COST_BUCKETS) -> List[int]:
+    """
+    Indexes of the best-value subset within both limits (see module docstring for
+    the error bound). Raises ValueError on negative costs.
+    """
+    import numpy as np
+
+    n = len(values)
+    if n == 0 or max_slots <= 0 or max_cost < 0:
+        return []
+    c = np.asarray(costs, dtype=np.float64)
+    if (c < 0).any():
+        raise ValueError("knapsack costs must be >= 0")
+    if max_cost > 0:
+        w = np.ceil(c / (max_cost / buckets) - 1e-9).astype(np.int64)
+    else:
+        # nothing to spend: only free items fit
+        w = np.where(c > 0, buckets + 1, 0).astype(np.int64)
+    v = np.asarray(values, dtype=np.float64)
+    s = np.asarray(slots, dtype=np.int64)
+
+    # an item is useless when, among items of its slot size, at least as many
+    # as could ever be picked are no dearer and no worse; drop those first
+    keep = []
+    for size in np.unique(s):
+        limit = max_slots // int(size)
+        best: List[float] = []  # the `limit` best values seen so far, ascending
+        for i in sorted(np.flatnonzero(s == size), key=lambda i: (w[i], -v[i])):
+            if w[i] > buckets or v[i] <= 0:
+                continue  # too dear for the allowance, or not worth a slot
+            if limit and (len(best) < limit or v[i] > best[0]):
+                keep.append(int(i))
+                heapq.heappush(best, float(v[i]))
+                if len(best) > limit:
+                    heapq.heappop(best)
+    keep.sort()
+
+    neg = -np.inf
+    dp = np.full((max_slots + 1, buckets + 1), neg)
+    dp[0, 0] = 0.0
+    take = {}
+    for i in keep:
+        si, wi = int(s[i]), int(w[i])
+        cand = np.full_like(dp, neg)
+        cand[si:, wi:] = dp[:max_slots + 1 - si, :buckets + 1 - wi] + v[i]
+        better = cand > dp
+        take[i] = better
+        dp = np.where(better, cand, dp)
+
+    si, wi = np.unravel_index(int(np.argmax(dp)), dp.shape)
+    if not np.isfinite(dp[si, wi]) or dp[si, wi] <= 0:
+        return []
+    chosen = []
+    for i in reversed(keep):
+        if take[i][si, wi]:
+            chosen.append(i)
+            si -= int(s[i])
+            wi -= int(w[i])
+    return chosen[::-1]
+
+
+class DayBudget:
+    """Activity allowance of a trip, spent day by day."""
+
+    def __init__(self, total: float, n_days: int):
+        self.remaining = total
+        self.days_left = max(n_days, 1)
+
+    @classmethod
+    def for_trip(cls, trip, preferences, n_days: int) -> Optional["DayBudget"]:
+        """None when nothing limits spending (no trip budget and no low/medium budget level)."""
+        if trip.budget is not None and trip.budget >= 0:
+            return cls(float(trip.budget), n_days)
+        daily = BUDGET_LEVEL_DAILY.get(((preferences.budget_level if preferences else None) or "").lower())
+        return cls(daily * n_days, n_days) if daily is not None else None
+
+    def select(self, route: List[Dict], per_day: int) -> List[Dict]:
+        """The day's picks (in route order) within today's allowance, each with its "estimated_cost"."""
+        allowance = max(self.remaining, 0.0) / self.days_left
+        costs = [activity_cost(c) for c in route]
+        chosen = knapsack(
+            [c.get("score", c.get("rating") or 0.0) + FILL_BONUS for c in route],
+            [activity_slots(c) for c in route],
+            costs, per_day, allowance,
+        )
+        self.remaining -= sum(costs[i] for i in chosen)
+        self.days_left = max(self.days_left - 1, 1)
+        return [dict(route[i], estimated_cost=costs[i]) for i in chosen]
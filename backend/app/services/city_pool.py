@@ -0,0 +1,214 @@
+# app/services/city_pool.py
+"""
+Materialized per-city candidate pools.
+
+A pool holds a snapshot of the city's places, per-category top-N id lists and
+distance clusters, so itinerary generation reads one row instead of
+re-querying and re-clustering the same places on every request.
+
+Refresh every pool (e.g. from cron):
+
+    python -m app.services.city_pool
+    python -m app.services.city_pool Chennai Mumbai
+"""
+import os
+import sys
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.models.trip import CityPool, Place, TripSegment
+from app.services.geo import haversine, cluster_places_by_distance
+from app.services.scoring import decode_features, features_for_place
+
+TOP_N = 50
+CLUSTER_KM = 3.0
+SHARED_POOLS = os.getenv("POOL_SHM_ENABLED", "0") == "1"
+POOL_SNAPSHOT = os.getenv("POOL_SNAPSHOT_PATH")
+
+# category substrings per preference group (same patterns the itinerary queries use)
+CATEGORY_GROUPS = {
+    "food": ["restaurant", "cafe"],
+    "shopping": ["mall", "shopping"],
+    "nightlife": ["bar"],
+    "sights": ["tour", "attract", "point_of_interest"],
+}
+
+
+def normalize_city(city: str) -> str:
+    return " ".join((city or "").lower().split())
+
+
+def place_groups(category: Optional[str]) -> List[str]:
+    cat = (category or "").lower()
+    return [g for g, patterns in CATEGORY_GROUPS.items() if any(pat in cat for pat in patterns)]
+
+
+def _place_entry(p: Place) -> Dict:
+    return {
+        "id": p.id,
+        "name": p.name,
+        "lat": p.latitude,
+        "lon": p.longitude,
+        "category": p.category,
+        "rating": p.rating,
+        "price_level": p.price_level,
+        "source": p.source,
+        "features": [round(x, 4) for x in decode_features(p.features or features_for_place(p))],
+    }
+
+
+def _rank_key(entry: Dict):
+    return (-(entry.get("rating") or 0), entry["id"])
+
+
+def places_for_city(db: Session, city: str) -> List[Place]:
+    # places carry no city column; provider addresses include the city name
+    return db.query(Place).filter(
+        Place.address.icontains(city, autoescape=True),
+        Place.latitude.isnot(None),
+        Place.longitude.isnot(None),
+    ).all()
+
+
+def build_pool_data(places: Iterable[Place], top_n: int = TOP_N) -> Dict:
+    by_group: Dict[str, List[Dict]] = {g: [] for g in CATEGORY_GROUPS}
+    for p in places:
+        entry = _place_entry(p)
+        for g in place_groups(p.category):
+            by_group[g].append(entry)
+
+    top = {}
+    entries = {}
+    for g, items in by_group.items():
+        items.sort(key=_rank_key)
+        top[g] = [e["id"] for e in items[:top_n]]
+        for e in items[:top_n]:
+            entries[e["id"]] = e
+
+    clusters = cluster_places_by_distance(sorted(entries.values(), key=_rank_key), cluster_km=CLUSTER_KM)
+    return {
+        "places": {str(pid): e for pid, e in entries.items()},
+        "top": top,
+        "clusters": [[e["id"] for e in c] for c in clusters],
+    }
+
+
+def refresh_city_pool(db: Session, city: str) -> CityPool:
+    key = normalize_city(city)
+    data = build_pool_data(places_for_city(db, key))
+    pool = db.query(CityPool).filter(CityPool.city == key).one_or_none()
+    if not pool:
+        pool = CityPool(city=key)
+        db.add(pool)
+    pool.data = data
+    pool.place_count = len(data["places"])
+    db.commit()
+    return pool
+
+
+def refresh_all_pools(db: Session, cities: Optional[Iterable[str]] = None) -> int:
+    """Rebuild pools for the given cities, or for every city that appears in a trip."""
+    if cities is None:
+        cities = [c for (c,) in db.query(TripSegment.city).distinct()]
+    keys = sorted({normalize_city(c) for c in cities if c})
+    for key in keys:
+        refresh_city_pool(db, key)
+    return len(keys)
+
+
+def get_city_pools(db: Session, cities: Iterable[str]) -> Dict[str, Dict]:
+    """Load the pools of several cities in one query, keyed by normalized city name."""
+    keys = {normalize_city(c) for c in cities if c}
+    if not keys:
+        return {}
+    pools = {}
+    if SHARED_POOLS:
+        # workers read the loader's shared-memory snapshot first (see pool_store.py)
+        from app.services.pool_store import shared_pools
+        pools = shared_pools(keys)
+    elif POOL_SNAPSHOT:
+        # snapshot file mapped at startup (see pool_snapshot.py)
+        from app.services.pool_snapshot import snapshot_pools
+        pools = snapshot_pools(keys)
+    missing = keys - pools.keys()
+    if missing:
+        rows = db.query(CityPool).filter(CityPool.city.in_(missing)).all()
+        pools.update({r.city: r.data for r in rows})
+    return pools
+
+
+def address_cities(address: str, max_words: int = 3) -> List[str]:
+    """City keys an address may name: runs of up to max_words words within each comma-separated part."""
+    keys = set()
+    for part in address.split(","):
+        words = [w for w in normalize_city(part).split() if not any(ch.isdigit() for ch in w)]
+        for i in range(len(words)):
+            for j in range(i + 1, min(i + max_words, len(words)) + 1):
+                keys.add(" ".join(words[i:j]))
+    return sorted(keys)
+
+
+def add_place_to_pools(db: Session, place: Place, top_n: int = TOP_N):
+    """
+    Incremental refresh: fold a newly cached place into every pool whose city
+    appears in its address, without rebuilding the pool. The pool rows are
+    locked (FOR UPDATE) until the caller commits, so concurrent inserts into
+    the same city queue up instead of overwriting each other's data.
+    """
+    groups = place_groups(place.category)
+    if not groups or not place.address or place.latitude is None or place.longitude is None:
+        return
+    cities = address_cities(place.address)
+    if not cities:
+        return
+    pools = db.query(CityPool).filter(CityPool.city.in_(cities)).order_by(CityPool.city).with_for_update().all()
+    for pool in pools:
+        data = pool.data
+        if str(place.id) in data["places"]:
+            continue
+        entry = _place_entry(place)
+        changed = False
+        for g in groups:
+            ids = data["top"].setdefault(g, [])
+            ranked = sorted([data["places"][str(i)] for i in ids] + [entry], key=_rank_key)[:top_n]
+            if any(e["id"] == place.id for e in ranked):
+                data["top"][g] = [e["id"] for e in ranked]
+                changed = True
+        if not changed:
+            continue
+
+        data["places"][str(place.id)] = entry
+        for cluster in data["clusters"]:
+            if any(haversine(entry["lat"], entry["lon"], data["places"][str(i)]["lat"], data["places"][str(i)]["lon"]) <= CLUSTER_KM
+                   for i in cluster):
+                cluster.append(place.id)
+                break
+        else:
+            data["clusters"].append([place.id])
+
+        # places that fell out of every top list are dropped from the pool
+        keep = {i for ids in data["top"].values() for i in ids}
+        data["places"] = {k: v for k, v in data["places"].items() if int(k) in keep}
+        data["clusters"] = [c for c in ([i for i in c if i in keep] for c in data["clusters"]) if c]
+
+        pool.data = data
+        pool.place_count = len(data["places"])
+        flag_modified(pool, "data")
+
+
+def main(argv=None):
+    from app.db import SessionLocal
+
+    args = sys.argv[1:] if argv is None else argv
+    db = SessionLocal()
+    try:
+        n = refresh_all_pools(db, args or None)
+    finally:
+        db.close()
+    print(f"refreshed {n} city pools")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# app/services/export.py
+"""
+Itinerary export to iCalendar, GPX and CSV.
+
+Exports render the stored days and activities of a trip. Rows come from one
+query streamed in batches (a server-side cursor on Postgres) and are written
+out as they arrive, so memory stays flat however long the trip is.
+
+A rendered export is cached on disk under EXPORT_CACHE_DIR, keyed by trip id,
+trip version, a fingerprint of the trip's place data and format. Every PATCH
+bumps the version and every details refresh of a place moves the
+fingerprint, either of which invalidates the cache. The first request tees
+its stream into the cache file. The file is only published if the trip and
+its places are still the same once rendering finishes.
+"""
+import csv
+import glob
+import hashlib
+import io
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.trip import Trip, TripSegment, TripDay, Activity, Place
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "onetrip-exports")
+YIELD_PER = 500
+CHUNK_SIZE = 64 * 1024
+DEFAULT_DURATION = timedelta(hours=1)
+
+_TIME = re.compile(r"^(\d{1,2}):(\d{2})")
+
+COLUMNS = [
+    "segment", "country", "day_number", "date", "start_time", "end_time", "activity", "type",
+    "place", "address", "latitude", "longitude", "estimated_cost", "notes", "activity_id",
+]
+
+
+def iter_activity_rows(db: Session, trip_id: int) -> Iterator[Dict]:
+    """Activities of a trip in itinerary order, one dict per activity, streamed from the database."""
+    q = db.query(
+        TripDay.id, TripSegment.city, TripSegment.country, TripDay.day_number, TripDay.date,
+        Activity.id, Activity.name, Activity.type, Activity.start_time, Activity.end_time,
+        Activity.latitude, Activity.longitude, Activity.estimated_cost, Activity.notes,
+        Place.name, Place.address, Place.latitude, Place.longitude,
+    ).join(TripDay, TripDay.segment_id == TripSegment.id).join(
+        Activity, Activity.day_id == TripDay.id
+    ).outerjoin(Place, Place.id == Activity.place_id).filter(
+        TripSegment.trip_id == trip_id
+    ).order_by(
+        TripSegment.start_date, TripSegment.id, TripDay.day_number, TripDay.id, Activity.id
+    ).execution_options(yield_per=YIELD_PER)
+
+    # start_time is free text ("9:00" sorts after "10:00"), so each day's
+    # activities are put in time order here; a day is only a handful of rows
+    day_key, day_rows = None, []
+    for row in _rows(q):
+        if row["day_id"] != day_key:
+            yield from sorted(day_rows, key=_time_order)
+            day_key, day_rows = row["day_id"], []
+        day_rows.append(row)
+    yield from sorted(day_rows, key=_time_order)
+
+
+def _time_order(row: Dict):
+    start = _at(row["date"], row["start_time"])
+    # untimed activities last, as they were entered
+    return (start is None, start or datetime.min, row["activity_id"])
+
+
+def _rows(q) -> Iterator[Dict]:
+    for (day_id, city, country, day_number, day, activity_id, name, type_, start, end, lat, lon, cost, notes,
+         place_name, address, place_lat, place_lon) in q:
+        yield {
+            "day_id": day_id,
+            "segment": city,
+            "country": country,
+            "day_number": day_number,
+            "date": day,
+            "start_time": start,
+            "end_time": end,
+            "activity": name,
+            "type": type_,
+            "place": place_name,
+            "address": address,
+            "latitude": lat if lat is not None else place_lat,
+            "longitude": lon if lon is not None else place_lon,
+            "estimated_cost": cost,
+            "notes": notes,
+            "activity_id": activity_id,
+        }
+
+
+# -----------------------
+# Renderers: rows -> text chunks
+# -----------------------
+def render_csv(rows: Iterable[Dict], trip_id: int) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in COLUMNS])
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _ics_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r", "").replace("\n", "\\n")
+
+
+def _ics_line(line: str) -> str:
+    # fold at 75 octets, continuation lines start with a space (RFC 5545 3.1)
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line + "\r\n"
+    out, start, limit = [], 0, 75
+    while start < len(raw):
+        end = min(start + limit, len(raw))
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1  # don't split a UTF-8 sequence
+        out.append(raw[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(out) + "\r\n"
+
+
+def _at(day, value: Optional[str]) -> Optional[datetime]:
+    m = _TIME.match(value or "")
+    if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59:
+        return None
+    return datetime(day.year, day.month, day.day, int(m.group(1)), int(m.group(2)))
+
+
+def render_ics(rows: Iterable[Dict], trip_id: int) -> Iterator[str]:
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    yield "".join(_ics_line(line) for line in (
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//OneTrip//Itinerary Export//EN", "CALSCALE:GREGORIAN",
+    ))
+    for row in rows:
+        lines = ["BEGIN:VEVENT", f"UID:activity-{row['activity_id']}@onetrip", f"DTSTAMP:{stamp}"]
+        start = _at(row["date"], row["start_time"])
+        if start is None:
+            # no usable time: an all-day event on the activity's day
+            lines.append(f"DTSTART;VALUE=DATE:{row['date']:%Y%m%d}")
+            lines.append(f"DTEND;VALUE=DATE:{row['date'] + timedelta(days=1):%Y%m%d}")
+        else:
+            end = _at(row["date"], row["end_time"])
+            if end is None or end <= start:
+                end = start + DEFAULT_DURATION
+            # floating local times: the traveller's calendar shows them in the city's clock
+            lines.append(f"DTSTART:{start:%Y%m%dT%H%M%S}")
+            lines.append(f"DTEND:{end:%Y%m%dT%H%M%S}")
+        lines.append(f"SUMMARY:{_ics_escape(row['activity'])}")
+        location = ", ".join(x for x in (row["place"], row["address"] or row["segment"]) if x)
+        if location:
+            lines.append(f"LOCATION:{_ics_escape(location)}")
+        if row["latitude"] is not None and row["longitude"] is not None:
+            lines.append(f"GEO:{row['latitude']:.6f};{row['longitude']:.6f}")
+        if row["notes"]:
+            lines.append(f"DESCRIPTION:{_ics_escape(row['notes'])}")
+        lines.append("END:VEVENT")
+        yield "".join(_ics_line(line) for line in lines)
+    yield _ics_line("END:VCALENDAR")
+
+
+def _xml(text) -> str:
+    return (str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            .replace('"', "&quot;"))
+
+
+def render_gpx(rows: Iterable[Dict], trip_id: int) -> Iterator[str]:
+    """One GPX route per day, with the day's activities as route points."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="OneTrip" xmlns="http://www.topografix.com/GPX/1/1">\n'
+           f'<metadata><name>Trip {trip_id}</name></metadata>\n')
+    current = None
+    for row in rows:
+        if row["latitude"] is None or row["longitude"] is None:
+            continue
+        day = (row["segment"], row["date"])
+        parts = []
+        if day != current:
+            if current is not None:
+                parts.append("</rte>\n")
+            parts.append(f"<rte><name>{_xml(row['segment'])} day {row['day_number']} ({row['date']})</name>\n")
+            current = day
+        point = f'<rtept lat="{row["latitude"]:.6f}" lon="{row["longitude"]:.6f}">'
+        start = _at(row["date"], row["start_time"])
+        if start is not None:
+            point += f"<time>{start:%Y-%m-%dT%H:%M:%S}</time>"
+        point += f"<name>{_xml(row['activity'])}</name>"
+        if row["place"]:
+            point += f"<desc>{_xml(row['place'])}</desc>"
+        if row["type"]:
+            point += f"<type>{_xml(row['type'])}</type>"
+        parts.append(point + "</rtept>\n")
+        yield "".join(parts)
+    if current is not None:
+        yield "</rte>\n"
+    yield "</gpx>\n"
+
+
+# format -> (renderer, media type)
+FORMATS: Dict[str, Tuple[Callable, str]] = {
+    "ics": (render_ics, "text/calendar; charset=utf-8"),
+    "gpx": (render_gpx, "application/gpx+xml"),
+    "csv": (render_csv, "text/csv; charset=utf-8"),
+}
+
+
+# -----------------------
+# Cache
+# -----------------------
+def place_fingerprint(db: Session, trip_id: int) -> str:
+    """Short digest of when the trip's places last changed; exports embed place names and addresses."""
+    count, updated = db.query(func.count(func.distinct(Place.id)), func.max(Place.details_updated_at)).join(
+        Activity, Activity.place_id == Place.id
+    ).join(TripDay, TripDay.id == Activity.day_id).join(
+        TripSegment, TripSegment.id == TripDay.segment_id
+    ).filter(TripSegment.trip_id == trip_id).one()
+    return hashlib.sha1(f"{count}:{updated}".encode()).hexdigest()[:8]
+
+
+def _cache_path(trip_id: int, version: int, fingerprint: str, fmt: str) -> str:
+    return os.path.join(EXPORT_CACHE_DIR, f"{trip_id}-{version}-{fingerprint}.{fmt}")
+
+
+def cached_export(trip_id: int, version: int, fingerprint: str, fmt: str) -> Optional[str]:
+    path = _cache_path(trip_id, version, fingerprint, fmt)
+    return path if os.path.exists(path) else None
+
+
+def _read_file(f) -> Iterator[bytes]:
+    with f:
+        while True:
+            block = f.read(CHUNK_SIZE)
+            if not block:
+                return
+            yield block
+
+
+def _current_version(db: Session, trip_id: int) -> Optional[int]:
+    return db.query(Trip.version).filter(Trip.id == trip_id).scalar()
+
+
+def _render_and_cache(db: Session, trip_id: int, version: int, fingerprint: str, fmt: str) -> Iterator[bytes]:
+    render, _ = FORMATS[fmt]
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_CACHE_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in render(iter_activity_rows(db, trip_id), trip_id):
+                data = chunk.encode()
+                out.write(data)
+                yield data
+        if _current_version(db, trip_id) != version or place_fingerprint(db, trip_id) != fingerprint:
+            return  # edited while we rendered: the file may mix two versions
+        path = _cache_path(trip_id, version, fingerprint, fmt)
+        os.replace(tmp, path)
+        tmp = None
+        for old in glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{trip_id}-*.{fmt}")):
+            if old != path:
+                try:
+                    os.unlink(old)
+                except FileNotFoundError:
+                    pass
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def export_stream(db: Session, trip_id: int, version: int, fingerprint: str, fmt: str) -> Iterator[bytes]:
+    """Bytes of the export for this trip version and place fingerprint, from the cache when it was rendered before."""
+    path = cached_export(trip_id, version, fingerprint, fmt)
+    if path is not None:
+        try:
+            return _read_file(open(path, "rb"))
+        except FileNotFoundError:
+            pass  # replaced by a newer version in between
+    return _render_and_cache(db, trip_id, version, fingerprint, fmt)
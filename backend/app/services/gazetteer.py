@@ -0,0 +1,419 @@
+# app/services/gazetteer.py
+"""
+Offline city gazetteer: geocoding and autocomplete without a network call.
+
+Build an index from a GeoNames cities dump (cities500.txt, cities15000.txt,
+...; optionally countryInfo.txt for country names) once, then map it:
+
+    python -m app.services.gazetteer build cities15000.txt gazetteer.idx --countries countryInfo.txt
+    python -m app.services.gazetteer lookup gazetteer.idx "san fr"
+
+and set GAZETTEER_PATH=gazetteer.idx for the API. Lookups read the mmapped
+file in place. Nothing is loaded into Python objects up front, so workers
+share the page cache.
+
+Layout (native little endian, sections 8-byte aligned):
+
+    header    64 bytes: magic, version, top-k, prefix length, counts, CRC32
+    cities    CITY records (geoname id, lat, lon, population, country code)
+    keys      u32 string ids of normalized names, sorted; u32 city per key
+              (ties in population order, biggest first)
+    prefixes  u32 string ids of every name prefix up to PREFIX_LEN chars,
+              sorted; TOP_K i32 cities per prefix by population (-1 pads)
+    countries u32 string ids of normalized country names/codes, sorted;
+              u32 string id of the ISO code per entry
+    strings   u64 offsets, then the UTF-8 blob: name/admin1/timezone of
+              every city, then keys, prefixes and country strings
+
+Short prefixes (the expensive ones: "s" matches half the world) answer from
+the precomputed top-k table, a flattened trie of the first PREFIX_LEN
+levels. Longer ones binary-search the sorted keys and rank the (small)
+matching range by population.
+"""
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
+
+MAGIC = b"OTGAZET\0"
+VERSION = 1
+ALIGN = 8
+PREFIX_LEN = 4
+TOP_K = 10
+SCAN_LIMIT = 5000  # keys scanned for a long prefix before ranking
+STRINGS_PER_CITY = 3  # name, admin1 code, timezone
+
+# magic, version, top-k, prefix len, cities, keys, prefixes, countries, strings, blob size
+HEADER = struct.Struct("<8sHHHxxIIIIIQ")
+HEADER_SIZE = 64
+# geoname id, lat, lon, population, country code
+CITY = struct.Struct("<IffI2s2x")
+
+# GeoNames "geoname" table columns
+COL_ID, COL_NAME, COL_ASCII, COL_ALT, COL_LAT, COL_LON, COL_CLASS = 0, 1, 2, 3, 4, 5, 6
+COL_COUNTRY, COL_ADMIN1, COL_POPULATION, COL_TZ = 8, 10, 14, 17
+
+
+class GazetteerError(ValueError):
+    pass
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase, accents stripped, punctuation to single spaces: "São  Paulo" -> "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    out = []
+    for ch in decomposed:
+        if unicodedata.combining(ch):
+            continue
+        out.append(ch.lower() if ch.isalnum() else " ")
+    return " ".join("".join(out).split())
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+# -----------------------
+# Building
+# -----------------------
+def read_geonames(path: str, min_population: int = 0, alternate_names: bool = False) -> Iterator[Tuple[Dict, List[str]]]:
+    """(city, names to index) per populated place of a GeoNames dump."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 19 or cols[COL_CLASS] != "P":
+                continue
+            population = int(cols[COL_POPULATION] or 0)
+            if population < min_population:
+                continue
+            names = [cols[COL_NAME], cols[COL_ASCII]]
+            if alternate_names and cols[COL_ALT]:
+                names.extend(n for n in cols[COL_ALT].split(",") if len(n) <= 64)
+            yield {
+                "id": int(cols[COL_ID]),
+                "name": cols[COL_NAME],
+                "lat": float(cols[COL_LAT]),
+                "lon": float(cols[COL_LON]),
+                "country": cols[COL_COUNTRY][:2],
+                "admin1": cols[COL_ADMIN1],
+                "population": min(population, 0xFFFFFFFF),
+                "timezone": cols[COL_TZ],
+            }, names
+
+
+def read_country_info(path: str) -> Dict[str, str]:
+    """Normalized country name/ISO/ISO3 -> ISO code, from GeoNames countryInfo.txt."""
+    out = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 5 or len(cols[0]) != 2:
+                continue
+            for name in (cols[0], cols[1], cols[4]):
+                if name:
+                    out[normalize_name(name)] = cols[0]
+    return out
+
+
+def build_index(path: str, cities: Iterable[Tuple[Dict, List[str]]], countries: Optional[Dict[str, str]] = None) -> int:
+    """Write an index file atomically. Returns the number of cities."""
+    rows = list(cities)
+    countries = dict(countries or {})
+    for city, _ in rows:
+        if city["country"]:
+            countries.setdefault(normalize_name(city["country"]), city["country"])
+
+    strings: List[bytes] = []
+    city_blob = bytearray()
+    for city, _ in rows:
+        city_blob += CITY.pack(city["id"], city["lat"], city["lon"], city["population"], city["country"].encode()[:2])
+        strings.extend(s.encode() for s in (city["name"], city["admin1"], city["timezone"]))
+
+    # normalized name -> cities, biggest first
+    keyed = {}
+    for ci, (city, names) in enumerate(rows):
+        for key in {normalize_name(n) for n in names}:
+            if key:
+                keyed.setdefault(key, set()).add(ci)
+    population = [c["population"] for c, _ in rows]
+    keys = sorted(keyed, key=lambda k: k.encode())
+    key_str, key_city = array("I"), array("I")
+    for i, key in enumerate(keys):
+        for ci in sorted(keyed[key], key=lambda c: (-population[c], c)):
+            key_str.append(len(strings) + i)  # one string per distinct key
+            key_city.append(ci)
+
+    # prefix -> top-k cities by population
+    members_by_prefix: Dict[str, set] = {}
+    for key, members in keyed.items():
+        for n in range(1, min(PREFIX_LEN, len(key)) + 1):
+            members_by_prefix.setdefault(key[:n], set()).update(members)
+    prefixes = sorted(members_by_prefix, key=lambda p: p.encode())
+    prefix_top = array("i")
+    for p in prefixes:
+        best = heapq.nlargest(TOP_K, members_by_prefix[p], key=lambda i: (population[i], -i))
+        prefix_top.extend(best + [-1] * (TOP_K - len(best)))
+
+    country_keys = sorted(countries, key=lambda k: k.encode())
+    strings.extend(k.encode() for k in keys)
+    base = len(strings)
+    prefix_str = array("I", range(base, base + len(prefixes)))
+    strings.extend(p.encode() for p in prefixes)
+    base = len(strings)
+    country_str = array("I", range(base, base + len(country_keys)))
+    strings.extend(k.encode() for k in country_keys)
+    base = len(strings)
+    country_code = array("I", range(base, base + len(country_keys)))
+    strings.extend(countries[k].encode() for k in country_keys)
+
+    offsets = array("Q", [0])
+    total = 0
+    for s in strings:
+        total += len(s)
+        offsets.append(total)
+    blob = b"".join(strings)
+
+    sections = [bytes(city_blob), key_str.tobytes(), key_city.tobytes(), prefix_str.tobytes(), prefix_top.tobytes(),
+                country_str.tobytes(), country_code.tobytes(), offsets.tobytes(), blob]
+    body = b"".join(s.ljust(_align(len(s)), b"\0") for s in sections)
+    head = HEADER.pack(MAGIC, VERSION, TOP_K, PREFIX_LEN, len(rows), len(key_city), len(prefixes),
+                       len(country_keys), len(strings), len(blob))
+    head += struct.pack("<I", zlib.crc32(head) ^ zlib.crc32(body))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(head.ljust(HEADER_SIZE, b"\0"))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(rows)
+
+
+# -----------------------
+# Reading
+# -----------------------
+class Gazetteer:
+    """A memory-mapped index; all lookups read the mapping in place."""
+
+    def __init__(self, path: str, check: bool = False):
+        if sys.byteorder != "little":
+            raise GazetteerError("gazetteer indexes are little endian")
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._mm
+        if len(buf) < HEADER_SIZE:
+            raise GazetteerError("file too short for a gazetteer header")
+        (magic, version, self.top_k, self.prefix_len, self.n_cities, self.n_keys, self.n_prefixes,
+         self.n_countries, n_strings, blob_size) = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise GazetteerError("not a gazetteer index")
+        if version != VERSION:
+            raise GazetteerError(f"gazetteer index v{version} does not match v{VERSION}; rebuild it")
+        if check:
+            (crc,) = struct.unpack_from("<I", buf, HEADER.size)
+            if crc != zlib.crc32(bytes(buf[:HEADER.size])) ^ zlib.crc32(buf[HEADER_SIZE:]):
+                raise GazetteerError("checksum mismatch")
+
+        view = memoryview(buf)
+        offset = HEADER_SIZE
+
+        def section(size: int, fmt: Optional[str] = None):
+            nonlocal offset
+            part = view[offset:offset + size]
+            if len(part) != size:
+                raise GazetteerError("gazetteer index is truncated")
+            offset += _align(size)
+            return part.cast(fmt) if fmt else part
+
+        self._cities_off = offset
+        section(self.n_cities * CITY.size)
+        self._key_str = section(self.n_keys * 4, "I")
+        self._key_city = section(self.n_keys * 4, "I")
+        self._prefix_str = section(self.n_prefixes * 4, "I")
+        self._prefix_top = section(self.n_prefixes * self.top_k * 4, "i")
+        self._country_str = section(self.n_countries * 4, "I")
+        self._country_code = section(self.n_countries * 4, "I")
+        self._offsets = section((n_strings + 1) * 8, "Q")
+        self._blob = section(blob_size)
+
+    def _bytes(self, i: int) -> bytes:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def _string(self, i: int) -> str:
+        return self._bytes(i).decode()
+
+    def _lower_bound(self, index, n: int, target: bytes) -> int:
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(index[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def city(self, ci: int) -> Dict:
+        geoname_id, lat, lon, population, country = CITY.unpack_from(self._mm, self._cities_off + ci * CITY.size)
+        base = ci * STRINGS_PER_CITY
+        return {
+            "id": geoname_id,
+            "name": self._string(base),
+            "admin1": self._string(base + 1) or None,
+            "country": country.decode(),
+            "lat": round(lat, 5),
+            "lon": round(lon, 5),
+            "population": population,
+            "timezone": self._string(base + 2) or None,
+        }
+
+    def _population(self, ci: int) -> int:
+        return CITY.unpack_from(self._mm, self._cities_off + ci * CITY.size)[3]
+
+    def _country(self, ci: int) -> bytes:
+        return CITY.unpack_from(self._mm, self._cities_off + ci * CITY.size)[4]
+
+    def country_code(self, country: Optional[str]) -> Optional[str]:
+        """ISO code for a country name or code ("India", "IN", "IND"); None when unknown."""
+        key = normalize_name(country or "").encode()
+        if not key:
+            return None
+        i = self._lower_bound(self._country_str, self.n_countries, key)
+        if i < self.n_countries and self._bytes(self._country_str[i]) == key:
+            return self._string(self._country_code[i])
+        return None
+
+    def _matches(self, key: bytes, exact: bool) -> Iterator[int]:
+        i = self._lower_bound(self._key_str, self.n_keys, key)
+        while i < self.n_keys:
+            k = self._bytes(self._key_str[i])
+            if k != key if exact else not k.startswith(key):
+                return
+            yield self._key_city[i]
+            i += 1
+
+    def lookup(self, name: str, country: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Cities whose name (or indexed alternate name) is exactly `name`, biggest first."""
+        key = normalize_name(name).encode()
+        code = self.country_code(country)  # an unknown country does not filter
+        code = code.encode() if code else None
+        out, seen = [], set()
+        for ci in self._matches(key, exact=True):
+            if ci in seen or (code and self._country(ci) != code):
+                continue
+            seen.add(ci)
+            out.append(ci)
+            if len(out) >= limit:
+                break
+        return [self.city(ci) for ci in out]
+
+    def autocomplete(self, prefix: str, country: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Cities with a name starting with `prefix`, biggest first."""
+        key = normalize_name(prefix).encode()
+        if not key:
+            return []
+        code = None
+        if country:
+            code = self.country_code(country)
+            if code is None:
+                return []
+            code = code.encode()
+
+        if code is None and limit <= self.top_k and len(key.decode()) <= self.prefix_len:
+            i = self._lower_bound(self._prefix_str, self.n_prefixes, key)
+            if i >= self.n_prefixes or self._bytes(self._prefix_str[i]) != key:
+                return []
+            row = self._prefix_top[i * self.top_k:(i + 1) * self.top_k]
+            return [self.city(ci) for ci in row[:limit] if ci >= 0]
+
+        found = set()
+        for n, ci in enumerate(self._matches(key, exact=False)):
+            if n >= SCAN_LIMIT:
+                break
+            if code is None or self._country(ci) == code:
+                found.add(ci)
+        best = heapq.nlargest(limit, found, key=lambda ci: (self._population(ci), -ci))
+        return [self.city(ci) for ci in best]
+
+    def resolve(self, city: str, country: Optional[str] = None) -> Optional[Dict]:
+        """Most populous city called `city` (in `country` when it is known), or None."""
+        if country and self.country_code(country):
+            hits = self.lookup(city, country, limit=1)
+            if hits:
+                return hits[0]
+        hits = self.lookup(city, limit=1)
+        return hits[0] if hits else None
+
+
+_gazetteer: Optional[Gazetteer] = None
+_lock = threading.Lock()
+
+
+def load(path: Optional[str] = GAZETTEER_PATH) -> Optional[Gazetteer]:
+    """Map the index at `path` for this process."""
+    global _gazetteer
+    with _lock:
+        _gazetteer = Gazetteer(path) if path else None
+    return _gazetteer
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """The process-wide index, mapped on first use; None when GAZETTEER_PATH is not set."""
+    if _gazetteer is None and GAZETTEER_PATH:
+        with _lock:
+            if _gazetteer is None:
+                return load(GAZETTEER_PATH)
+    return _gazetteer
+
+
+def resolve_city(city: str, country: Optional[str] = None) -> Optional[Dict]:
+    gaz = get_gazetteer()
+    return gaz.resolve(city, country) if gaz is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="offline city gazetteer")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="index a GeoNames cities dump")
+    build.add_argument("source", help="GeoNames cities file (cities500.txt, cities15000.txt, ...)")
+    build.add_argument("path", help="index file to write")
+    build.add_argument("--countries", help="GeoNames countryInfo.txt, to resolve country names")
+    build.add_argument("--min-population", type=int, default=0)
+    build.add_argument("--alternate-names", action="store_true", help="also index alternate names")
+    look = sub.add_parser("lookup", help="autocomplete a prefix")
+    look.add_argument("path")
+    look.add_argument("prefix")
+    look.add_argument("--country")
+    look.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        countries = read_country_info(args.countries) if args.countries else None
+        t0 = time.perf_counter()
+        n = build_index(args.path, read_geonames(args.source, args.min_population, args.alternate_names), countries)
+        size = os.path.getsize(args.path)
+        print(f"indexed {n} cities into {args.path} ({size / 1e6:.1f} MB) in {time.perf_counter() - t0:.1f}s")
+    else:
+        gaz = Gazetteer(args.path, check=True)
+        t0 = time.perf_counter()
+        hits = gaz.autocomplete(args.prefix, args.country, args.limit)
+        elapsed = (time.perf_counter() - t0) * 1000
+        for h in hits:
+            print(f"{h['name']:<32}{h['country']:<4}{h['admin1'] or '':<8}{h['population']:>10}  {h['lat']},{h['lon']}")
+        print(f"{len(hits)} results in {elapsed:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# app/services/geo.py
+
+from typing import List, Dict
+from math import radians, sin, cos, sqrt, atan2
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+def nearest_point(current, points):
+    """Return nearest point from a current location."""
+    best = None
+    best_dist = float("inf")
+    for p in points:
+        d = haversine(current["lat"], current["lon"], p["lat"], p["lon"])
+        if d < best_dist:
+            best = p
+            best_dist = d
+    return best
+
+def cluster_places_by_distance(places: List[Dict], cluster_km=3.0):
+    """
+    Groups places into nearby clusters (simple version).
+    """
+    clusters = []
+    for p in places:
+        placed = False
+        for cluster in clusters:
+            for c in cluster:
+                if haversine(p["lat"], p["lon"], c["lat"], c["lon"]) <= cluster_km:
+                    cluster.append(p)
+                    placed = True
+                    break
+            if placed:
+                break
+        if not placed:
+            clusters.append([p])
+    return clusters
+
+# -----------------------
+# Geohash (used for the spatial index on places.geohash)
+# -----------------------
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5m cells, stored on every place
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(GEOHASH_BASE32[ch])
+            bits = 0
+            ch = 0
+    return "".join(out)
+
+def geohash_cell_size(precision: int):
+    """(lat degrees, lon degrees) covered by one cell of the given precision."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+def _bbox_points(lo: float, hi: float, step: float) -> List[float]:
+    # one point per cell along the span (plus the far edge), so every cell it crosses is hit
+    n = int((hi - lo) / step) + 1
+    return [lo + i * step for i in range(n)] + [hi]
+
+def geohash_cover_circle(lat: float, lon: float, radius_m: float, max_cells: int = 32) -> List[str]:
+    """
+    Geohash cells covering the circle's bounding box, at the finest precision
+    that needs at most max_cells of them (9 cells of ~5km for a 5km radius,
+    4 of ~600m for 500m), so the prefix scan stays close to the circle.
+    """
+    dlat_deg = radius_m / 111_320
+    dlon_deg = radius_m / (111_320 * max(cos(radians(lat)), 0.01))
+    lat_lo, lat_hi = max(lat - dlat_deg, -89.999999), min(lat + dlat_deg, 89.999999)
+    lon_lo, lon_hi = lon - dlon_deg, lon + dlon_deg
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lon = geohash_cell_size(precision)
+        n_lat = int((lat_hi - lat_lo) / cell_lat) + 2
+        n_lon = int((lon_hi - lon_lo) / cell_lon) + 2
+        if n_lat * n_lon <= max_cells or precision == 1:
+            break
+    cells = []
+    for plat in _bbox_points(lat_lo, lat_hi, cell_lat):
+        for plon in _bbox_points(lon_lo, lon_hi, cell_lon):
+            cell = geohash_encode(plat, (plon + 180.0) % 360.0 - 180.0, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
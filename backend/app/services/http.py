@@ -0,0 +1,28 @@
+# app/services/http.py
+"""
+Shared outbound HTTP session for provider calls. `requests` is imported and
+the session (with its connection pool) created on first use, and closed by
+the app's lifespan on shutdown.
+"""
+import threading
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                _session = requests.Session()
+    return _session
+
+
+def close_session():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
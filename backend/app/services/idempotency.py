@@ -0,0 +1,148 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key support for retried POSTs.
+
+The first request with a key claims it by inserting a row (unique per user,
+route and key) and stores its response when it finishes. A retry with the
+same key and payload then gets the stored response back without running the
+handler again. If the first request is still running, the retry gets 409.
+If the key is reused with a different payload, it gets 422.
+
+A claim whose request died before finishing is taken over after
+IDEMPOTENCY_LOCK_TIMEOUT seconds. Stored responses expire after
+IDEMPOTENCY_TTL seconds. Remove expired rows from cron with:
+
+    python -m app.services.idempotency
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import orjson
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency import IdempotencyRecord
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))  # seconds
+LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "120"))  # seconds
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+
+def _find(db: Session, user_id: int, scope: str, key: str) -> Optional[IdempotencyRecord]:
+    return db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.key == key,
+    ).one_or_none()
+
+
+def begin(db: Session, user_id: int, scope: str, key: str, payload) -> Optional[IdempotencyRecord]:
+    """
+    Claim `key` for this request. Returns the finished record to replay, or
+    None when the caller should run the request (and then call complete/release).
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    fp = fingerprint(payload)
+    now = datetime.utcnow()
+
+    db.add(IdempotencyRecord(
+        user_id=user_id, scope=scope, key=key, fingerprint=fp,
+        created_at=now, expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+    ))
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    record = _find(db, user_id, scope, key)
+    if record is None:
+        # expired row purged in between: claim again
+        return begin(db, user_id, scope, key, payload)
+
+    expired = record.expires_at <= now
+    abandoned = record.status_code is None and record.created_at <= now - timedelta(seconds=LOCK_TIMEOUT)
+    if expired or abandoned:
+        # take the key over; the created_at check makes concurrent takeovers race safely
+        taken = db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.id == record.id,
+            IdempotencyRecord.created_at == record.created_at,
+        ).update({
+            IdempotencyRecord.fingerprint: fp,
+            IdempotencyRecord.status_code: None,
+            IdempotencyRecord.response: None,
+            IdempotencyRecord.created_at: now,
+            IdempotencyRecord.expires_at: now + timedelta(seconds=IDEMPOTENCY_TTL),
+        }, synchronize_session=False)
+        db.commit()
+        if taken:
+            return None
+        raise IdempotencyError(409, "A request with this Idempotency-Key is already in progress")
+
+    if record.fingerprint != fp:
+        raise IdempotencyError(422, "Idempotency-Key was already used with a different request")
+    if record.status_code is None:
+        raise IdempotencyError(409, "A request with this Idempotency-Key is already in progress")
+    return record
+
+
+def complete(db: Session, user_id: int, scope: str, key: str, status_code: int, response):
+    """Store the response of a claimed request; `response` must be JSON-serializable."""
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.key == key,
+    ).update({
+        IdempotencyRecord.status_code: status_code,
+        IdempotencyRecord.response: response,
+    }, synchronize_session=False)
+    db.commit()
+
+
+def release(db: Session, user_id: int, scope: str, key: str):
+    """Drop the claim of a request that failed, so a retry runs it again."""
+    db.rollback()
+    db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.scope == scope,
+        IdempotencyRecord.key == key,
+        IdempotencyRecord.status_code.is_(None),
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def purge_expired(db: Session) -> int:
+    n = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return n
+
+
+def main():
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        n = purge_expired(db)
+    finally:
+        db.close()
+    print(f"purged {n} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,47 +2,13 @@
 
 from typing import List, Dict
 from sqlalchemy.orm import Session
-from math import radians, sin, cos, sqrt, atan2
 from app.models.trip import Place
-from random import shuffle
-
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
-
-def nearest_point(current, points):
-    """Return nearest point from a current location."""
-    best = None
-    best_dist = float("inf")
-    for p in points:
-        d = haversine(current["lat"], current["lon"], p["lat"], p["lon"])
-        if d < best_dist:
-            best = p
-            best_dist = d
-    return best
-
-def cluster_places_by_distance(places: List[Dict], cluster_km=3.0):
-    """
-    Groups places into nearby clusters (simple version).
-    """
-    clusters = []
-    for p in places:
-        placed = False
-        for cluster in clusters:
-            for c in cluster:
-                if haversine(p["lat"], p["lon"], c["lat"], c["lon"]) <= cluster_km:
-                    cluster.append(p)
-                    placed = True
-                    break
-            if placed:
-                break
-        if not placed:
-            clusters.append([p])
-    return clusters
+from app.services.city_pool import get_city_pools, normalize_city
+from app.services.assignment import assign_days, CANDIDATES_PER_SLOT
+from app.services.scoring import rank_candidates
+from app.services.budget import DayBudget, OVERSUBSCRIBE
+from app.services.travel_cost import travel_costs, route_by_cost, route_totals
+from random import Random
 
 # def pick_places_by_preferences(db: Session, p):
 #     out = []
@@ -71,26 +37,26 @@ def pick_places_by_preferences(db: Session, p):
     # If no preferences -> use a general default
     if p is None:
         class DefaultPref:
-            is_foodie = True
-            likes_shopping = True
-            wants_nightlife = False
+            foodie = True
+            shopping = True
+            nightlife = False
             pace = "normal"
         p = DefaultPref()
 
     out = []
 
     # Food places
-    if getattr(p, "is_foodie", False):
+    if getattr(p, "foodie", False):
         out.extend(db.query(Place).filter(Place.category.ilike("%restaurant%")).limit(50).all())
         out.extend(db.query(Place).filter(Place.category.ilike("%cafe%")).limit(50).all())
 
     # Shopping
-    if getattr(p, "likes_shopping", False):
+    if getattr(p, "shopping", False):
         out.extend(db.query(Place).filter(Place.category.ilike("%mall%")).limit(50).all())
         out.extend(db.query(Place).filter(Place.category.ilike("%shopping%")).limit(50).all())
 
     # Nightlife
-    if getattr(p, "wants_nightlife", False):
+    if getattr(p, "nightlife", False):
         out.extend(db.query(Place).filter(Place.category.ilike("%bar%")).limit(50).all())
 
     # Always include sightseeing
@@ -107,65 +73,109 @@ def pick_places_by_preferences(db: Session, p):
     return list(unique.values())
 
 
-def build_itinerary_for_trip(db: Session, trip):
-    preferences = trip.preferences
-    pace_map = {"relaxed": 2, "normal": 4, "packed": 6}
-    per_day = pace_map.get(preferences.pace if preferences else "normal", 4)
+def pool_candidates(pool: Dict) -> List[Dict]:
+    """Every place of a city pool; the scorer decides which ones fit the traveller."""
+    return [dict(e) for e in pool["places"].values()]
 
-    # 1. Get list of places
+
+def pool_seeds(pool: Dict, candidates: List[Dict]) -> List[Dict]:
+    """Centres of the pool's precomputed clusters, biggest first, as initial day centres."""
+    wanted = {c["id"] for c in candidates}
+    places = pool["places"]
+    seeds = []
+    for cluster in sorted(pool["clusters"], key=len, reverse=True):
+        members = [places[str(i)] for i in cluster if i in wanted]
+        if members:
+            seeds.append({
+                "lat": sum(m["lat"] for m in members) / len(members),
+                "lon": sum(m["lon"] for m in members) / len(members),
+            })
+    return seeds
+
+
+def db_candidates(db: Session, preferences) -> List[Dict]:
+    """Fallback when a city has no precomputed pool: query candidates on the fly."""
     raw_places = pick_places_by_preferences(db, preferences)
-    places = [{
+    return [{
         "id": p.id,
         "name": p.name,
         "lat": p.latitude,
         "lon": p.longitude,
         "category": p.category,
         "rating": p.rating,
-        "source": p.source
+        "price_level": p.price_level,
+        "source": p.source,
+        "features": p.features
     } for p in raw_places if p.latitude and p.longitude]
 
-    if not places:
-        return {"itinerary": []}
-
-    # 2. Cluster places by distance
-    clusters = cluster_places_by_distance(places, cluster_km=3)
-
-    # Shuffle clusters for variety
-    shuffle(clusters)
 
-    itinerary = []
+def iter_itinerary_days(db: Session, trip):
+    """
+    Yields itinerary days one at a time, so callers can stream them
+    as soon as each segment's days are planned.
+    """
+    preferences = trip.preferences
+    pace_map = {"relaxed": 2, "normal": 4, "packed": 6}
+    per_day = pace_map.get(preferences.pace if preferences else "normal", 4)
 
-    day_index = 0
+    # 1. Load precomputed pools for every segment city in one query
+    pools = get_city_pools(db, [s.city for s in trip.segments])
+    # spending limit for activities, shared by all days of the trip (None: no limit)
+    budget = DayBudget.for_trip(trip, preferences, sum(len(s.days) for s in trip.segments))
+    # with a budget, each day gets spare candidates for the knapsack to choose from
+    spare = OVERSUBSCRIBE if budget is not None else 1
+    fallback = None
+    used = set()
+    position = None  # last visited place, so the next segment continues from there
+    rng = Random()
 
     for segment in trip.segments:
-        for day in segment.days:
-            if day_index >= len(clusters):
-                break
-
-            cluster = clusters[day_index]
-            shuffle(cluster)
-
-            # pick per_day places
-            selected = cluster[:per_day]
-
-            # sort by nearest-neighbor ordering
-            if selected:
-                route = [selected[0]]
-                remaining = selected[1:]
-
-                while remaining:
-                    nxt = nearest_point(route[-1], remaining)
-                    route.append(nxt)
-                    remaining.remove(nxt)
-            else:
-                route = []
-
-            itinerary.append({
+        days = list(segment.days)
+        if not days:
+            continue
+
+        # 2. Candidates for this segment: the city's pool, else the on-the-fly query
+        pool = pools.get(normalize_city(segment.city))
+        if pool:
+            candidates = pool_candidates(pool)
+        else:
+            if fallback is None:
+                fallback = db_candidates(db, preferences)
+            candidates = fallback
+        candidates = [c for c in candidates if c["id"] not in used]
+        # keep the best-scoring candidates for this traveller (a few per slot)
+        candidates = rank_candidates(candidates, preferences, k=len(days) * per_day * spare * CANDIDATES_PER_SLOT)
+        seeds = pool_seeds(pool, candidates) if pool else None
+
+        # 3. Balance candidates over the segment's days
+        plan = assign_days(candidates, len(days), per_day * spare, start=position, seeds=seeds, rng=rng)
+        if budget is not None:
+            # 3b. keep each day's best visits that fit its time slots and allowance
+            plan = [budget.select(route, per_day) for route in plan]
+
+        # 4. Travel costs for every same-day pair of the segment, in one batch
+        by_id = {p["id"]: p for route in plan for p in route}
+        pairs = [(a["id"], b["id"]) for route in plan for a in route for b in route if a["id"] != b["id"]]
+        costs = travel_costs.costs(db, by_id, pairs)
+
+        for day, route in zip(days, plan):
+            if not route:
+                continue
+            # keep the day's entry point, reorder the rest by travel time
+            route = route_by_cost(route, costs, start_id=route[0]["id"])
+            used.update(p["id"] for p in route)
+            position = route[-1]
+
+            out = {
                 "segment": segment.city,
                 "date": str(day.date),
-                "activities": route
-            })
+                "activities": route,
+                "travel": route_totals(route, costs)
+            }
+            if budget is not None:
+                out["estimated_cost"] = round(sum(p["estimated_cost"] for p in route), 2)
+            yield out
 
-            day_index += 1
 
-    return {"itinerary": itinerary}
+def build_itinerary_for_trip(db: Session, trip):
+    return {"itinerary": list(iter_itinerary_days(db, trip))}
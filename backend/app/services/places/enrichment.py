@@ -0,0 +1,216 @@
+# app/services/places/enrichment.py
+"""
+Background enrichment of cached places with Google Place Details.
+
+Each round picks the places whose details are missing or stale, most used in
+trips first. Hot places (used at least HOT_USES times) are refreshed once
+they are REFRESH_AHEAD of the way to their TTL, so they never go stale.
+Details are fetched concurrently through the provider governor, so the
+worker stays inside the same rate limit, breaker and daily quota as search.
+Each request asks only for the fields the place needs. Results are written
+back with one executemany UPDATE per batch.
+
+    python -m app.services.places.enrichment --limit 500 --workers 4
+    python -m app.services.places.enrichment --loop --interval 600
+"""
+import argparse
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+
+from app.models.trip import Activity, Place
+from app.services.places.google import google_place_details, GOOGLE_KEY, GooglePlacesError, DETAILS_BLOCKED
+from app.services.places.governance import governed_call, ProviderUnavailable
+from app.services.scoring import encode_features, place_features
+
+logger = logging.getLogger(__name__)
+
+DETAILS_TTL = timedelta(days=int(os.getenv("PLACES_DETAILS_TTL_DAYS", "30")))
+REFRESH_AHEAD = float(os.getenv("PLACES_DETAILS_REFRESH_AHEAD", "0.8"))
+HOT_USES = int(os.getenv("PLACES_DETAILS_HOT_USES", "5"))
+WORKERS = int(os.getenv("PLACES_DETAILS_WORKERS", "4"))
+BATCH_SIZE = int(os.getenv("PLACES_DETAILS_BATCH_SIZE", "100"))
+RATE_LIMIT_RETRIES = 20
+MAX_PHOTOS = 5
+
+# Place column -> Google Place Details field (the field mask)
+VOLATILE_FIELDS = {
+    "opening_hours": "opening_hours",
+    "rating": "rating",
+    "user_ratings_total": "user_ratings_total",
+    "price_level": "price_level",
+}
+# fetched once; if Google has nothing for them, asking again will not help
+STATIC_FIELDS = {
+    "photos": "photos",
+    "website": "website",
+    "phone": "formatted_phone_number",
+}
+
+
+def field_mask(place: Place) -> List[str]:
+    """Details fields worth paying for: volatile ones always, static ones only until the first fetch."""
+    fields = list(VOLATILE_FIELDS.values())
+    if place.details_updated_at is None:
+        fields.extend(f for col, f in STATIC_FIELDS.items() if getattr(place, col) is None)
+    return fields
+
+
+def pick_stale(db: Session, limit: int, now: Optional[datetime] = None) -> List[Tuple[int, Place]]:
+    """
+    (uses, place) for Google places that need details, best first:
+    never enriched, past their TTL, or hot and past REFRESH_AHEAD of it.
+    """
+    now = now or datetime.utcnow()
+    uses = func.count(Activity.id)
+    hot_cutoff = now - DETAILS_TTL * REFRESH_AHEAD
+    rows = db.query(Place, uses.label("uses")).outerjoin(Activity, Activity.place_id == Place.id).filter(
+        Place.source == "google",
+        Place.external_id.isnot(None),
+    ).group_by(Place.id).having(or_(
+        Place.details_updated_at.is_(None),
+        Place.details_updated_at < now - DETAILS_TTL,
+        and_(uses >= HOT_USES, Place.details_updated_at < hot_cutoff),
+    )).order_by(uses.desc(), Place.details_updated_at.asc().nullsfirst(), Place.id).limit(limit).all()
+    return [(n, p) for p, n in rows]
+
+
+def priority(uses: int, place: Place, now: datetime) -> float:
+    """Higher first: usage dominates, then how long the details have been missing or stale."""
+    if place.details_updated_at is None:
+        age = DETAILS_TTL.total_seconds()
+    else:
+        age = (now - place.details_updated_at).total_seconds()
+    return uses * DETAILS_TTL.total_seconds() + age
+
+
+def details_to_columns(details: Dict, requested: List[str]) -> Dict:
+    """Column values for the requested fields (a missing field clears volatile data, e.g. closed hours)."""
+    out = {}
+    if "opening_hours" in requested:
+        hours = details.get("opening_hours")
+        # open_now is stale as soon as it is stored
+        out["opening_hours"] = {k: hours[k] for k in ("weekday_text", "periods") if k in hours} if hours else None
+    if "photos" in requested:
+        photos = details.get("photos") or []
+        out["photos"] = [
+            {"ref": p.get("photo_reference"), "width": p.get("width"), "height": p.get("height")}
+            for p in photos[:MAX_PHOTOS] if p.get("photo_reference")
+        ] or None
+    for col, field in list(VOLATILE_FIELDS.items()) + list(STATIC_FIELDS.items()):
+        if col in ("opening_hours", "photos") or field not in requested:
+            continue
+        if field in details:
+            out[col] = details[field]
+    return out
+
+
+def _fetch(place_id: str, fields: List[str]) -> Dict:
+    # wait for a token instead of dropping the place when the bucket is empty
+    for _ in range(RATE_LIMIT_RETRIES):
+        try:
+            return governed_call("google", GOOGLE_KEY, google_place_details, place_id, fields)
+        except ProviderUnavailable as e:
+            if e.reason != "rate limited":
+                raise
+            time.sleep(0.2)
+    raise ProviderUnavailable("google", "rate limited")
+
+
+def _flush(db: Session, updates: List[Dict]):
+    if updates:
+        db.bulk_update_mappings(Place, updates)
+        db.commit()
+        updates.clear()
+
+
+def enrich_round(db: Session, limit: int = 500, workers: int = WORKERS, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Enrich up to `limit` places. Stops early when the provider is unavailable (breaker or quota)."""
+    now = datetime.utcnow()
+    queue = []
+    for uses, place in pick_stale(db, limit, now):
+        heapq.heappush(queue, (-priority(uses, place, now), place.id, place))
+
+    stats = {"picked": len(queue), "enriched": 0, "failed": 0}
+    updates: List[Dict] = []
+    stop = False
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while queue and not stop:
+            # keep at most a few requests per worker in flight, highest priority first
+            wave = [heapq.heappop(queue)[2] for _ in range(min(len(queue), workers * 2))]
+            futures = {}
+            for place in wave:
+                fields = field_mask(place)
+                futures[pool.submit(_fetch, place.external_id, fields)] = (place, fields)
+            for fut in as_completed(futures):
+                place, fields = futures[fut]
+                try:
+                    details = fut.result()
+                except ProviderUnavailable as e:
+                    logger.info("details enrichment paused: %s", e)
+                    stop = True
+                    continue
+                except GooglePlacesError as e:
+                    # not stamped: the place is picked again next round
+                    stats["failed"] += 1
+                    if e.status in DETAILS_BLOCKED:
+                        logger.warning("details enrichment paused: %s", e)
+                        stop = True
+                    else:
+                        logger.warning("details fetch failed for place %s: %s", place.id, e)
+                    continue
+                except Exception:
+                    logger.warning("details fetch failed for place %s", place.id, exc_info=True)
+                    stats["failed"] += 1
+                    continue
+
+                # an empty result (NOT_FOUND: the place is gone) only moves the timestamp
+                values = details_to_columns(details, fields) if details else {}
+                rating = values.get("rating", place.rating)
+                price_level = values.get("price_level", place.price_level)
+                values.update({
+                    "id": place.id,
+                    "details_updated_at": datetime.utcnow(),
+                    # rating and price feed the scoring vector
+                    "features": encode_features(place_features(place.category, rating, price_level)),
+                })
+                updates.append(values)
+                stats["enriched"] += 1
+                if len(updates) >= batch_size:
+                    _flush(db, updates)
+    _flush(db, updates)
+    return stats
+
+
+def main(argv=None):
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="fill cached places with Google Place Details")
+    parser.add_argument("--limit", type=int, default=500, help="places per round")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--loop", action="store_true", help="keep running rounds")
+    parser.add_argument("--interval", type=int, default=600, help="seconds between rounds with --loop")
+    args = parser.parse_args(argv)
+
+    while True:
+        db = SessionLocal()
+        try:
+            stats = enrich_round(db, args.limit, args.workers, args.batch_size)
+        finally:
+            db.close()
+        print(f"picked {stats['picked']}, enriched {stats['enriched']}, failed {stats['failed']}")
+        if not args.loop:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 # app/services/places/foursquare.py
 import os
-import requests
 from typing import Dict, List, Optional
 
+from app.services.http import get_session
+
 FSQ_KEY = os.getenv("FOURSQUARE_API_KEY")
 SEARCH_URL = "https://api.foursquare.com/v3/places/search"
 
@@ -19,7 +20,7 @@ def fsq_search(query: str, ll: Optional[str] = None, radius: int = 5000, limit:
     params = {"query": query, "limit": limit, "radius": radius}
     if ll:
         params["ll"] = ll
-    resp = requests.get(SEARCH_URL, headers=HEADERS, params=params, timeout=10)
+    resp = get_session().get(SEARCH_URL, headers=HEADERS, params=params, timeout=10)
     resp.raise_for_status()
     data = resp.json()
     # Foursquare returns 'results' list
@@ -1,12 +1,28 @@
 # app/services/places/google.py
 import os
-import requests
 from typing import Dict, List, Optional
 
+from app.services.http import get_session
+
 GOOGLE_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 TEXT_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
 
+# the place id no longer resolves: an answer, not a failure
+DETAILS_GONE = ("NOT_FOUND", "ZERO_RESULTS")
+# the key or the account is the problem: every further call (details or text
+# search) fails the same way
+DETAILS_BLOCKED = ("REQUEST_DENIED", "OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT")
+
+
+class GooglePlacesError(Exception):
+    """A Places API answer whose status is neither OK nor a definite "no such place"."""
+
+    def __init__(self, status: str, message: Optional[str] = None):
+        super().__init__(f"google places {status}" + (f": {message}" if message else ""))
+        self.status = status
+
+
 def google_text_search(query: str, location: Optional[str] = None, radius: Optional[int] = None, limit: int = 20) -> List[Dict]:
     """
     Simple wrapper around Google Places Text Search.
@@ -18,9 +34,15 @@ def google_text_search(query: str, location: Optional[str] = None, radius: Optio
         params["location"] = location
     if radius:
         params["radius"] = radius
-    resp = requests.get(TEXT_SEARCH_URL, params=params, timeout=10)
+    resp = get_session().get(TEXT_SEARCH_URL, params=params, timeout=10)
     resp.raise_for_status()
     data = resp.json()
+    # throttling and key problems come back as HTTP 200 with an error status
+    status = data.get("status", "OK")
+    if status == "ZERO_RESULTS":
+        return []
+    if status != "OK":
+        raise GooglePlacesError(status, data.get("error_message"))
     results = data.get("results", [])[:limit]
     return results
 
@@ -28,6 +50,12 @@ def google_place_details(place_id: str, fields: Optional[List[str]] = None) -> D
     params = {"key": GOOGLE_KEY, "place_id": place_id}
     if fields:
         params["fields"] = ",".join(fields)
-    resp = requests.get(DETAILS_URL, params=params, timeout=10)
+    resp = get_session().get(DETAILS_URL, params=params, timeout=10)
     resp.raise_for_status()
-    return resp.json().get("result", {})
+    data = resp.json()
+    status = data.get("status", "OK")
+    if status in DETAILS_GONE:
+        return {}
+    if status != "OK":
+        raise GooglePlacesError(status, data.get("error_message"))
+    return data.get("result", {})
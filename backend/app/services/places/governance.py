@@ -0,0 +1,268 @@
+# app/services/places/governance.py
+"""
+Provider governance: every external places call goes through `governed_call`,
+which applies, per provider API key,
+
+- a token-bucket rate limiter (skip instead of waiting to be throttled),
+- a circuit breaker (skip a failing provider until its cooldown ends),
+- a daily quota persisted in provider_quotas (shared by all workers), when
+  one is configured.
+
+Skipped calls raise ProviderUnavailable immediately, so the caller can fall
+back to the next provider without paying for a request that would fail.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models.provider import ProviderQuota
+from app.services.places.google import DETAILS_BLOCKED
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider call is skipped by the rate limiter, breaker or quota."""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} skipped: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; half-open after `cooldown` seconds."""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "half-open":
+                # let a single probe through; re-open until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return state == "closed"
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, trip_now: bool = False):
+        with self.lock:
+            self.failures += 1
+            if trip_now or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class DailyQuota:
+    """Per-provider call counter for the current UTC day, persisted in provider_quotas."""
+
+    def __init__(self, provider: str, limit: Optional[int]):
+        self.provider = provider
+        self.limit = limit
+        self.day = None
+        self.used = None
+        self.lock = threading.Lock()
+
+    def _session(self):
+        from app.db import SessionLocal
+        return SessionLocal()
+
+    def _load(self, today):
+        db = self._session()
+        try:
+            row = db.query(ProviderQuota).filter(
+                ProviderQuota.provider == self.provider, ProviderQuota.day == today
+            ).one_or_none()
+            return row.calls if row else 0
+        finally:
+            db.close()
+
+    def exhausted(self) -> bool:
+        if not self.limit:
+            return False
+        today = datetime.utcnow().date()
+        with self.lock:
+            if self.day != today or self.used is None:
+                try:
+                    self.used = self._load(today)
+                except Exception:
+                    logger.exception("could not read %s quota, allowing call", self.provider)
+                    return False
+                self.day = today
+            return self.used >= self.limit
+
+    def increment(self):
+        if not self.limit:
+            return  # nothing to enforce: skip the round trips
+        today = datetime.utcnow().date()
+        db = self._session()
+        try:
+            updated = db.query(ProviderQuota).filter(
+                ProviderQuota.provider == self.provider, ProviderQuota.day == today
+            ).update({ProviderQuota.calls: ProviderQuota.calls + 1}, synchronize_session=False)
+            if not updated:
+                db.add(ProviderQuota(provider=self.provider, day=today, calls=1))
+            try:
+                db.commit()
+            except IntegrityError:
+                # another worker created today's row first
+                db.rollback()
+                db.query(ProviderQuota).filter(
+                    ProviderQuota.provider == self.provider, ProviderQuota.day == today
+                ).update({ProviderQuota.calls: ProviderQuota.calls + 1}, synchronize_session=False)
+                db.commit()
+            calls = db.query(ProviderQuota.calls).filter(
+                ProviderQuota.provider == self.provider, ProviderQuota.day == today
+            ).scalar()
+        except Exception:
+            logger.exception("could not record %s quota usage", self.provider)
+            return
+        finally:
+            db.close()
+        with self.lock:
+            self.day, self.used = today, calls
+
+
+class ProviderGovernor:
+    def __init__(self, name: str, rate: float, burst: float, threshold: int, cooldown: float, daily_limit: Optional[int]):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(threshold, cooldown)
+        self.quota = DailyQuota(name, daily_limit)
+        self.stats = {
+            "calls": 0,
+            "failures": 0,
+            "skipped_circuit_open": 0,
+            "skipped_rate_limited": 0,
+            "skipped_quota": 0,
+        }
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _skip(self, key: str, reason: str):
+        self._count(key)
+        raise ProviderUnavailable(self.name, reason)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        if not self.breaker.allow():
+            self._skip("skipped_circuit_open", "circuit open")
+        if self.quota.exhausted():
+            self._skip("skipped_quota", "daily quota exhausted")
+        if not self.bucket.try_acquire():
+            self._skip("skipped_rate_limited", "rate limited")
+
+        self._count("calls")
+        self.quota.increment()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._count("failures")
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            # a 429, or Google's 200 with OVER_QUERY_LIMIT / REQUEST_DENIED, means
+            # every call will fail for a while: stop calling right away
+            blocked = status == 429 or getattr(e, "status", None) in DETAILS_BLOCKED
+            self.breaker.record_failure(trip_now=blocked)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def snapshot(self) -> Dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["saved_calls"] = stats["skipped_circuit_open"] + stats["skipped_rate_limited"] + stats["skipped_quota"]
+        stats["circuit"] = self.breaker.state
+        stats["quota_limit"] = self.quota.limit
+        stats["quota_used_today"] = self.quota.used
+        return stats
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _make_governor(name: str, env_prefix: str) -> ProviderGovernor:
+    daily = os.getenv(f"{env_prefix}_DAILY_QUOTA")
+    return ProviderGovernor(
+        name,
+        rate=_env_float(f"{env_prefix}_RATE_PER_SEC", 10),
+        burst=_env_float(f"{env_prefix}_RATE_BURST", 20),
+        threshold=int(_env_float(f"{env_prefix}_BREAKER_THRESHOLD", 3)),
+        cooldown=_env_float(f"{env_prefix}_BREAKER_COOLDOWN", 60),
+        daily_limit=int(daily) if daily else None,
+    )
+
+
+# one governor per provider API key (each key has its own limits upstream)
+_governors: Dict[str, ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+ENV_PREFIXES = {"google": "GOOGLE_PLACES", "foursquare": "FOURSQUARE"}
+
+
+def get_governor(provider: str, api_key: Optional[str] = None) -> ProviderGovernor:
+    key = f"{provider}:{api_key or ''}"
+    with _governors_lock:
+        gov = _governors.get(key)
+        if gov is None:
+            gov = _governors[key] = _make_governor(provider, ENV_PREFIXES.get(provider, provider.upper()))
+        return gov
+
+
+def governed_call(provider: str, api_key: Optional[str], fn: Callable, *args, **kwargs):
+    return get_governor(provider, api_key).call(fn, *args, **kwargs)
+
+
+def _stats_key(registry_key: str) -> str:
+    # one entry per governor, without exposing the API key itself
+    provider, _, api_key = registry_key.partition(":")
+    return f"{provider}:{hashlib.sha1(api_key.encode()).hexdigest()[:8]}" if api_key else provider
+
+
+def provider_stats() -> Dict[str, Dict]:
+    with _governors_lock:
+        governors = list(_governors.items())
+    return {_stats_key(key): g.snapshot() for key, g in governors}
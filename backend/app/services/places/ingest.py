@@ -0,0 +1,321 @@
+# app/services/places/ingest.py
+"""
+Offline bulk ingestion of provider dumps into the places table.
+
+    python -m app.services.places.ingest dump.jsonl --source google
+    python -m app.services.places.ingest dump.csv --source foursquare --workers 8
+
+Records are read lazily, normalized in a multiprocessing pool, deduplicated
+and written with COPY into a staging table followed by a batched upsert.
+After every committed batch a checkpoint is written, so an interrupted run
+resumes where it stopped. Memory stays bounded by batch_size * max_pending.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional
+
+from app.services.geo import geohash_encode
+from app.services.scoring import encode_features, place_features
+from app.services.places.normalizer import normalize_google_place, normalize_fsq_place
+
+NORMALIZERS = {
+    "google": normalize_google_place,
+    "foursquare": normalize_fsq_place,
+}
+
+# column order used for COPY and the staging table
+COLUMNS = ["name", "category", "rating", "price_level", "address", "latitude", "longitude", "external_id", "source", "geohash", "features"]
+MAX_LENGTHS = {"name": 256, "category": 128, "address": 512, "external_id": 256, "source": 64, "geohash": 12}
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS places_ingest_staging (
+    name VARCHAR(256),
+    category VARCHAR(128),
+    rating DOUBLE PRECISION,
+    price_level INTEGER,
+    address VARCHAR(512),
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    external_id VARCHAR(256),
+    source VARCHAR(64),
+    geohash VARCHAR(12),
+    features BYTEA
+) ON COMMIT DELETE ROWS
+"""
+
+UPDATE_SQL = """
+UPDATE places p SET
+    name = s.name,
+    category = COALESCE(s.category, p.category),
+    rating = COALESCE(s.rating, p.rating),
+    price_level = COALESCE(s.price_level, p.price_level),
+    address = COALESCE(s.address, p.address),
+    latitude = s.latitude,
+    longitude = s.longitude,
+    geohash = s.geohash,
+    features = s.features
+FROM places_ingest_staging s
+WHERE p.source = s.source AND p.external_id = s.external_id
+"""
+
+INSERT_SQL = """
+INSERT INTO places (name, category, rating, price_level, address, latitude, longitude, external_id, source, geohash, features)
+SELECT name, category, rating, price_level, address, latitude, longitude, external_id, source, geohash, features
+FROM places_ingest_staging s
+WHERE NOT EXISTS (
+    SELECT 1 FROM places p WHERE p.source = s.source AND p.external_id = s.external_id
+)
+"""
+
+
+# -----------------------
+# Reading
+# -----------------------
+def _unflatten(row: Dict[str, str]) -> Dict:
+    """
+    Turn a flat CSV row into the nested provider shape.
+    'geometry.location.lat' -> {"geometry": {"location": {"lat": ...}}},
+    JSON-looking values ('[...]', '{...}') are decoded.
+    """
+    out: Dict = {}
+    for key, value in row.items():
+        if key is None or value in (None, ""):
+            continue
+        if value[:1] in ("[", "{"):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        else:
+            try:
+                value = float(value) if "." in value else int(value)
+            except ValueError:
+                pass
+        node = out
+        parts = key.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return out
+
+
+def iter_records(path: str, skip: int = 0) -> Iterator[str]:
+    """
+    Yields raw records as JSON strings, skipping the first `skip` records.
+    CSV rows are converted to the nested provider shape first.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if i < skip:
+                    continue
+                yield json.dumps(_unflatten(row))
+    else:
+        with open(path, encoding="utf-8") as f:
+            i = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                if i >= skip:
+                    yield line
+                i += 1
+
+
+def iter_chunks(records: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for r in records:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -----------------------
+# Normalizing (runs in worker processes)
+# -----------------------
+def _clip(value, column):
+    limit = MAX_LENGTHS.get(column)
+    if limit and isinstance(value, str):
+        return value[:limit]
+    return value
+
+
+def normalize_chunk(source: str, lines: List[str]) -> List[tuple]:
+    normalize = NORMALIZERS[source]
+    rows = {}
+    for line in lines:
+        try:
+            raw = json.loads(line)
+        except ValueError:
+            continue
+        n = normalize(raw)
+        if not n.get("name") or not n.get("external_id") or n.get("lat") is None or n.get("lon") is None:
+            continue
+        values = {
+            "name": n["name"],
+            "category": n.get("category"),
+            "rating": n.get("rating"),
+            "price_level": n.get("price_level"),
+            "address": n.get("address"),
+            "latitude": n["lat"],
+            "longitude": n["lon"],
+            "external_id": str(n["external_id"]),
+            "source": n["source"],
+            "geohash": geohash_encode(n["lat"], n["lon"]),
+            # bytea hex input for COPY
+            "features": "\\x" + encode_features(place_features(n.get("category"), n.get("rating"), n.get("price_level"))).hex(),
+        }
+        # dedupe inside the chunk: the last record for an id wins
+        rows[(values["source"], values["external_id"])] = tuple(_clip(values[c], c) for c in COLUMNS)
+    return list(rows.values())
+
+
+# -----------------------
+# Writing
+# -----------------------
+def _copy_buffer(rows: List[tuple]) -> io.StringIO:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    buf.seek(0)
+    return buf
+
+
+def write_batch(conn, rows: List[tuple]) -> Dict[str, int]:
+    """COPY rows into the staging table, then update existing places and insert new ones."""
+    # rows from different chunks of the same batch may still repeat an id
+    src, ext = COLUMNS.index("source"), COLUMNS.index("external_id")
+    unique = {(r[src], r[ext]): r for r in rows}
+    cur = conn.cursor()
+    try:
+        cur.execute(STAGING_DDL)
+        cur.copy_expert(
+            f"COPY places_ingest_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            _copy_buffer(list(unique.values())),
+        )
+        cur.execute(UPDATE_SQL)
+        updated = cur.rowcount
+        cur.execute(INSERT_SQL)
+        inserted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return {"inserted": inserted, "updated": updated}
+
+
+# -----------------------
+# Checkpoints
+# -----------------------
+def load_checkpoint(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"records": 0, "inserted": 0, "updated": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # atomic, so a crash never leaves a half-written checkpoint
+
+
+# -----------------------
+# Pipeline
+# -----------------------
+def ingest_file(
+    path: str,
+    source: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 2000,
+    chunks_per_batch: int = 10,
+    checkpoint_path: Optional[str] = None,
+    conn=None,
+) -> Dict:
+    if source not in NORMALIZERS:
+        raise ValueError(f"unknown source '{source}', expected one of {sorted(NORMALIZERS)}")
+    checkpoint_path = checkpoint_path or path + ".checkpoint.json"
+    state = load_checkpoint(checkpoint_path)
+
+    own_conn = conn is None
+    if own_conn:
+        from app.db import engine
+        conn = engine.raw_connection()
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    pending = deque()  # (async result, records in chunk), in file order
+    batch_rows: List[tuple] = []
+    batch_records = 0
+    batch_chunks = 0
+
+    def flush():
+        nonlocal batch_rows, batch_records, batch_chunks
+        if batch_records:
+            if batch_rows:
+                counts = write_batch(conn, batch_rows)
+                state["inserted"] += counts["inserted"]
+                state["updated"] += counts["updated"]
+            state["records"] += batch_records
+            save_checkpoint(checkpoint_path, state)
+        batch_rows, batch_records, batch_chunks = [], 0, 0
+
+    def collect_one():
+        nonlocal batch_records, batch_chunks
+        result, n = pending.popleft()
+        batch_rows.extend(result.get())
+        batch_records += n
+        batch_chunks += 1
+        if batch_chunks >= chunks_per_batch:
+            flush()
+
+    try:
+        with Pool(workers) as pool:
+            for chunk in iter_chunks(iter_records(path, skip=state["records"]), chunk_size):
+                # keep a bounded window of chunks in flight so memory stays constant
+                if len(pending) >= max_pending:
+                    collect_one()
+                pending.append((pool.apply_async(normalize_chunk, (source, chunk)), len(chunk)))
+            while pending:
+                collect_one()
+            flush()
+    finally:
+        if own_conn:
+            conn.close()
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load provider place dumps (JSONL or CSV) into the places table")
+    parser.add_argument("path", help="path to a .jsonl or .csv dump")
+    parser.add_argument("--source", required=True, choices=sorted(NORMALIZERS))
+    parser.add_argument("--workers", type=int, default=None, help="normalizer processes (default: cpu count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="records per worker task")
+    parser.add_argument("--chunks-per-batch", type=int, default=10, help="worker chunks per DB transaction")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <path>.checkpoint.json)")
+    args = parser.parse_args(argv)
+
+    state = ingest_file(
+        args.path,
+        args.source,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        chunks_per_batch=args.chunks_per_batch,
+        checkpoint_path=args.checkpoint,
+    )
+    print(f"records={state['records']} inserted={state['inserted']} updated={state['updated']}")
+
+
+if __name__ == "__main__":
+    main()
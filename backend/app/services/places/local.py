@@ -0,0 +1,83 @@
+# app/services/places/local.py
+"""
+Local-first place search over our own places table.
+
+Nearby rows come from a geohash prefix scan (B-tree, varchar_pattern_ops) over
+the cells covering the search circle, narrowed to its bounding box; text
+matching uses the GIN full-text index on name + category. The nearest
+candidates (approximate distance, in SQL) are then filtered by exact radius
+and ranked by distance and rating in Python. Queries with no words left to
+match return nothing, so the caller falls through to the providers.
+"""
+import os
+import re
+from typing import List, Tuple
+
+from math import cos, radians
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.models.trip import Place as PlaceModel
+from app.services.geo import haversine, geohash_cover_circle
+
+# must match the expression of ix_places_search_tsv
+SEARCH_TSVECTOR = "to_tsvector('english', coalesce(places.name, '') || ' ' || coalesce(places.category, ''))"
+
+# how many rows to pull from the index before exact distance filtering
+LOCAL_CANDIDATES = int(os.getenv("PLACES_LOCAL_CANDIDATES", "2000"))
+# local results needed before we skip the external providers
+LOCAL_MIN_RESULTS = int(os.getenv("PLACES_LOCAL_MIN_RESULTS", "10"))
+
+
+# "restaurants in Chennai": the location is the search point, not text to match
+_LOCATION = re.compile(r"(\b(in|near|around|at|close to)\b|,).*$")
+# words that say nothing about what the place is
+_FILLER = {"best", "top", "good", "nice", "popular"}
+
+
+def tsquery_terms(query: str) -> str:
+    # AND the words left once the location is dropped: "italian restaurant" must match both
+    # \w is Unicode-aware, so "café" and "寿司" are kept as words
+    words = [w for w in re.findall(r"[^\W_]+", _LOCATION.sub("", query.lower())) if w not in _FILLER]
+    return " & ".join(words)
+
+
+def search_local(db: Session, query: str, lat: float, lon: float, radius_m: int = 5000, limit: int = 20) -> List[Tuple[PlaceModel, float]]:
+    """Top `limit` cached places within radius_m, as (place, distance_km) pairs."""
+    terms = tsquery_terms(query)
+    if not terms:
+        return []
+    cells = geohash_cover_circle(lat, lon, radius_m)
+    dlat = radius_m / 111_320
+    kx = max(cos(radians(lat)), 0.01)
+    dlon = dlat / kx
+    # equirectangular distance is enough to order candidates; exact radius below
+    approx = (PlaceModel.latitude - lat) * (PlaceModel.latitude - lat) + \
+        (PlaceModel.longitude - lon) * (PlaceModel.longitude - lon) * (kx * kx)
+    q = (
+        db.query(PlaceModel)
+        .filter(or_(*[PlaceModel.geohash.like(c + "%") for c in cells]))
+        .filter(PlaceModel.latitude.between(lat - dlat, lat + dlat))
+        .filter(text(f"{SEARCH_TSVECTOR} @@ to_tsquery('english', :tsq)")).params(tsq=terms)
+    )
+    if -180.0 <= lon - dlon and lon + dlon <= 180.0:  # the geohash cells alone bound boxes across the antimeridian
+        q = q.filter(PlaceModel.longitude.between(lon - dlon, lon + dlon))
+    rows = q.order_by(approx).limit(LOCAL_CANDIDATES).all()
+
+    radius_km = radius_m / 1000.0
+    scored = []
+    for p in rows:
+        d = haversine(lat, lon, p.latitude, p.longitude)
+        if d > radius_km:
+            continue
+        # equal weight to closeness (0..1) and rating (0..5 -> 0..1)
+        score = 0.5 * (1 - d / radius_km if radius_km else 1) + 0.5 * ((p.rating or 0) / 5.0)
+        scored.append((score, d, p))
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return [(p, d) for _, d, p in scored[:limit]]
+
+
+def is_covered(results: List, limit: int) -> bool:
+    return len(results) >= min(limit, LOCAL_MIN_RESULTS)
+
@@ -0,0 +1,355 @@
+# app/services/places/raw_store.py
+"""
+Compressed storage of raw provider payloads.
+
+cache_place keeps the payload a place was normalized from in place_raws
+(places cached before that get theirs on a later search hit, checked with one
+query per search), so a new field can be pulled out of stored payloads instead of re-fetching them
+from the paid APIs. Payloads are compressed JSON. zstd is used when the
+`zstandard` package is installed, zlib otherwise. Provider payloads are
+small and repetitive (the same keys and type names in every row), so most of
+the gain comes from a dictionary trained on a sample of one provider's
+payloads. The place is compressed with the newest dictionary of its source.
+The stored row remembers which dictionary it used.
+
+Payloads are decompressed only when read (PlaceRaw.raw / Place.raw_payload).
+
+    python -m app.services.places.raw_store train --source google --recompress
+    python -m app.services.places.raw_store renormalize --source google
+    python -m app.services.places.raw_store stats
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session, object_session
+
+from app.models.place_raw import PlaceRaw, RawDictionary
+from app.models.trip import Place
+from app.services.geo import geohash_encode
+from app.services.places.normalizer import normalize_google_place, normalize_fsq_place
+from app.services.scoring import encode_features, place_features
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+CODEC = os.getenv("PLACES_RAW_CODEC") or ("zstd" if zstandard else "zlib")
+ZSTD_LEVEL = int(os.getenv("PLACES_RAW_ZSTD_LEVEL", "10"))
+ZLIB_LEVEL = int(os.getenv("PLACES_RAW_ZLIB_LEVEL", "6"))
+DICT_SIZE = 64 * 1024
+ZLIB_DICT_SIZE = 32 * 1024  # zlib only looks back 32 KiB
+TRAIN_SAMPLES = 5000
+BATCH_SIZE = 500
+
+NORMALIZERS = {
+    "google": normalize_google_place,
+    "foursquare": normalize_fsq_place,
+}
+
+# dictionary id -> bytes; dictionaries never change once stored
+_dictionaries: Dict[int, bytes] = {}
+# source -> (expires at, newest dictionary id); re-checked so workers pick up newly trained ones
+_active: Dict[str, Tuple[float, Optional[int]]] = {}
+ACTIVE_TTL = 300  # seconds
+_lock = threading.Lock()
+
+
+# -----------------------
+# Codecs
+# -----------------------
+def _compress(data: bytes, codec: str, zdict: Optional[bytes]) -> bytes:
+    if codec == "zstd":
+        d = zstandard.ZstdCompressionDict(zdict) if zdict else None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=d).compress(data)
+    if zdict:
+        c = zlib.compressobj(ZLIB_LEVEL, zdict=zdict)
+        return c.compress(data) + c.flush()
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(blob: bytes, codec: str, zdict: Optional[bytes]) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("payload is zstd-compressed but the zstandard package is not installed")
+        d = zstandard.ZstdCompressionDict(zdict) if zdict else None
+        return zstandard.ZstdDecompressor(dict_data=d).decompress(blob)
+    if zdict:
+        d = zlib.decompressobj(zdict=zdict)
+        return d.decompress(blob) + d.flush()
+    return zlib.decompress(blob)
+
+
+def _dictionary(db: Session, dictionary_id: Optional[int]) -> Optional[bytes]:
+    if dictionary_id is None:
+        return None
+    data = _dictionaries.get(dictionary_id)
+    if data is None:
+        data = db.query(RawDictionary.data).filter(RawDictionary.id == dictionary_id).scalar()
+        if data is None:
+            raise LookupError(f"raw dictionary {dictionary_id} is missing")
+        _dictionaries[dictionary_id] = data
+    return data
+
+
+def _active_dictionary(db: Session, source: str) -> Optional[int]:
+    """Newest dictionary of `source` usable with the configured codec."""
+    cached = _active.get(source)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    dictionary_id = db.query(RawDictionary.id).filter(
+        RawDictionary.source == source, RawDictionary.codec == CODEC,
+    ).order_by(RawDictionary.id.desc()).limit(1).scalar()
+    with _lock:
+        _active[source] = (time.monotonic() + ACTIVE_TTL, dictionary_id)
+    return dictionary_id
+
+
+def encode(db: Session, source: str, raw: Dict) -> Tuple[str, Optional[int], bytes, int]:
+    """(codec, dictionary id, compressed payload, uncompressed size) for one payload."""
+    data = orjson.dumps(raw)
+    dictionary_id = _active_dictionary(db, source)
+    return CODEC, dictionary_id, _compress(data, CODEC, _dictionary(db, dictionary_id)), len(data)
+
+
+def decode(row: PlaceRaw) -> Dict:
+    db = object_session(row)
+    zdict = _dictionary(db, row.dictionary_id) if row.dictionary_id is not None else None
+    return orjson.loads(_decompress(row.payload, row.codec, zdict))
+
+
+# -----------------------
+# Storing and reading
+# -----------------------
+def store_raw(db: Session, place: Place, raw: Optional[Dict]):
+    """Add or replace the payload of `place` (flushed with the caller's transaction)."""
+    if not raw or place.id is None:
+        return
+    codec, dictionary_id, payload, size = encode(db, place.source, raw)
+    db.merge(PlaceRaw(
+        place_id=place.id, source=place.source, codec=codec, dictionary_id=dictionary_id,
+        payload=payload, raw_size=size, fetched_at=datetime.utcnow(),
+    ))
+
+
+def load_raw(db: Session, place_id: int) -> Optional[Dict]:
+    row = db.get(PlaceRaw, place_id)
+    return row.raw if row is not None else None
+
+
+def _batches(db: Session, source: Optional[str], batch_size: int) -> Iterator[List[PlaceRaw]]:
+    # keyset pages, so committing between batches never invalidates an open cursor
+    last = 0
+    while True:
+        q = db.query(PlaceRaw).filter(PlaceRaw.place_id > last)
+        if source:
+            q = q.filter(PlaceRaw.source == source)
+        rows = q.order_by(PlaceRaw.place_id).limit(batch_size).all()
+        if not rows:
+            return
+        last = rows[-1].place_id  # before the caller commits and expires the rows
+        yield rows
+
+
+# -----------------------
+# Dictionaries
+# -----------------------
+_FRAGMENT = re.compile(rb"[,{}\[\]]")
+
+
+def _zlib_dictionary(samples: List[bytes], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """
+    Preset dictionary for zlib: the most common key/value fragments of the
+    samples, most frequent last (deflate codes nearer matches with fewer bits).
+    """
+    counts = Counter()
+    for s in samples:
+        # fragments between JSON punctuation, e.g. `"business_status":"OPERATIONAL"`,
+        # plus their key alone so keys with varying values still count
+        for frag in _FRAGMENT.split(s):
+            if len(frag) > 3:
+                counts[frag] += 1
+                key, sep, _ = frag.partition(b":")
+                if sep and len(key) > 3:
+                    counts[key + sep] += 1
+    picked, total = [], 0
+    for frag, n in counts.most_common():
+        if n < 2 or total + len(frag) + 1 > size:
+            break
+        picked.append(frag)
+        total += len(frag) + 1
+    return b",".join(reversed(picked))
+
+
+def train_dictionary(db: Session, source: str, samples: int = TRAIN_SAMPLES, size: int = DICT_SIZE) -> Optional[RawDictionary]:
+    """Train a dictionary on the newest stored payloads of `source`; None when there are too few."""
+    rows = db.query(PlaceRaw).filter(PlaceRaw.source == source).order_by(
+        PlaceRaw.fetched_at.desc()
+    ).limit(samples).all()
+    data = [orjson.dumps(r.raw) for r in rows]
+    if len(data) < 10:
+        return None
+    if CODEC == "zstd":
+        zdict = zstandard.train_dictionary(size, data).as_bytes()
+    else:
+        zdict = _zlib_dictionary(data, min(size, ZLIB_DICT_SIZE))
+    record = RawDictionary(source=source, codec=CODEC, data=zdict, samples=len(data))
+    db.add(record)
+    db.commit()
+    with _lock:
+        _dictionaries[record.id] = zdict
+        _active[source] = (time.monotonic() + ACTIVE_TTL, record.id)
+    return record
+
+
+def recompress(db: Session, source: Optional[str] = None, batch_size: int = BATCH_SIZE) -> int:
+    """Re-encode stored payloads with the current codec and newest dictionary of their source."""
+    n = 0
+    for rows in _batches(db, source, batch_size):
+        updates = []
+        for row in rows:
+            target = _active_dictionary(db, row.source)
+            if row.codec == CODEC and row.dictionary_id == target:
+                continue
+            codec, dictionary_id, payload, size = encode(db, row.source, row.raw)
+            updates.append({"place_id": row.place_id, "codec": codec, "dictionary_id": dictionary_id,
+                            "payload": payload, "raw_size": size})
+        if updates:
+            db.bulk_update_mappings(PlaceRaw, updates)
+        db.commit()
+        db.expunge_all()
+        n += len(updates)
+    return n
+
+
+# -----------------------
+# Re-normalization
+# -----------------------
+# columns the details enrichment refreshes more often than search payloads do
+DETAIL_COLUMNS = ("rating", "price_level", "user_ratings_total")
+
+
+def renormalized_columns(place: Place, raw_row: PlaceRaw) -> Dict:
+    """Place columns rebuilt from the stored payload; values the payload lacks are kept."""
+    normalizer = NORMALIZERS.get(raw_row.source)
+    if normalizer is None:
+        return {}
+    n = normalizer(raw_row.raw)
+    values = {
+        "name": n.get("name"),
+        "address": n.get("address"),
+        "category": n.get("category"),
+        "latitude": n.get("lat"),
+        "longitude": n.get("lon"),
+        "rating": n.get("rating"),
+        "price_level": n.get("price_level"),
+        "user_ratings_total": n.get("user_ratings_total"),
+    }
+    if place.details_updated_at is not None and place.details_updated_at > raw_row.fetched_at:
+        for col in DETAIL_COLUMNS:
+            values.pop(col)
+    values = {k: v for k, v in values.items() if v is not None and v != getattr(place, k)}
+    if not values:
+        return {}
+
+    lat = values.get("latitude", place.latitude)
+    lon = values.get("longitude", place.longitude)
+    if lat is not None and lon is not None:
+        values["geohash"] = geohash_encode(lat, lon)
+    values["features"] = encode_features(place_features(
+        values.get("category", place.category),
+        values.get("rating", place.rating),
+        values.get("price_level", place.price_level),
+    ))
+    values["id"] = place.id
+    return values
+
+
+def renormalize(db: Session, source: Optional[str] = None, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    Rebuild Place columns from stored payloads, without network calls.
+    City pools pick the changes up on their next rebuild (city_pool.py).
+    """
+    stats = {"seen": 0, "updated": 0}
+    for rows in _batches(db, source, batch_size):
+        places = {p.id: p for p in db.query(Place).filter(Place.id.in_([r.place_id for r in rows])).all()}
+        updates = []
+        for row in rows:
+            place = places.get(row.place_id)
+            if place is None:
+                continue
+            values = renormalized_columns(place, row)
+            if values:
+                updates.append(values)
+        if updates:
+            db.bulk_update_mappings(Place, updates)
+        db.commit()
+        db.expunge_all()
+        stats["seen"] += len(rows)
+        stats["updated"] += len(updates)
+    return stats
+
+
+def storage_stats(db: Session) -> List[Dict]:
+    rows = db.query(
+        PlaceRaw.source, PlaceRaw.codec, PlaceRaw.dictionary_id, func.count(),
+        func.sum(PlaceRaw.raw_size), func.sum(func.length(PlaceRaw.payload)),
+    ).group_by(PlaceRaw.source, PlaceRaw.codec, PlaceRaw.dictionary_id).all()
+    return [
+        {"source": s, "codec": c, "dictionary_id": d, "rows": n, "raw_bytes": int(raw or 0), "stored_bytes": int(stored or 0)}
+        for s, c, d, n, raw, stored in rows
+    ]
+
+
+def main(argv=None):
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="manage stored raw provider payloads")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    train = sub.add_parser("train", help="train a compression dictionary for one source")
+    train.add_argument("--source", required=True, choices=sorted(NORMALIZERS))
+    train.add_argument("--samples", type=int, default=TRAIN_SAMPLES)
+    train.add_argument("--size", type=int, default=DICT_SIZE)
+    train.add_argument("--recompress", action="store_true", help="re-encode stored payloads with the new dictionary")
+    renorm = sub.add_parser("renormalize", help="rebuild place columns from stored payloads")
+    renorm.add_argument("--source", choices=sorted(NORMALIZERS))
+    renorm.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    sub.add_parser("stats", help="stored vs raw size per source and dictionary")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.cmd == "train":
+            record = train_dictionary(db, args.source, args.samples, args.size)
+            if record is None:
+                print(f"not enough {args.source} payloads to train on")
+                return
+            print(f"trained {record.codec} dictionary {record.id} ({len(record.data)} bytes, {record.samples} samples)")
+            if args.recompress:
+                print(f"recompressed {recompress(db, args.source)} payloads")
+        elif args.cmd == "renormalize":
+            stats = renormalize(db, args.source, args.batch_size)
+            print(f"renormalized {stats['updated']} of {stats['seen']} places")
+        else:
+            for s in storage_stats(db):
+                ratio = s["raw_bytes"] / s["stored_bytes"] if s["stored_bytes"] else 0
+                print(f"{s['source']:<12}{s['codec']:<6}dict={s['dictionary_id']}  rows={s['rows']}  "
+                      f"raw={s['raw_bytes']}  stored={s['stored_bytes']}  ratio={ratio:.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
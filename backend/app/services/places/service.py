@@ -1,15 +1,34 @@
 # app/services/places/service.py
 import os
-from typing import List, Dict, Optional
-from app.services.places.google import google_text_search, google_place_details
-from app.services.places.foursquare import fsq_search
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Iterator, Tuple
+from app.services.places.google import google_text_search, google_place_details, GOOGLE_KEY
+from app.services.places.foursquare import fsq_search, FSQ_KEY
+from app.services.places.governance import governed_call, ProviderUnavailable
+from app.services.places.local import search_local, is_covered
+from app.services.geo import geohash_encode
+from app.services.scoring import features_for_place
 from app.services.places.normalizer import normalize_google_place, normalize_fsq_place
 from app.db import SessionLocal
 from app.models.trip import Place as PlaceModel  # your Place model
-from sqlalchemy import select
+from app.models.trip import PlaceSearchResult
+from app.models.place_raw import PlaceRaw
+from app.services.places.raw_store import store_raw
+from app.services.city_pool import add_place_to_pools
+from sqlalchemy import select, text
 from math import radians, cos, sin, asin, sqrt
 
+logger = logging.getLogger(__name__)
+
 CACHE_ENABLED = os.getenv("PLACES_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# coalesce identical searches across workers too (needs Postgres advisory locks)
+SINGLEFLIGHT_SHARED = os.getenv("PLACES_SINGLEFLIGHT_SHARED", "false").lower() in ("1", "true", "yes")
+SHARED_RESULT_TTL = int(os.getenv("PLACES_SINGLEFLIGHT_TTL", "30"))  # seconds
+BATCH_WORKERS = int(os.getenv("PLACES_BATCH_WORKERS", "8"))  # concurrent provider searches per batch
 
 def haversine_km(lat1, lon1, lat2, lon2):
     # returns distance in kilometers
@@ -37,99 +56,364 @@ def find_cached_nearby_by_name(db, name: str, lat: float, lon: float, radius_km:
             return r
     return None
 
-def cache_place(db, normalized: Dict):
-    p = find_cached_place_by_external(db, normalized.get("external_id"), normalized.get("source"))
-    if p:
-        return p
-    # create new
+def _new_place(normalized: Dict) -> PlaceModel:
     new = PlaceModel(
         name=normalized.get("name"),
         category=normalized.get("category"),
         rating=normalized.get("rating"),
         price_level=normalized.get("price_level"),
+        user_ratings_total=normalized.get("user_ratings_total"),
         address=normalized.get("address"),
         latitude=normalized.get("lat"),
         longitude=normalized.get("lon"),
         external_id=normalized.get("external_id"),
         source=normalized.get("source")
     )
+    if new.latitude is not None and new.longitude is not None:
+        new.geohash = geohash_encode(new.latitude, new.longitude)
+    new.features = features_for_place(new)
+    return new
+
+def cache_place(db, normalized: Dict):
+    p = find_cached_place_by_external(db, normalized.get("external_id"), normalized.get("source"))
+    if p:
+        return p
+    new = _new_place(normalized)
     db.add(new)
+    db.flush()
+    store_raw(db, new, normalized.get("raw"))
+    # keep precomputed city pools current without a full rebuild
+    add_place_to_pools(db, new)
     db.commit()
     db.refresh(new)
     return new
 
-def try_google_then_fsq(query: str, ll: Optional[str] = None, radius: int = 5000, limit: int = 20) -> List[Dict]:
-    results = []
+def iter_google_then_fsq(query: str, ll: Optional[str] = None, radius: int = 5000, limit: int = 20) -> Iterator[List[Dict]]:
+    """
+    Yields one batch of normalized results per provider, as soon as that provider returns.
+    Foursquare is only queried when Google did not return enough hits.
+    """
+    found = 0
     # 1) Google primary
     try:
-        raw = google_text_search(query=query, location=ll, radius=radius, limit=limit)
-        for r in raw:
-            normalized = normalize_google_place(r)
-            results.append(normalized)
+        raw = governed_call("google", GOOGLE_KEY, google_text_search, query=query, location=ll, radius=radius, limit=limit)
+        batch = [normalize_google_place(r) for r in raw]
+        found += len(batch)
+        if batch:
+            yield batch
         # If enough hits, return
-        if len(results) >= max(3, min(limit, 5)):
-            return results
-    except Exception as e:
-        # log later - for now continue to fallback
-        pass
+        if found >= max(3, min(limit, 5)):
+            return
+    except ProviderUnavailable as e:
+        # skipped without a network call (breaker open, rate limited or out of quota)
+        logger.info("%s", e)
+    except Exception:
+        logger.warning("google search failed, falling back to foursquare", exc_info=True)
 
     # 2) Fallback to Foursquare
     try:
-        raw2 = fsq_search(query=query, ll=ll, radius=radius, limit=limit)
-        for r in raw2:
-            normalized = normalize_fsq_place(r)
-            results.append(normalized)
+        raw2 = governed_call("foursquare", FSQ_KEY, fsq_search, query=query, ll=ll, radius=radius, limit=limit)
+        batch = [normalize_fsq_place(r) for r in raw2]
+    except ProviderUnavailable as e:
+        logger.info("%s", e)
+        batch = []
     except Exception:
-        pass
+        logger.warning("foursquare search failed", exc_info=True)
+        batch = []
+    if batch:
+        yield batch
 
+def try_google_then_fsq(query: str, ll: Optional[str] = None, radius: int = 5000, limit: int = 20) -> List[Dict]:
+    results = []
+    for batch in iter_google_then_fsq(query=query, ll=ll, radius=radius, limit=limit):
+        results.extend(batch)
     return results
 
-def search_and_maybe_cache(query: str, ll: Optional[str], radius: int = 5000, limit: int = 20, use_cache: bool = True):
-    raw_results = try_google_then_fsq(query=query, ll=ll, radius=radius, limit=limit)
+def place_to_dict(place) -> Dict:
+    return {
+        "id": place.id,
+        "name": place.name,
+        "address": place.address,
+        "lat": place.latitude,
+        "lon": place.longitude,
+        "category": place.category,
+        "rating": place.rating,
+        "price_level": place.price_level,
+        "source": place.source,
+        "external_id": place.external_id
+    }
+
+def _backfill_raws(db, hits: List[Tuple[PlaceModel, Dict]]):
+    # places cached before payloads were kept get theirs on a later hit: one IN query per search
+    hits = [(p, raw) for p, raw in hits if raw]
+    if not hits:
+        return
+    ids = {p.id for p, _ in hits}
+    has_raw = {pid for (pid,) in db.query(PlaceRaw.place_id).filter(PlaceRaw.place_id.in_(ids)).all()}
+    for p, raw in hits:
+        if p.id not in has_raw:
+            store_raw(db, p, raw)
+            has_raw.add(p.id)
+    db.commit()
+
+def cache_results(db, raw_results: List[Dict]) -> List[Dict]:
     out = []
+    hits = []
+    for nr in raw_results:
+        # try external id lookup
+        cached = None
+        ext = nr.get("external_id")
+        src = nr.get("source")
+        if ext and src:
+            cached = find_cached_place_by_external(db, ext, src)
+        if not cached and nr.get("lat") and nr.get("lon"):
+            cached = find_cached_nearby_by_name(db, nr.get("name"), nr.get("lat"), nr.get("lon"))
+        if cached:
+            hits.append((cached, nr.get("raw")))
+        else:
+            cached = cache_place(db, nr)
+        out.append(place_to_dict(cached))
+    _backfill_raws(db, hits)
+    return out
+
+def _result_key(nr: Dict) -> Tuple:
+    # the same place as returned to different queries
+    if nr.get("external_id") and nr.get("source"):
+        return (nr["source"], nr["external_id"])
+    return (nr.get("source"), nr.get("name"), nr.get("lat"), nr.get("lon"))
+
+def cache_results_batch(db, raw_results: List[Dict], commit: bool = True) -> List[Dict]:
+    """
+    cache_results for many results at once: each distinct place is looked up
+    once (one query by external id, one by name for the misses), new places
+    are inserted together and everything is committed once (or left to the
+    caller's transaction with commit=False).
+    """
+    distinct: Dict[Tuple, Dict] = {}
+    for nr in raw_results:
+        distinct.setdefault(_result_key(nr), nr)
+
+    found: Dict[Tuple, PlaceModel] = {}
+    ext_ids = list({nr["external_id"] for nr in distinct.values() if nr.get("external_id") and nr.get("source")})
+    if ext_ids:
+        by_ext = {(p.source, p.external_id): p
+                  for p in db.query(PlaceModel).filter(PlaceModel.external_id.in_(ext_ids)).all()}
+        for key, nr in distinct.items():
+            p = by_ext.get((nr.get("source"), nr.get("external_id")))
+            if p is not None:
+                found[key] = p
+
+    missing = {k: nr for k, nr in distinct.items() if k not in found and nr.get("lat") and nr.get("lon")}
+    if missing:
+        # same rule as find_cached_nearby_by_name: same name within 300m
+        by_name: Dict[str, List[PlaceModel]] = {}
+        for p in db.query(PlaceModel).filter(PlaceModel.name.in_({nr.get("name") for nr in missing.values()})).all():
+            by_name.setdefault(p.name, []).append(p)
+        for key, nr in missing.items():
+            for p in by_name.get(nr.get("name"), ()):
+                if p.latitude is not None and p.longitude is not None \
+                        and haversine_km(nr["lat"], nr["lon"], p.latitude, p.longitude) <= 0.3:
+                    found[key] = p
+                    break
+
+    hit_ids = [p.id for p in found.values()]
+    has_raw = {pid for (pid,) in db.query(PlaceRaw.place_id).filter(PlaceRaw.place_id.in_(hit_ids)).all()} if hit_ids else set()
+    for key, p in found.items():
+        if distinct[key].get("raw") and p.id not in has_raw:
+            store_raw(db, p, distinct[key]["raw"])
+            has_raw.add(p.id)
+
+    created = {k: _new_place(nr) for k, nr in distinct.items() if k not in found}
+    if created:
+        db.add_all(created.values())
+        db.flush()
+        for key, p in created.items():
+            store_raw(db, p, distinct[key].get("raw"))
+            add_place_to_pools(db, p)
+        found.update(created)
+    # read before the commit expires the rows
+    as_dict = {k: place_to_dict(p) for k, p in found.items()}
+    if commit:
+        db.commit()
+    return [dict(as_dict[_result_key(nr)]) for nr in raw_results]
+
+# -----------------------
+# Single-flight: identical concurrent searches share one provider call + upsert
+# -----------------------
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """In-process request coalescing: the first caller for a key runs, the rest wait for its result."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+_search_flights = SingleFlight()
+
+def search_key(query: str, ll: Optional[str], radius: int, limit: int, use_cache: bool) -> str:
+    q = " ".join(query.lower().split())
+    if ll:
+        # ~11m precision, so clients sending slightly different coordinates still coalesce
+        lat, lon = (float(x) for x in ll.split(","))
+        ll = f"{lat:.4f},{lon:.4f}"
+    return f"{q}|{ll}|{radius}|{limit}|{int(bool(use_cache))}"
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha1(key.encode()).digest()
+
+def _search_shared(key: str, query: str, ll: Optional[str], radius: int, limit: int) -> List[Dict]:
+    """
+    Cross-worker coalescing: a transaction-scoped advisory lock per search key
+    serializes workers, and the leader leaves the resulting place ids in
+    place_search_results so workers that waited on the lock reuse them instead
+    of calling the providers. The lock ends with the transaction, so an error
+    (and the rollback that follows) can never leave it held.
+    """
+    db = SessionLocal()
+    try:
+        digest = _digest(key)
+        row_key = digest.hex()
+        lock_id = int.from_bytes(digest[:8], "big", signed=True)  # signed 64-bit id for pg_advisory_xact_lock
+        db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": lock_id})
+        fresh_after = datetime.utcnow() - timedelta(seconds=SHARED_RESULT_TTL)
+        row = db.query(PlaceSearchResult).filter(
+            PlaceSearchResult.key == row_key, PlaceSearchResult.created_at >= fresh_after
+        ).one_or_none()
+        if row:
+            by_id = {p.id: p for p in db.query(PlaceModel).filter(PlaceModel.id.in_(row.place_ids)).all()}
+            out = [place_to_dict(by_id[i]) for i in row.place_ids if i in by_id]
+            db.commit()
+            return out
+
+        raw = try_google_then_fsq(query=query, ll=ll, radius=radius, limit=limit)
+        out = cache_results_batch(db, raw, commit=False)
+        db.merge(PlaceSearchResult(key=row_key, place_ids=[r["id"] for r in out], created_at=datetime.utcnow()))
+        db.commit()  # publishes the places and the result, and releases the lock
+        return out
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _search_once(key: str, query: str, ll: Optional[str], radius: int, limit: int, use_cache: bool) -> List[Dict]:
+    if SINGLEFLIGHT_SHARED and CACHE_ENABLED and use_cache:
+        return _search_shared(key, query, ll, radius, limit)
+    out = []
+    for batch in iter_search_and_maybe_cache(query=query, ll=ll, radius=radius, limit=limit, use_cache=use_cache):
+        out.extend(batch)
+    return out
+
+def search_local_if_covered(query: str, ll: str, radius: int = 5000, limit: int = 20, db=None) -> Optional[List[Dict]]:
+    """Results from our own places table, or None when local coverage of the area is too thin."""
+    lat, lon = (float(x) for x in ll.split(","))
+    if db is None:
+        db = SessionLocal()
+        try:
+            hits = search_local(db, query, lat, lon, radius_m=radius, limit=limit)
+        finally:
+            db.close()
+    else:
+        hits = search_local(db, query, lat, lon, radius_m=radius, limit=limit)
+    if not is_covered(hits, limit):
+        return None
+    return [dict(place_to_dict(p), distance_km=round(d, 3)) for p, d in hits]
+
+def search_and_maybe_cache(query: str, ll: Optional[str], radius: int = 5000, limit: int = 20, use_cache: bool = True, local_first: bool = False):
+    if local_first and ll:
+        local = search_local_if_covered(query, ll, radius, limit)
+        if local is not None:
+            return local
+    key = search_key(query, ll, radius, limit, use_cache)
+    res = _search_flights.do(key, lambda: _search_once(key, query, ll, radius, limit, use_cache))
+    # every waiter gets its own copies of the shared result
+    return [dict(r) for r in res]
+
+def iter_search_and_maybe_cache(query: str, ll: Optional[str], radius: int = 5000, limit: int = 20, use_cache: bool = True, local_first: bool = False) -> Iterator[List[Dict]]:
+    """Streaming variant of search_and_maybe_cache: yields results per provider batch."""
+    if local_first and ll:
+        local = search_local_if_covered(query, ll, radius, limit)
+        if local is not None:
+            yield local
+            return
+    batches = iter_google_then_fsq(query=query, ll=ll, radius=radius, limit=limit)
     if CACHE_ENABLED and use_cache:
         db = SessionLocal()
         try:
-            for nr in raw_results:
-                # try external id lookup
-                cached = None
-                ext = nr.get("external_id")
-                src = nr.get("source")
-                if ext and src:
-                    cached = find_cached_place_by_external(db, ext, src)
-                if not cached and nr.get("lat") and nr.get("lon"):
-                    cached = find_cached_nearby_by_name(db, nr.get("name"), nr.get("lat"), nr.get("lon"))
-                if cached:
-                    out.append({
-                        "id": cached.id,
-                        "name": cached.name,
-                        "address": cached.address,
-                        "lat": cached.latitude,
-                        "lon": cached.longitude,
-                        "category": cached.category,
-                        "rating": cached.rating,
-                        "price_level": cached.price_level,
-                        "source": cached.source,
-                        "external_id": cached.external_id
-                    })
-                else:
-                    saved = cache_place(db, nr)
-                    out.append({
-                        "id": saved.id,
-                        "name": saved.name,
-                        "address": saved.address,
-                        "lat": saved.latitude,
-                        "lon": saved.longitude,
-                        "category": saved.category,
-                        "rating": saved.rating,
-                        "price_level": saved.price_level,
-                        "source": saved.source,
-                        "external_id": saved.external_id
-                    })
+            for raw_results in batches:
+                yield cache_results(db, raw_results)
         finally:
             db.close()
     else:
         # if not caching, return normalized raw results
-        for nr in raw_results:
-            out.append(nr)
-    return out
+        for raw_results in batches:
+            yield raw_results
+
+def search_batch(queries: List[Tuple[str, int]], ll: Optional[str], radius: int = 5000, use_cache: bool = True, local_first: bool = False) -> List[List[Dict]]:
+    """
+    Several (query, limit) searches around one point in one go: repeated queries
+    run once, provider searches run concurrently, and places returned by more
+    than one query are cached once (see cache_results_batch). One result list
+    per query, in order.
+    """
+    keys = [search_key(q, ll, radius, limit, use_cache) for q, limit in queries]
+    pending: Dict[str, Tuple[str, int]] = {}
+    for key, sub in zip(keys, queries):
+        pending.setdefault(key, sub)
+
+    results: Dict[str, List[Dict]] = {}
+    db = SessionLocal()
+    try:
+        if local_first and ll:
+            for key, (q, limit) in list(pending.items()):
+                local = search_local_if_covered(q, ll, radius, limit, db=db)
+                if local is not None:
+                    results[key] = local
+                    del pending[key]
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(pending))) as pool:
+                fetched = dict(zip(pending, pool.map(
+                    lambda sub: try_google_then_fsq(query=sub[0], ll=ll, radius=radius, limit=sub[1]),
+                    pending.values(),
+                )))
+            if CACHE_ENABLED and use_cache:
+                flat = [nr for key in pending for nr in fetched[key]]
+                cached = iter(cache_results_batch(db, flat))
+                for key in pending:
+                    results[key] = [next(cached) for _ in fetched[key]]
+            else:
+                results.update(fetched)
+    finally:
+        db.close()
+    return [[dict(r) for r in results[key]] for key in keys]
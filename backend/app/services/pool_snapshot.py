@@ -0,0 +1,426 @@
+# app/services/pool_snapshot.py
+"""
+Versioned binary snapshot format for city place pools.
+
+Warm caches after a deploy by mapping one file instead of re-reading places:
+
+    python -m app.services.pool_snapshot build pools.snap     # from city_pools
+    python -m app.services.pool_snapshot append pools.snap    # places added since
+    python -m app.services.pool_snapshot verify pools.snap
+    python -m app.services.pool_snapshot info pools.snap
+
+Layout (little endian):
+
+    header   64 bytes: magic, format version, record size, schema checksum,
+             chunk count, record count, end of committed data, header CRC32
+    chunk*   32-byte chunk header (record/city counts, blob size, payload CRC32)
+             records   fixed-width RECORD array, sorted by city
+             offsets   int64 string offsets: chunk cities, then name/category/
+                       source of every record
+             blob      UTF-8 strings
+
+A build writes a single chunk; an append writes one more chunk after the
+committed data and then rewrites the header, so a crash mid-append leaves
+the previous snapshot intact. Readers mmap the file and use numpy views over
+the records; a place in a later chunk replaces the same id from an earlier one.
+Set POOL_SNAPSHOT_PATH to map a snapshot at app startup.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.city_pool import CATEGORY_GROUPS, TOP_N, normalize_city, place_groups
+from app.services.scoring import DIM, FEATURES, place_features
+
+SNAPSHOT_PATH = os.getenv("POOL_SNAPSHOT_PATH")
+
+MAGIC = b"OTPSNAP\0"
+VERSION = 1
+ALIGN = 8
+
+RECORD = np.dtype([
+    ("id", "<i8"),
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("rating", "<f4"),        # NaN when unknown
+    ("cluster", "<i4"),       # index into the city's clusters, -1 for none
+    ("city", "<u4"),          # index into the chunk's city list
+    ("category_mask", "<u2"),  # GROUP_BITS
+    ("price_level", "i1"),    # NO_PRICE when unknown
+    ("_pad", "u1", (5,)),
+    ("features", "<f4", (DIM,)),
+])
+STRINGS_PER_RECORD = 3  # name, category, source
+
+# magic, version, flags, record size, schema crc, chunks, records, data end
+HEADER = struct.Struct("<8sHHIIIQQ")
+HEADER_SIZE = 64
+# magic, records, cities, blob size, payload crc
+CHUNK = struct.Struct("<4sIIQI")
+CHUNK_SIZE = 32
+CHUNK_MAGIC = b"CHNK"
+
+GROUP_BITS = {g: 1 << i for i, g in enumerate(CATEGORY_GROUPS)}
+NO_PRICE = -1
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def schema_crc() -> int:
+    """Changes whenever the record layout or the feature vector does; old files must be rebuilt."""
+    return zlib.crc32(repr((RECORD.descr, FEATURES, list(CATEGORY_GROUPS))).encode())
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _pack_header(n_chunks: int, n_records: int, data_end: int) -> bytes:
+    head = HEADER.pack(MAGIC, VERSION, 0, RECORD.itemsize, schema_crc(), n_chunks, n_records, data_end)
+    head += struct.pack("<I", zlib.crc32(head))
+    return head.ljust(HEADER_SIZE, b"\0")
+
+
+def _read_header(buf) -> Tuple[int, int, int]:
+    if len(buf) < HEADER_SIZE:
+        raise SnapshotError("file too short for a snapshot header")
+    magic, version, _, record_size, schema, n_chunks, n_records, data_end = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a pool snapshot")
+    (crc,) = struct.unpack_from("<I", buf, HEADER.size)
+    if crc != zlib.crc32(bytes(buf[:HEADER.size])):
+        raise SnapshotError("header checksum mismatch")
+    if version != VERSION or record_size != RECORD.itemsize or schema != schema_crc():
+        raise SnapshotError(f"snapshot schema v{version} does not match v{VERSION}; rebuild it")
+    return n_chunks, n_records, data_end
+
+
+# -----------------------
+# Writing
+# -----------------------
+def pool_rows(pools: Dict[str, Dict]) -> List[Tuple[str, Dict, int]]:
+    """(city, entry, cluster) rows for {city: CityPool.data}, cluster members first in cluster order."""
+    rows = []
+    for city in sorted(pools):
+        data = pools[city]
+        seen = set()
+        for ci, members in enumerate(data.get("clusters", [])):
+            for pid in members:
+                e = data["places"].get(str(pid))
+                if e is not None and pid not in seen:
+                    seen.add(pid)
+                    rows.append((city, e, ci))
+        rows.extend((city, e, -1) for e in data["places"].values() if e["id"] not in seen)
+    return rows
+
+
+def encode_chunk(rows: List[Tuple[str, Dict, int]]) -> bytes:
+    """One chunk (header + payload) for (city, entry, cluster) rows."""
+    rows = sorted(rows, key=lambda r: r[0])  # stable: keeps cluster order within a city
+    cities = sorted({r[0] for r in rows})
+    city_index = {c: i for i, c in enumerate(cities)}
+
+    records = np.zeros(len(rows), dtype=RECORD)
+    strings = [c.encode() for c in cities]
+    for i, (city, e, cluster) in enumerate(rows):
+        f = e.get("features")
+        rec = records[i]
+        rec["id"] = e["id"]
+        rec["lat"] = e["lat"]
+        rec["lon"] = e["lon"]
+        rec["rating"] = np.nan if e.get("rating") is None else e["rating"]
+        rec["cluster"] = cluster
+        rec["city"] = city_index[city]
+        rec["category_mask"] = sum(GROUP_BITS[g] for g in place_groups(e.get("category")))
+        rec["price_level"] = NO_PRICE if e.get("price_level") is None else e["price_level"]
+        rec["features"] = f if f and len(f) == DIM else place_features(e.get("category"), e.get("rating"), e.get("price_level"))
+        strings.append((e.get("name") or "").encode())
+        strings.append((e.get("category") or "").encode())
+        strings.append((e.get("source") or "").encode())
+
+    offsets = np.zeros(len(strings) + 1, dtype="<i8")
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    blob = b"".join(strings)
+    payload = records.tobytes() + offsets.tobytes() + blob
+    payload = payload.ljust(_align(len(payload)), b"\0")
+    head = CHUNK.pack(CHUNK_MAGIC, len(records), len(cities), len(blob), zlib.crc32(payload))
+    return head.ljust(CHUNK_SIZE, b"\0") + payload
+
+
+def write_snapshot(path: str, pools: Dict[str, Dict]) -> int:
+    """Write a fresh single-chunk snapshot atomically. Returns the record count."""
+    rows = pool_rows(pools)
+    chunk = encode_chunk(rows)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_pack_header(1, len(rows), HEADER_SIZE + len(chunk)))
+        f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def append_rows(path: str, rows: List[Tuple[str, Dict, int]]) -> int:
+    """Append one chunk, then commit it by rewriting the header. Returns the appended count."""
+    if not rows:
+        return 0
+    chunk = encode_chunk(rows)
+    with open(path, "r+b") as f:
+        n_chunks, n_records, data_end = _read_header(f.read(HEADER_SIZE))
+        f.seek(data_end)
+        f.write(chunk)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_pack_header(n_chunks + 1, n_records + len(rows), data_end + len(chunk)))
+        f.flush()
+        os.fsync(f.fileno())
+    return len(rows)
+
+
+# -----------------------
+# Reading
+# -----------------------
+class _Chunk:
+    def __init__(self, buf, offset: int, check: bool):
+        magic, n, n_cities, blob_size, crc = CHUNK.unpack_from(buf, offset)
+        if magic != CHUNK_MAGIC:
+            raise SnapshotError(f"bad chunk header at byte {offset}")
+        start = offset + CHUNK_SIZE
+        n_strings = n_cities + STRINGS_PER_RECORD * n
+        payload_size = _align(n * RECORD.itemsize + (n_strings + 1) * 8 + blob_size)
+        if start + payload_size > len(buf):
+            raise SnapshotError(f"chunk at byte {offset} is truncated")
+        if check and zlib.crc32(buf[start:start + payload_size]) != crc:
+            raise SnapshotError(f"chunk at byte {offset} fails its checksum")
+
+        self.records = np.frombuffer(buf, dtype=RECORD, count=n, offset=start)
+        self.offsets = np.frombuffer(buf, dtype="<i8", count=n_strings + 1, offset=start + n * RECORD.itemsize)
+        self.blob = np.frombuffer(buf, dtype=np.uint8, count=blob_size, offset=start + n * RECORD.itemsize + (n_strings + 1) * 8)
+        self.n_cities = n_cities
+        self.cities = [self.string(i) for i in range(n_cities)]
+        self.end = start + payload_size
+
+        # records are sorted by city, so every city is one contiguous slice
+        bounds = np.searchsorted(self.records["city"], np.arange(n_cities + 1))
+        self.spans = {c: (int(bounds[i]), int(bounds[i + 1])) for i, c in enumerate(self.cities)}
+
+    def string(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+    def record_string(self, row: int, field: int) -> str:
+        return self.string(self.n_cities + row * STRINGS_PER_RECORD + field)
+
+
+class PoolSnapshotFile:
+    """A memory-mapped snapshot; record views stay valid while this object is alive."""
+
+    def __init__(self, path: str, check: bool = True):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.n_chunks, self.n_records, self.data_end = _read_header(self._mm)
+        if self.data_end > len(self._mm):
+            raise SnapshotError("file is shorter than its header says")
+        self.chunks: List[_Chunk] = []
+        offset = HEADER_SIZE
+        for _ in range(self.n_chunks):
+            chunk = _Chunk(self._mm, offset, check)
+            self.chunks.append(chunk)
+            offset = chunk.end
+        self.cities = sorted({c for chunk in self.chunks for c in chunk.cities})
+
+    def max_place_id(self) -> int:
+        return max((int(c.records["id"].max()) for c in self.chunks if len(c.records)), default=0)
+
+    def city_records(self, city: str) -> List[np.ndarray]:
+        """Zero-copy record slices of one city, oldest chunk first."""
+        out = []
+        for chunk in self.chunks:
+            span = chunk.spans.get(city)
+            if span and span[1] > span[0]:
+                out.append(chunk.records[span[0]:span[1]])
+        return out
+
+    def pool_data(self, city: str, top_n: int = TOP_N) -> Optional[Dict]:
+        """The city's pool in the same shape as CityPool.data."""
+        places: Dict[str, Dict] = {}
+        masks: Dict[int, int] = {}
+        clusters: Dict[int, List[int]] = {}
+        clustered = set()
+        found = False
+        for chunk in self.chunks:
+            span = chunk.spans.get(city)
+            if span is None:
+                continue
+            found = True
+            for row in range(*span):
+                r = chunk.records[row]
+                pid = int(r["id"])
+                rating = float(r["rating"])
+                price = int(r["price_level"])
+                places[str(pid)] = {
+                    "id": pid,
+                    "name": chunk.record_string(row, 0),
+                    "lat": float(r["lat"]),
+                    "lon": float(r["lon"]),
+                    "category": chunk.record_string(row, 1) or None,
+                    "rating": None if rating != rating else round(rating, 2),
+                    "price_level": None if price == NO_PRICE else price,
+                    "source": chunk.record_string(row, 2) or None,
+                    "features": [round(x, 4) for x in r["features"].tolist()],
+                }
+                masks[pid] = int(r["category_mask"])
+                if r["cluster"] >= 0 and pid not in clustered:
+                    clustered.add(pid)
+                    clusters.setdefault(int(r["cluster"]), []).append(pid)
+        if not found:
+            return None
+
+        ranked = sorted(places.values(), key=lambda e: (-(e["rating"] or 0), e["id"]))
+        top = {g: [e["id"] for e in ranked if masks[e["id"]] & bit][:top_n] for g, bit in GROUP_BITS.items()}
+        return {"places": places, "top": top, "clusters": [clusters[k] for k in sorted(clusters)]}
+
+
+def verify(path: str) -> Dict:
+    """Full check: header, schema, every chunk checksum, string offsets and ids."""
+    snap = PoolSnapshotFile(path, check=True)
+    problems = []
+    total = 0
+    for i, chunk in enumerate(snap.chunks):
+        total += len(chunk.records)
+        if len(chunk.offsets) and (np.diff(chunk.offsets) < 0).any():
+            problems.append(f"chunk {i}: string offsets are not monotonic")
+        if len(chunk.offsets) and chunk.offsets[-1] != len(chunk.blob):
+            problems.append(f"chunk {i}: string offsets do not cover the blob")
+        if (np.diff(chunk.records["city"].astype(np.int64)) < 0).any():
+            problems.append(f"chunk {i}: records are not sorted by city")
+        for city, (a, b) in chunk.spans.items():
+            ids = chunk.records["id"][a:b]
+            if len(np.unique(ids)) != len(ids):
+                problems.append(f"chunk {i}: duplicate place ids in {city!r}")
+    if total != snap.n_records:
+        problems.append(f"header says {snap.n_records} records, chunks hold {total}")
+    size = os.path.getsize(path)
+    if size > snap.data_end:
+        problems.append(f"{size - snap.data_end} uncommitted bytes after the last chunk (interrupted append)")
+    return {
+        "path": path,
+        "version": VERSION,
+        "chunks": snap.n_chunks,
+        "records": snap.n_records,
+        "cities": len(snap.cities),
+        "max_place_id": snap.max_place_id(),
+        "problems": problems,
+    }
+
+
+# -----------------------
+# Startup mapping
+# -----------------------
+_mapped: Optional[PoolSnapshotFile] = None
+
+
+def load(path: Optional[str] = SNAPSHOT_PATH) -> Optional[PoolSnapshotFile]:
+    """Map the configured snapshot (called from the app lifespan)."""
+    global _mapped
+    _mapped = PoolSnapshotFile(path) if path else None
+    return _mapped
+
+
+def snapshot_pools(cities: Iterable[str]) -> Dict[str, Dict]:
+    """Pools of the given (normalized) cities found in the mapped snapshot."""
+    if _mapped is None:
+        return {}
+    out = {}
+    for city in cities:
+        data = _mapped.pool_data(city)
+        if data is not None:
+            out[city] = data
+    return out
+
+
+# -----------------------
+# DB tools
+# -----------------------
+def build_from_db(db, path: str) -> int:
+    from app.models.trip import CityPool
+
+    return write_snapshot(path, {r.city: r.data for r in db.query(CityPool).all()})
+
+
+def append_from_db(db, path: str, batch_size: int = 5000) -> int:
+    """Append places cached since the snapshot was built to the pools of the cities in their address."""
+    from app.models.trip import Place
+    from app.services.city_pool import _place_entry
+
+    snap = PoolSnapshotFile(path, check=False)
+    cities = snap.cities
+    last_id = snap.max_place_id()
+    del snap
+
+    rows = []
+    while True:
+        batch = db.query(Place).filter(
+            Place.id > last_id,
+            Place.latitude.isnot(None),
+            Place.longitude.isnot(None),
+        ).order_by(Place.id).limit(batch_size).all()
+        if not batch:
+            break
+        for p in batch:
+            if not place_groups(p.category) or not p.address:
+                continue
+            address = normalize_city(p.address)
+            rows.extend((city, _place_entry(p), -1) for city in cities if city in address)
+        last_id = batch[-1].id
+    return append_rows(path, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="build, extend and check city pool snapshots")
+    parser.add_argument("command", choices=["build", "append", "verify", "info"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "append"):
+        from app.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            if args.command == "build":
+                n = build_from_db(db, args.path)
+                print(f"wrote {n} places to {args.path}")
+            else:
+                n = append_from_db(db, args.path)
+                print(f"appended {n} places to {args.path}")
+        finally:
+            db.close()
+        return
+
+    try:
+        report = verify(args.path)
+    except SnapshotError as e:
+        print(f"{args.path}: {e}")
+        sys.exit(1)
+    for key in ("version", "chunks", "records", "cities", "max_place_id"):
+        print(f"{key:>14}: {report[key]}")
+    if args.command == "verify":
+        for problem in report["problems"]:
+            print(f"problem: {problem}")
+        print("ok" if not report["problems"] else "FAILED")
+        sys.exit(1 if report["problems"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# app/services/pool_store.py
+"""
+Shared-memory snapshot of the city pools for multi-worker deployments.
+
+One loader process writes every CityPool as a pool snapshot (the binary
+format in pool_snapshot.py: fixed-width records with coordinates, ratings,
+category masks, cluster ids and feature vectors, plus a string blob) to a
+memory-backed directory (/dev/shm). Workers mmap the file read-only and
+read the records as numpy views, so N workers share one copy and skip the
+city_pools query.
+
+Swaps are atomic through a generation counter: the loader writes
+`<name>.<generation>` completely, then stores the new generation in the
+8-byte control file `<name>.ctl`. Readers compare the counter on every
+access and re-map when it moved. Older generations are unlinked; mappings
+already open stay valid until the last view on them is dropped.
+
+Run the loader next to the API workers (e.g. every 5 minutes):
+
+    python -m app.services.pool_store --interval 300
+    python -m app.services.pool_store --snapshot pools.snap --interval 300
+
+and set POOL_SHM_ENABLED=1 for the workers.
+"""
+import argparse
+import glob
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from app.services.pool_snapshot import PoolSnapshotFile, SnapshotError, write_snapshot
+
+SHM_DIR = os.getenv("POOL_SHM_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+SHM_NAME = os.getenv("POOL_SHM_NAME", "onetrip-pools")
+KEEP_GENERATIONS = 2
+
+CTL = struct.Struct("<Q")
+
+
+def _ctl_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.ctl")
+
+
+def _data_path(directory: str, name: str, generation: int) -> str:
+    return os.path.join(directory, f"{name}.{generation}")
+
+
+# -----------------------
+# Publishing (loader side)
+# -----------------------
+def _swap(directory: str, name: str, generation: int):
+    ctl = _ctl_path(directory, name)
+    # the swap: one aligned 8-byte write readers poll
+    if not os.path.exists(ctl):
+        with open(ctl, "wb") as f:
+            f.write(CTL.pack(0))
+    with open(ctl, "r+b") as f:
+        with mmap.mmap(f.fileno(), CTL.size) as mm:
+            CTL.pack_into(mm, 0, generation)
+
+    for old in glob.glob(_data_path(directory, name, "*")):
+        suffix = old.rsplit(".", 1)[-1]
+        if suffix.isdigit() and int(suffix) <= generation - KEEP_GENERATIONS:
+            os.unlink(old)
+
+
+def publish(pools: Dict[str, Dict], directory: str = SHM_DIR, name: str = SHM_NAME) -> int:
+    """Write a new generation and switch readers to it. Returns the generation."""
+    generation = _read_generation(_ctl_path(directory, name)) + 1
+    write_snapshot(_data_path(directory, name, generation), pools)
+    _swap(directory, name, generation)
+    return generation
+
+
+def publish_file(path: str, directory: str = SHM_DIR, name: str = SHM_NAME) -> int:
+    """Publish an existing snapshot file (see pool_snapshot.py) after checking it."""
+    PoolSnapshotFile(path, check=True)
+    generation = _read_generation(_ctl_path(directory, name)) + 1
+    target = _data_path(directory, name, generation)
+    with open(path, "rb") as src, open(f"{target}.tmp", "wb") as dst:
+        while True:
+            block = src.read(1 << 20)
+            if not block:
+                break
+            dst.write(block)
+    os.replace(f"{target}.tmp", target)
+    _swap(directory, name, generation)
+    return generation
+
+
+def publish_from_db(db, directory: str = SHM_DIR, name: str = SHM_NAME) -> int:
+    from app.models.trip import CityPool
+
+    pools = {r.city: r.data for r in db.query(CityPool).all()}
+    return publish(pools, directory, name)
+
+
+# -----------------------
+# Reading (worker side)
+# -----------------------
+def _read_generation(ctl: str) -> int:
+    try:
+        with open(ctl, "rb") as f:
+            raw = f.read(CTL.size)
+    except FileNotFoundError:
+        return 0
+    return CTL.unpack(raw)[0] if len(raw) == CTL.size else 0
+
+
+class SharedPoolReader:
+    def __init__(self, directory: str = SHM_DIR, name: str = SHM_NAME):
+        self.directory = directory
+        self.name = name
+        self._snapshot: Optional[PoolSnapshotFile] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[PoolSnapshotFile]:
+        """Current generation, re-mapped when the loader has published a new one."""
+        generation = _read_generation(_ctl_path(self.directory, self.name))
+        if generation == 0 or generation == self._generation:
+            return self._snapshot
+        with self._lock:
+            if generation != self._generation:
+                try:
+                    # the loader checked the file; the previous mapping is released once no view references it
+                    self._snapshot = PoolSnapshotFile(_data_path(self.directory, self.name, generation), check=False)
+                    self._generation = generation
+                except (FileNotFoundError, SnapshotError):
+                    pass  # loader is mid-swap; keep serving the old generation
+            return self._snapshot
+
+
+_reader = SharedPoolReader()
+
+
+def shared_pools(cities: Iterable[str]) -> Dict[str, Dict]:
+    """Pools of the given (normalized) cities found in the shared snapshot."""
+    snap = _reader.snapshot()
+    if snap is None:
+        return {}
+    out = {}
+    for city in cities:
+        data = snap.pool_data(city)
+        if data is not None:
+            out[city] = data
+    return out
+
+
+def main(argv=None):
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="publish city pools to shared memory")
+    parser.add_argument("--interval", type=int, default=0, help="seconds between refreshes (0 = once)")
+    parser.add_argument("--snapshot", help="publish this snapshot file first instead of reading the database")
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        generation = publish_file(args.snapshot)
+        print(f"published {args.snapshot} as generation {generation} to {SHM_DIR}")
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+    while True:
+        db = SessionLocal()
+        try:
+            generation = publish_from_db(db)
+        finally:
+            db.close()
+        print(f"published pool snapshot generation {generation} to {SHM_DIR}")
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
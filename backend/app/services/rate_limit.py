@@ -0,0 +1,199 @@
+# app/services/rate_limit.py
+"""
+Per-client rate limits for expensive endpoints (GCRA).
+
+Each policy allows `limit` requests per `period` seconds with bursts of up to
+`burst` requests, per client. Clients are keyed by the JWT `sub` when the
+request carries a valid bearer token, else by IP. GCRA keeps a single
+timestamp per client, the theoretical arrival time (TAT) of the next
+request:
+
+    T = period / limit                       (emission interval)
+    new_tat = max(tat, now) + T
+    allowed  if new_tat - now <= burst * T   (then tat = new_tat)
+    Retry-After = new_tat - now - burst * T
+
+A request can cost several units (a batch of N searches costs N): the TAT
+then moves by N * T, and a request costing more than the burst is only
+allowed from a full allowance.
+
+State lives in a store. MemoryStore is in-process and the default. With N
+workers it enforces N times the limit, so deployments that need a global
+limit set RATE_LIMIT_STORE=postgres (one upsert per limited request in the
+rate_limits table). Any other shared store only needs `update` and a
+`blocking` flag; blocking stores are called from a worker thread so a DB
+round trip never stalls the event loop.
+
+The middleware is app/api/rate_limit.py; benchmarks/bench_rate_limit.py
+measures its overhead.
+"""
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # memory | postgres
+# trust X-Forwarded-For (only behind a proxy that sets it)
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    methods: Tuple[str, ...]
+    path: str  # regex on the request path
+    limit: int  # requests per period
+    period: float  # seconds
+    burst: int
+    by: str = "user"  # "user" (JWT sub, else IP) or "ip"
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * self.burst
+
+
+POLICIES: List[Policy] = [
+    # CPU heavy: candidate scoring, assignment, travel costs
+    Policy("itinerary", ("POST",), r"^/trips/\d+/generate_itinerary$", limit=10, period=60, burst=3),
+    Policy("transport", ("POST",), r"^/trips/\d+/transport$", limit=10, period=60, burst=3),
+    # paid provider quota; a batch costs one unit per query (up to MAX_BATCH_QUERIES = 20)
+    Policy("places-search", ("GET", "POST"), r"^/places/search(/.*)?$", limit=60, period=60, burst=20),
+    # password guessing
+    Policy("login", ("POST",), r"^/auth/login$", limit=10, period=60, burst=5, by="ip"),
+]
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until a request would be allowed (0 when allowed)
+    reset_after: float  # seconds until the client is back to a full burst
+
+
+# -----------------------
+# Stores
+# -----------------------
+class MemoryStore:
+    """TATs in a dict; expired entries are swept every SWEEP_EVERY updates."""
+    SWEEP_EVERY = 10000
+    blocking = False  # microseconds under a lock: fine to call on the event loop
+
+    def __init__(self):
+        self.tats: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.updates = 0
+
+    def update(self, key: str, interval: float, tolerance: float, now: float) -> Tuple[bool, float]:
+        """Apply one request; returns (allowed, tat after the request)."""
+        with self.lock:
+            tat = self.tats.get(key, now)
+            new_tat = (tat if tat > now else now) + interval
+            allowed = new_tat - now <= tolerance
+            if allowed:
+                self.tats[key] = new_tat
+            self.updates += 1
+            if self.updates >= self.SWEEP_EVERY:
+                self.updates = 0
+                self.tats = {k: t for k, t in self.tats.items() if t > now}
+            return allowed, new_tat if allowed else tat
+
+
+class PostgresStore:
+    """TATs in the rate_limits table, shared by every worker (one statement per request)."""
+    blocking = True  # a DB round trip: the middleware runs it in a worker thread
+
+    UPSERT = (
+        "INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval) "
+        "ON CONFLICT (key) DO UPDATE SET tat = GREATEST(rate_limits.tat, :now) + :interval "
+        "WHERE GREATEST(rate_limits.tat, :now) + :interval - :now <= :tolerance "
+        "RETURNING tat"
+    )
+
+    def __init__(self, engine=None):
+        self.engine = engine  # default: the app engine, resolved on first use
+
+    def update(self, key: str, interval: float, tolerance: float, now: float) -> Tuple[bool, float]:
+        from sqlalchemy import text
+        from app.db import get_engine
+
+        params = {"key": key, "now": now, "interval": interval, "tolerance": tolerance}
+        with (self.engine or get_engine()).begin() as conn:
+            row = conn.execute(text(self.UPSERT), params).first()
+            if row is not None:
+                return True, row[0]
+            tat = conn.execute(text("SELECT tat FROM rate_limits WHERE key = :key"), {"key": key}).scalar()
+            return False, tat if tat is not None else now
+
+
+def purge_expired(db) -> int:
+    """Drop rate_limits rows whose TAT has passed (they behave like missing rows)."""
+    from app.models.rate_limit import RateLimitState
+
+    n = db.query(RateLimitState).filter(RateLimitState.tat < time.time()).delete(synchronize_session=False)
+    db.commit()
+    return n
+
+
+# -----------------------
+# Limiter
+# -----------------------
+class RateLimiter:
+    def __init__(self, policies: List[Policy], store=None):
+        self.policies = policies
+        self.store = store if store is not None else MemoryStore()
+        self._by_method: Dict[str, List[Tuple[re.Pattern, Policy]]] = {}
+        for p in policies:
+            for m in p.methods:
+                self._by_method.setdefault(m, []).append((re.compile(p.path), p))
+
+    def match(self, method: str, path: str) -> Optional[Policy]:
+        for pattern, policy in self._by_method.get(method, ()):
+            if pattern.match(path):
+                return policy
+        return None
+
+    def hit(self, policy: Policy, client: str, now: Optional[float] = None, cost: int = 1) -> Decision:
+        now = time.time() if now is None else now
+        interval = policy.interval * cost
+        tolerance = max(policy.tolerance, interval)  # more than the burst: only from a full allowance
+        allowed, tat = self.store.update(f"{policy.name}:{client}", interval, tolerance, now)
+        ahead = max(tat - now, 0.0)  # how far the client is ahead of its allowance
+        if allowed:
+            remaining = max(int((policy.tolerance - ahead) // policy.interval), 0)
+            return Decision(True, policy.limit, remaining, 0.0, ahead)
+        retry_after = ahead + interval - tolerance
+        return Decision(False, policy.limit, 0, max(retry_after, 0.0), ahead)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(POLICIES, PostgresStore() if RATE_LIMIT_STORE == "postgres" else MemoryStore())
+    return _limiter
+
+
+def main():
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        n = purge_expired(db)
+    finally:
+        db.close()
+    print(f"purged {n} expired rate limit rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# app/services/scoring.py
+"""
+Preference-aware place scoring.
+
+Every place gets a small float32 feature vector (category groups, rating,
+price band, strenuousness) computed once when it is cached and stored in
+places.features. A trip's Preference becomes a weight vector over the same
+features, and candidates are ranked with one matrix-vector product; the
+top-k is taken with argpartition instead of a full sort.
+
+Feature vectors are built and encoded with the stdlib array module; numpy is
+only imported when candidates are ranked, which keeps it out of app startup.
+"""
+from array import array
+from typing import Dict, List, Optional
+
+# category substrings per feature group
+FEATURE_GROUPS = {
+    "food": ["restaurant", "cafe", "food", "bakery", "meal"],
+    "shopping": ["mall", "shopping", "store", "market"],
+    "nightlife": ["bar", "night_club", "nightclub", "pub", "lounge"],
+    "sights": ["tour", "attract", "point_of_interest", "landmark"],
+    "culture": ["museum", "art_gallery", "gallery", "temple", "church", "mosque", "historic", "monument"],
+    "nature": ["park", "garden", "beach", "natural_feature", "zoo", "lake"],
+}
+# places that are hard to visit with limited mobility
+STRENUOUS = ["hiking", "trail", "natural_feature", "mountain", "trek", "climbing"]
+
+FEATURES = list(FEATURE_GROUPS) + ["rating", "price_low", "price_mid", "price_high", "strenuous"]
+INDEX = {name: i for i, name in enumerate(FEATURES)}
+DIM = len(FEATURES)
+TYPECODE = "f"  # float32, same layout as numpy.float32
+
+
+def place_features(category: Optional[str], rating: Optional[float], price_level: Optional[int]) -> List[float]:
+    vec = [0.0] * DIM
+    cat = (category or "").lower()
+    for group, patterns in FEATURE_GROUPS.items():
+        if any(p in cat for p in patterns):
+            vec[INDEX[group]] = 1.0
+    if rating is not None:
+        # Google rates 0..5, Foursquare 0..10
+        vec[INDEX["rating"]] = min(rating / (10.0 if rating > 5 else 5.0), 1.0)
+    if price_level is not None:
+        if price_level <= 1:
+            vec[INDEX["price_low"]] = 1.0
+        elif price_level == 2:
+            vec[INDEX["price_mid"]] = 1.0
+        else:
+            vec[INDEX["price_high"]] = 1.0
+    if any(p in cat for p in STRENUOUS):
+        vec[INDEX["strenuous"]] = 1.0
+    return vec
+
+
+def encode_features(vec: List[float]) -> bytes:
+    return array(TYPECODE, vec).tobytes()
+
+
+def decode_features(blob: bytes) -> List[float]:
+    vec = array(TYPECODE)
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+def features_for_place(place) -> bytes:
+    """Encoded feature vector for a Place row (stored in places.features)."""
+    return encode_features(place_features(place.category, place.rating, place.price_level))
+
+
+def preference_weights(pref):
+    """Weight vector for a Preference (or None for the default traveller)."""
+    import numpy as np
+
+    w = np.zeros(DIM, dtype=np.float32)
+    w[INDEX["sights"]] = 1.0
+    w[INDEX["culture"]] = 0.6
+    w[INDEX["nature"]] = 0.5
+    w[INDEX["food"]] = 0.3
+    w[INDEX["shopping"]] = 0.1
+    w[INDEX["rating"]] = 1.0
+
+    if pref is None:
+        # same default the itinerary always used: food and shopping lovers
+        w[INDEX["food"]] += 1.0
+        w[INDEX["shopping"]] += 1.0
+        return w
+
+    if pref.foodie:
+        w[INDEX["food"]] += 1.0
+    if pref.shopping:
+        w[INDEX["shopping"]] += 1.0
+    if pref.nightlife:
+        w[INDEX["nightlife"]] += 1.2
+
+    budget = (pref.budget_level or "").lower()
+    if budget == "low":
+        w[INDEX["price_low"]] += 0.5
+        w[INDEX["price_high"]] -= 1.0
+    elif budget == "medium":
+        w[INDEX["price_high"]] -= 0.3
+    elif budget == "high":
+        w[INDEX["price_high"]] += 0.3
+
+    if pref.accessibility_needs and pref.accessibility_needs.strip():
+        w[INDEX["strenuous"]] -= 1.5
+    return w
+
+
+def candidate_matrix(candidates: List[Dict]):
+    """(n, DIM) matrix from candidates' precomputed "features" (bytes or list), computed when missing."""
+    import numpy as np
+
+    m = np.empty((len(candidates), DIM), dtype=np.float32)
+    for i, c in enumerate(candidates):
+        f = c.get("features")
+        if isinstance(f, (bytes, bytearray, memoryview)) and len(f) == DIM * 4:
+            m[i] = np.frombuffer(f, dtype=np.float32)
+        elif isinstance(f, list) and len(f) == DIM:
+            m[i] = f
+        else:
+            m[i] = place_features(c.get("category"), c.get("rating"), c.get("price_level"))
+    return m
+
+
+def rank_candidates(candidates: List[Dict], pref, k: Optional[int] = None) -> List[Dict]:
+    """Top-k candidates by preference score (best first), each with a "score" key."""
+    import numpy as np
+
+    if not candidates:
+        return []
+    scores = candidate_matrix(candidates) @ preference_weights(pref)
+    n = len(candidates)
+    k = n if k is None else min(k, n)
+    if k < n:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(n)
+    top = top[np.argsort(-scores[top], kind="stable")]
+    out = []
+    for i in top:
+        c = {key: v for key, v in candidates[i].items() if key != "features"}
+        c["score"] = round(float(scores[i]), 4)
+        out.append(c)
+    return out
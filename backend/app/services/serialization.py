@@ -0,0 +1,34 @@
+# app/services/serialization.py
+from typing import Any, Iterable, Iterator
+import orjson
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any):
+    # orjson handles dict/list/date/datetime natively; anything else falls back to str
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes with orjson."""
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+
+def ndjson_lines(items: Iterable[Any]) -> Iterator[bytes]:
+    """Yield one JSON document per line (NDJSON) for every item."""
+    for item in items:
+        yield dumps(item) + b"\n"
+
+
+def _msgpack_default(obj: Any):
+    # same wire values as the JSON encoding: dates and datetimes as ISO strings
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def msgpack_dumps(obj: Any) -> bytes:
+    """Serialize to MessagePack bytes (msgpack is imported on first use)."""
+    import msgpack
+    return msgpack.packb(obj, default=_msgpack_default)
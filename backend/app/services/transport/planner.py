@@ -0,0 +1,178 @@
+# app/services/transport/planner.py
+"""
+Transport planning between consecutive trip segments.
+
+For every hop (segment i -> segment i+1) the planner queries all providers
+concurrently, ranks the options by price, duration and the traveller's
+budget preference (Pareto frontier first), caches them per
+(origin, destination, date) and stores them on the arriving segment.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.trip import TransportOption
+from app.services.transport.providers import get_providers
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv("TRANSPORT_CACHE_TTL", "3600"))  # seconds
+MAX_WORKERS = int(os.getenv("TRANSPORT_MAX_WORKERS", "8"))
+
+# weight on price vs duration per Preference.budget_level
+PRICE_WEIGHT = {"low": 0.75, "medium": 0.5, "high": 0.25}
+
+_cache: Dict[Tuple[str, str, date], Tuple[float, List[Dict]]] = {}
+_cache_lock = threading.Lock()
+
+
+def build_hops(trip) -> List[Dict]:
+    segments = sorted(trip.segments, key=lambda s: (s.start_date, s.id or 0))
+    return [{
+        "from_segment": a,
+        "to_segment": b,
+        "origin": a.city,
+        "destination": b.city,
+        "date": b.start_date,
+    } for a, b in zip(segments, segments[1:]) if a.city.strip().lower() != b.city.strip().lower()]
+
+
+def _cache_key(origin: str, destination: str, on: date):
+    return (origin.strip().lower(), destination.strip().lower(), on)
+
+
+def _cached(key) -> Optional[List[Dict]]:
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        if hit:
+            del _cache[key]
+    return None
+
+
+def _store(key, options: List[Dict]):
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + CACHE_TTL, options)
+
+
+def _search(provider, origin: str, destination: str, on: date) -> List[Dict]:
+    try:
+        return provider.search(origin, destination, on)
+    except Exception:
+        logger.warning("transport provider %s failed for %s -> %s", provider.name, origin, destination, exc_info=True)
+        return []
+
+
+def fetch_options(hops: List[Dict], providers=None) -> Dict[Tuple[str, str, date], List[Dict]]:
+    """Options per hop key; cache misses are fetched from every provider concurrently."""
+    providers = providers if providers is not None else get_providers()
+    results: Dict[Tuple[str, str, date], List[Dict]] = {}
+    todo = []
+    for hop in hops:
+        key = _cache_key(hop["origin"], hop["destination"], hop["date"])
+        if key in results:
+            continue
+        cached = _cached(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            results[key] = []
+            todo.append((key, hop))
+
+    if todo and providers:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(todo) * len(providers))) as pool:
+            futures = [
+                (key, pool.submit(_search, p, hop["origin"], hop["destination"], hop["date"]))
+                for key, hop in todo for p in providers
+            ]
+            for key, fut in futures:
+                results[key].extend(fut.result())
+        for key, _ in todo:
+            _store(key, results[key])
+    return results
+
+
+def _num(value) -> float:
+    return float("inf") if value is None else float(value)
+
+
+def pareto_front(options: List[Dict]) -> List[Dict]:
+    """Options not beaten on both price and duration by another option."""
+    ordered = sorted(options, key=lambda o: (_num(o.get("price")), _num(o.get("duration_minutes"))))
+    front = []
+    best_duration = float("inf")
+    for o in ordered:
+        d = _num(o.get("duration_minutes"))
+        if d < best_duration:
+            front.append(o)
+            best_duration = d
+    return front
+
+
+def rank_options(options: List[Dict], budget_level: Optional[str] = None) -> List[Dict]:
+    """Pareto-optimal options first, each group ordered by a normalized weighted score."""
+    if not options:
+        return []
+    w = PRICE_WEIGHT.get(budget_level or "medium", 0.5)
+    prices = [_num(o.get("price")) for o in options if o.get("price") is not None] or [1.0]
+    durations = [_num(o.get("duration_minutes")) for o in options if o.get("duration_minutes") is not None] or [1.0]
+    max_price, max_duration = max(prices) or 1.0, max(durations) or 1.0
+
+    def score(o):
+        p = min(_num(o.get("price")) / max_price, 2.0)
+        d = min(_num(o.get("duration_minutes")) / max_duration, 2.0)
+        return w * p + (1 - w) * d
+
+    front_ids = {id(o) for o in pareto_front(options)}
+    ranked = sorted(options, key=lambda o: (id(o) not in front_ids, score(o)))
+    return [dict(o, pareto=id(o) in front_ids, score=round(score(o), 4)) for o in ranked]
+
+
+def plan_transport(db: Session, trip, providers=None) -> List[Dict]:
+    """Find, rank and store transport options for every hop of the trip."""
+    hops = build_hops(trip)
+    if not hops:
+        return []
+    budget_level = trip.preferences.budget_level if trip.preferences else None
+    found = fetch_options(hops, providers)
+
+    plan = []
+    rows = []
+    segment_ids = []
+    for hop in hops:
+        ranked = rank_options(found[_cache_key(hop["origin"], hop["destination"], hop["date"])], budget_level)
+        seg = hop["to_segment"]
+        segment_ids.append(seg.id)
+        seg.suggested_transport = ranked[0]["mode"] if ranked else None
+        rows.extend({
+            "segment_id": seg.id,
+            "mode": o["mode"],
+            "provider": o.get("provider"),
+            "price": o.get("price"),
+            "duration_minutes": o.get("duration_minutes"),
+            "departure": o.get("departure"),
+            "arrival": o.get("arrival"),
+            "booking_url": o.get("booking_url"),
+        } for o in ranked)
+        plan.append({
+            "from": hop["origin"],
+            "to": hop["destination"],
+            "date": str(hop["date"]),
+            "segment_id": seg.id,
+            "suggested_transport": seg.suggested_transport,
+            "options": ranked,
+        })
+
+    # replace the previous options of these segments in one DELETE + one bulk INSERT
+    db.query(TransportOption).filter(TransportOption.segment_id.in_(segment_ids)).delete(synchronize_session=False)
+    if rows:
+        db.bulk_insert_mappings(TransportOption, rows)
+    db.commit()
+    return plan
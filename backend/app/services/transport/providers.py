@@ -0,0 +1,82 @@
+# app/services/transport/providers.py
+"""
+Transport option providers. A provider returns options for one hop:
+
+    search(origin, destination, date) -> [{"mode", "provider", "price", "duration_minutes",
+                                          "departure", "arrival", "booking_url"}, ...]
+
+Real APIs (Amadeus, Rail Europe, Busbud...) plug in by adding a class with a
+`name` and a `search` method and registering it in PROVIDERS. Providers are
+enabled by name with TRANSPORT_PROVIDERS; none are by default, so made-up
+fixture options never reach users unless TRANSPORT_PROVIDERS=fixture is set
+(development and tests).
+"""
+import hashlib
+import json
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+
+class FixtureTransportProvider:
+    """
+    Local provider for development and tests. Reads options from a JSON file
+    ({"origin|destination": [option, ...]}, city names lowercased) when
+    TRANSPORT_FIXTURE_PATH is set, otherwise makes up stable options per route.
+    """
+    name = "fixture"
+
+    MODES = {
+        # mode: (km/h, price per km, fixed minutes)
+        "flight": (650, 0.12, 120),
+        "train": (90, 0.06, 20),
+        "bus": (60, 0.03, 15),
+    }
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("TRANSPORT_FIXTURE_PATH")
+        self._data = None
+
+    def _fixture(self) -> Dict[str, List[Dict]]:
+        if self._data is None:
+            self._data = {}
+            if self.path and os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._data = json.load(f)
+        return self._data
+
+    def search(self, origin: str, destination: str, on: date) -> List[Dict]:
+        key = f"{origin.lower()}|{destination.lower()}"
+        if self.path:
+            return [dict(o, provider=o.get("provider", self.name)) for o in self._fixture().get(key, [])]
+
+        seed = int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+        rng = random.Random(seed)
+        km = rng.uniform(150, 1500)
+        options = []
+        for mode, (speed, per_km, fixed) in self.MODES.items():
+            if mode == "flight" and km < 300:
+                continue
+            duration = int(km / speed * 60 + fixed)
+            dep = datetime.combine(on, time(hour=rng.randint(6, 20)))
+            options.append({
+                "mode": mode,
+                "provider": self.name,
+                "price": round(km * per_km * rng.uniform(0.8, 1.3), 2),
+                "duration_minutes": duration,
+                "departure": dep.isoformat(),
+                "arrival": (dep + timedelta(minutes=duration)).isoformat(),
+                "booking_url": None,
+            })
+        return options
+
+
+PROVIDERS = {
+    "fixture": FixtureTransportProvider,
+}
+
+
+def get_providers() -> List:
+    names = [n.strip() for n in os.getenv("TRANSPORT_PROVIDERS", "").split(",") if n.strip()]
+    return [PROVIDERS[n]() for n in names if n in PROVIDERS]
@@ -0,0 +1,180 @@
+# app/services/travel_cost.py
+"""
+Pairwise travel costs between places, cached in two tiers:
+
+- an in-process LRU keyed by (from_place_id, to_place_id, mode),
+- the travel_costs table, shared by workers and across regenerations.
+
+Missing pairs are computed in one batch by a pluggable cost model and written
+back with a single INSERT ... ON CONFLICT DO NOTHING, in a transaction of
+their own so the caller's session is neither committed nor kept holding them.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.trip import TravelCost
+from app.services.geo import haversine
+
+DEFAULT_MODE = os.getenv("TRAVEL_MODE", "drive")
+LRU_SIZE = int(os.getenv("TRAVEL_COST_LRU_SIZE", "200000"))
+
+Pair = Tuple[int, int]
+Cost = Tuple[float, float]  # (distance_km, duration_min)
+
+
+class HaversineCostModel:
+    """Straight-line distance times a mode-specific detour factor, at an average speed."""
+
+    DETOUR = {"walk": 1.3, "drive": 1.4, "transit": 1.5}
+    SPEED_KMH = {"walk": 4.5, "drive": 25.0, "transit": 18.0}
+
+    def cost(self, a: Dict, b: Dict, mode: str) -> Cost:
+        km = haversine(a["lat"], a["lon"], b["lat"], b["lon"]) * self.DETOUR.get(mode, 1.4)
+        return km, km / self.SPEED_KMH.get(mode, 25.0) * 60
+
+    def batch(self, pairs: List[Tuple[Dict, Dict]], mode: str) -> List[Cost]:
+        # a routing engine would answer the whole batch in one request
+        return [self.cost(a, b, mode) for a, b in pairs]
+
+
+def _insert_ignore(bind, rows: List[Dict]):
+    """Insert cost rows, skipping pairs another worker wrote first."""
+    with bind.begin() as conn:
+        dialect = conn.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (pg_insert if dialect == "postgresql" else sqlite_insert)(TravelCost).on_conflict_do_nothing()
+            conn.execute(stmt, rows)
+            return
+        for row in rows:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(TravelCost), row)
+            except IntegrityError:
+                pass  # written concurrently
+
+
+class TravelCostStore:
+    def __init__(self, model=None, lru_size: int = LRU_SIZE):
+        self.model = model or HaversineCostModel()
+        self.lru_size = lru_size
+        self.lru: "OrderedDict[Tuple[int, int, str], Cost]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"lru_hits": 0, "db_hits": 0, "computed": 0}
+
+    def _lru_get(self, key) -> Optional[Cost]:
+        with self.lock:
+            cost = self.lru.get(key)
+            if cost is not None:
+                self.lru.move_to_end(key)
+            return cost
+
+    def _lru_put_many(self, items: Iterable[Tuple[Tuple[int, int, str], Cost]]):
+        with self.lock:
+            for key, cost in items:
+                self.lru[key] = cost
+                self.lru.move_to_end(key)
+            while len(self.lru) > self.lru_size:
+                self.lru.popitem(last=False)
+
+    def costs(self, db: Session, places: Dict[int, Dict], pairs: Iterable[Pair], mode: str = DEFAULT_MODE) -> Dict[Pair, Cost]:
+        """
+        Costs for the given (from_id, to_id) pairs. `places` maps id -> {"lat", "lon"}
+        and is only used for pairs that are neither in the LRU nor in the table.
+        """
+        out: Dict[Pair, Cost] = {}
+        missing: List[Pair] = []
+        for pair in dict.fromkeys(pairs):
+            if pair[0] == pair[1]:
+                out[pair] = (0.0, 0.0)
+                continue
+            cost = self._lru_get((pair[0], pair[1], mode))
+            if cost is None:
+                missing.append(pair)
+            else:
+                out[pair] = cost
+        self.stats["lru_hits"] += len(out)
+        if not missing:
+            return out
+
+        # second tier: one query for every missing pair
+        rows = db.query(TravelCost).filter(
+            TravelCost.mode == mode,
+            tuple_(TravelCost.from_place_id, TravelCost.to_place_id).in_(missing),
+        ).all()
+        found = {(r.from_place_id, r.to_place_id): (r.distance_km, r.duration_min) for r in rows}
+        self.stats["db_hits"] += len(found)
+
+        # batch fill whatever is still unknown
+        todo = [p for p in missing if p not in found]
+        if todo:
+            computed = self.model.batch([(places[a], places[b]) for a, b in todo], mode)
+            new = dict(zip(todo, computed))
+            self.stats["computed"] += len(new)
+            _insert_ignore(db.get_bind(), [
+                {"from_place_id": a, "to_place_id": b, "mode": mode, "distance_km": km, "duration_min": mins}
+                for (a, b), (km, mins) in new.items()
+            ])
+            found.update(new)
+
+        self._lru_put_many(((a, b, mode), cost) for (a, b), cost in found.items())
+        out.update(found)
+        return out
+
+    def matrix(self, db: Session, places: List[Dict], mode: str = DEFAULT_MODE) -> Dict[Pair, Cost]:
+        """Full pairwise matrix for a (small) set of places."""
+        by_id = {p["id"]: p for p in places}
+        return self.costs(db, by_id, [(a, b) for a in by_id for b in by_id if a != b], mode)
+
+
+travel_costs = TravelCostStore()
+
+
+def route_by_cost(places: List[Dict], matrix: Dict[Pair, Cost], start_id: Optional[int] = None) -> List[Dict]:
+    """Nearest-neighbour route by travel time, improved with 2-opt."""
+    if len(places) < 3:
+        return list(places)
+
+    def t(a, b):
+        return matrix[(a["id"], b["id"])][1]
+
+    remaining = list(places)
+    if start_id is not None and any(p["id"] == start_id for p in remaining):
+        first = next(p for p in remaining if p["id"] == start_id)
+    else:
+        first = remaining[0]
+    route = [first]
+    remaining.remove(first)
+    while remaining:
+        nxt = min(remaining, key=lambda p: t(route[-1], p))
+        route.append(nxt)
+        remaining.remove(nxt)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(route) - 1):
+            for j in range(i + 1, len(route)):
+                seg = route[i:j + 1]
+                before = t(route[i - 1], route[i]) + (t(route[j], route[j + 1]) if j + 1 < len(route) else 0)
+                after = t(route[i - 1], route[j]) + (t(route[i], route[j + 1]) if j + 1 < len(route) else 0)
+                # reversing must not make the inner legs worse (costs may be asymmetric)
+                inner_before = sum(t(a, b) for a, b in zip(seg, seg[1:]))
+                inner_after = sum(t(b, a) for a, b in zip(seg, seg[1:]))
+                if after + inner_after < before + inner_before - 1e-9:
+                    route[i:j + 1] = seg[::-1]
+                    improved = True
+    return route
+
+
+def route_totals(route: List[Dict], matrix: Dict[Pair, Cost]) -> Dict[str, float]:
+    km = sum(matrix[(a["id"], b["id"])][0] for a, b in zip(route, route[1:]))
+    mins = sum(matrix[(a["id"], b["id"])][1] for a, b in zip(route, route[1:]))
+    return {"km": round(km, 2), "minutes": round(mins, 1)}
@@ -0,0 +1,39 @@
+# benchmarks/bench_assignment.py
+"""
+Day assignment latency for a long trip.
+
+    cd backend && python -m benchmarks.bench_assignment
+"""
+import random
+import time
+
+from app.services.assignment import assign_days, route_length_km
+
+DAYS = 30
+CANDIDATES = 5000
+BUDGET_MS = 100
+
+
+def main():
+    rng = random.Random(42)
+    places = [{
+        "id": i,
+        "lat": 13.0 + rng.random() * 0.3,
+        "lon": 80.1 + rng.random() * 0.3,
+        "rating": rng.random() * 5,
+    } for i in range(CANDIDATES)]
+
+    for per_day in (2, 4, 6):
+        timings = []
+        for run in range(5):
+            t0 = time.perf_counter()
+            days = assign_days(places, DAYS, per_day, rng=random.Random(run))
+            timings.append((time.perf_counter() - t0) * 1000)
+        worst = max(timings)
+        print(f"per_day={per_day} days={DAYS} candidates={CANDIDATES}: "
+              f"median={sorted(timings)[len(timings) // 2]:.1f}ms worst={worst:.1f}ms "
+              f"route={route_length_km(days):.1f}km {'OK' if worst < BUDGET_MS else 'OVER BUDGET'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_knapsack.py
+"""
+Budget selection latency: one knapsack call per day at the candidate counts
+itinerary generation hands it (per_day * OVERSUBSCRIBE), plus larger pools,
+and a whole trip of DayBudget.select calls.
+
+    cd backend && python -m benchmarks.bench_knapsack
+"""
+import random
+import time
+
+from app.services.budget import OVERSUBSCRIBE, DayBudget, activity_cost, activity_slots, knapsack
+
+DAYS = 30
+RUNS = 200
+BUDGET_MS = 5  # per day
+CATEGORIES = ["restaurant", "cafe", "museum", "park", "shopping_mall", "bar", "tourist_attraction"]
+
+
+def candidates(rng: random.Random, n: int):
+    return [{
+        "id": i,
+        "category": rng.choice(CATEGORIES),
+        "rating": rng.random() * 5,
+        "score": rng.random(),
+        "price_level": rng.choice([None, 0, 1, 2, 3, 4]),
+    } for i in range(n)]
+
+
+def main():
+    rng = random.Random(42)
+    knapsack([1.0], [1], [1.0], 1, 1.0)  # load numpy outside the timings
+
+    for per_day in (2, 4, 6):
+        for n in (per_day * OVERSUBSCRIBE, 50, 200):
+            for allowance in (40.0, 120.0, 400.0):
+                items = candidates(rng, n)
+                values = [c["score"] + 1.0 for c in items]
+                slots = [activity_slots(c) for c in items]
+                costs = [activity_cost(c) for c in items]
+                timings = []
+                for _ in range(RUNS):
+                    t0 = time.perf_counter()
+                    knapsack(values, slots, costs, per_day, allowance)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                timings.sort()
+                print(f"knapsack per_day={per_day} candidates={n:3d} allowance={allowance:5.0f}: "
+                      f"median={timings[len(timings) // 2]:.3f}ms worst={timings[-1]:.3f}ms "
+                      f"{'OK' if timings[-1] < BUDGET_MS else 'OVER BUDGET'}")
+
+    for per_day in (2, 4, 6):
+        routes = [candidates(rng, per_day * OVERSUBSCRIBE) for _ in range(DAYS)]
+        budget = DayBudget(120.0 * DAYS, DAYS)
+        t0 = time.perf_counter()
+        picked = sum(len(budget.select(route, per_day)) for route in routes)
+        total = (time.perf_counter() - t0) * 1000
+        print(f"DayBudget.select per_day={per_day} days={DAYS}: total={total:.1f}ms "
+              f"per_day={total / DAYS:.3f}ms picked={picked} left={budget.remaining:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_negotiation.py
+"""
+Payload size and encode time of a large read_trip response (full graph:
+segments, days, activities and their places) in each negotiated format:
+JSON and MessagePack, each uncompressed, gzip'ed and brotli'ed (when the
+`brotli` package is installed). No database needed, the trip is synthetic.
+
+    cd backend
+    python -m benchmarks.bench_negotiation --segments 4 --days 14 --activities 8
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import orjson
+
+from app.api.negotiation import BROTLI_QUALITY, GZIP_LEVEL, _Compressor, brotli
+from app.schemas.trip import TripView
+from app.services.serialization import msgpack_dumps
+
+CATEGORIES = ["restaurant", "museum, tourist_attraction", "park", "cafe", "shopping_mall", "bar"]
+
+
+def synthetic_trip(segments: int, days: int, activities: int) -> dict:
+    rng = random.Random(7)
+    start = date(2025, 6, 1)
+    ids = iter(range(1, 10 ** 9))
+    trip = {
+        "id": 1, "user_id": 1, "title": "Grand tour", "description": "Synthetic benchmark trip",
+        "start_date": start, "end_date": start + timedelta(days=segments * days), "budget": 5000.0,
+        "created_at": None, "updated_at": None, "version": 3, "segments": [],
+        "preferences": {"id": 1, "trip_id": 1, "pace": "moderate", "foodie": True, "shopping": False,
+                        "nightlife": False, "accessibility_needs": None, "budget_level": "medium"},
+    }
+    for s in range(segments):
+        seg_id = next(ids)
+        seg_start = start + timedelta(days=s * days)
+        lat, lon = 40 + rng.random() * 10, rng.random() * 20
+        seg = {"id": seg_id, "trip_id": 1, "city": f"City {s}", "country": "Country", "start_date": seg_start,
+               "end_date": seg_start + timedelta(days=days), "suggested_transport": "train", "notes": None,
+               "latitude": lat, "longitude": lon, "geoname_id": 1000 + s, "days": [], "transport_options": []}
+        for d in range(days):
+            day_id = next(ids)
+            day = {"id": day_id, "segment_id": seg_id, "day_number": d + 1, "date": seg_start + timedelta(days=d),
+                   "activities": []}
+            for a in range(activities):
+                place_id = next(ids)
+                plat, plon = lat + rng.random() * 0.1, lon + rng.random() * 0.1
+                day["activities"].append({
+                    "id": next(ids), "day_id": day_id, "place_id": place_id, "name": f"Visit {place_id}",
+                    "type": "sightseeing", "start_time": f"{9 + a}:00", "end_time": f"{10 + a}:00",
+                    "latitude": plat, "longitude": plon, "estimated_cost": round(rng.random() * 40, 2),
+                    "notes": "Book tickets ahead" if a % 3 == 0 else None,
+                    "place": {"id": place_id, "name": f"Place {place_id}", "category": rng.choice(CATEGORIES),
+                              "rating": round(3 + rng.random() * 2, 1), "price_level": rng.randint(0, 4),
+                              "address": f"{place_id} Main Street, City {s}", "latitude": plat, "longitude": plon,
+                              "source": "google", "external_id": f"ChIJ{place_id:012d}"},
+                })
+            seg["days"].append(day)
+        trip["segments"].append(seg)
+    return trip
+
+
+def _time(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segments", type=int, default=4)
+    ap.add_argument("--days", type=int, default=14)
+    ap.add_argument("--activities", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    view = TripView.parse("segments.days.activities.place,segments.transport_options,preferences")
+    model = view.model.model_validate(synthetic_trip(args.segments, args.days, args.activities))
+
+    encoders = {
+        "json (model_dump_json)": lambda: model.model_dump_json().encode(),
+        "json (orjson of model_dump)": lambda: orjson.dumps(model.model_dump(mode="json")),
+        "msgpack (of model_dump)": lambda: msgpack_dumps(model.model_dump(mode="json")),
+    }
+    codings = {"identity": None, f"gzip-{GZIP_LEVEL}": "gzip"}
+    if brotli is not None:
+        codings[f"br-{BROTLI_QUALITY}"] = "br"
+    else:
+        print("(brotli not installed: gzip only)")
+
+    print(f"{'format':30s} {'coding':10s} {'bytes':>10s} {'encode ms':>10s} {'compress ms':>12s}")
+    for name, encode in encoders.items():
+        body, t_encode = _time(encode, args.repeat)
+        for coding, encoding in codings.items():
+            if encoding is None:
+                size, t_compress = len(body), 0.0
+            else:
+                out, t_compress = _time(lambda: _Compressor(encoding).finish(body), args.repeat)
+                size = len(out)
+            print(f"{name:30s} {coding:10s} {size:10,d} {t_encode * 1000:10.2f} {t_compress * 1000:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
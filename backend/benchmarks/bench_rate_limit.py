@@ -0,0 +1,171 @@
+# benchmarks/bench_rate_limit.py
+"""
+Cost of rate limiting: raw store updates per second, and the per-request
+overhead RateLimitMiddleware adds in front of a trivial ASGI app, for
+unmatched paths, matched anonymous requests and matched bearer requests.
+
+No database needed for the in-process store:
+
+    cd backend
+    python -m benchmarks.bench_rate_limit --requests 200000
+
+With BENCH_DATABASE_URL it also measures the shared Postgres store: update
+round trips, and concurrent matched requests through the middleware. The
+worst event-loop stall seen meanwhile is reported both for updates run on
+the loop and for updates offloaded to a worker thread (what the middleware
+does). The rate_limits table of that database is created if missing and
+its bench:* rows are deleted afterwards.
+
+    BENCH_DATABASE_URL=postgresql://postgres:pw@localhost:5432/onetrip_bench \\
+        python -m benchmarks.bench_rate_limit --requests 20000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from app.api.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.services.auth import create_access_token  # noqa: E402
+from app.services.rate_limit import MemoryStore, PostgresStore, Policy, RateLimiter, POLICIES  # noqa: E402
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+def _scope(method, path, headers=(), client="10.0.0.1"):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "client": (client, 1234)}
+
+
+async def _run(app, scopes, n):
+    k = len(scopes)
+    t0 = time.perf_counter()
+    for i in range(n):
+        await app(scopes[i % k], _receive, _send)
+    return (time.perf_counter() - t0) / n
+
+
+class _OnLoop:
+    """A store that claims not to block, so the middleware calls it on the event loop."""
+    blocking = False
+
+    def __init__(self, store):
+        self.store = store
+
+    def update(self, *args):
+        return self.store.update(*args)
+
+
+async def _concurrent(app, scopes, n, concurrency):
+    """(requests/s, worst event-loop stall in ms) for n requests, `concurrency` at a time."""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        while not done:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - t0 - 0.001)
+
+    async def worker(offset):
+        for i in range(offset, n, concurrency):
+            await app(scopes[i % len(scopes)], _receive, _send)
+
+    tick = asyncio.ensure_future(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    done = True
+    await tick
+    return n / elapsed, stall * 1000
+
+
+def bench_postgres(url, n, clients, concurrency):
+    from sqlalchemy import create_engine, text
+    from app.models.rate_limit import RateLimitState
+
+    engine = create_engine(url, pool_size=concurrency, max_overflow=0)
+    RateLimitState.__table__.create(engine, checkfirst=True)
+    store = PostgresStore(engine)
+    try:
+        policy = Policy("bench", ("GET",), r"^/x$", limit=1000, period=1, burst=100)
+        keys = [f"bench:ip:{i}" for i in range(clients)]
+        m = min(n, 5000)
+        t0 = time.perf_counter()
+        for i in range(m):
+            store.update(keys[i % len(keys)], policy.interval, policy.tolerance, time.time())
+        dt = time.perf_counter() - t0
+        print(f"PostgresStore.update: {m / dt:,.0f} ops/s ({dt / m * 1e3:.2f} ms/op)")
+
+        loose = [Policy("bench", ("GET",), r"^/places/search$", limit=10 ** 9, period=1, burst=10 ** 9)]
+        scopes = [_scope("GET", "/places/search", client=f"10.1.{i // 256}.{i % 256}") for i in range(clients)]
+        for name, s in (("on the event loop", _OnLoop(store)), ("in worker threads", store)):
+            app = RateLimitMiddleware(bare_app, RateLimiter(loose, s))
+            rate, stall = asyncio.run(_concurrent(app, scopes, n, concurrency))
+            print(f"postgres store, {name:18s} {rate:10,.0f} requests/s  worst loop stall {stall:7.2f} ms")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM rate_limits WHERE key LIKE 'bench:%'"))
+        engine.dispose()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200000)
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=32, help="in-flight requests for the postgres store")
+    args = ap.parse_args()
+    n = args.requests
+
+    store = MemoryStore()
+    policy = Policy("bench", ("GET",), r"^/x$", limit=1000, period=1, burst=100)
+    keys = [f"bench:ip:{i}" for i in range(args.clients)]
+    t0 = time.perf_counter()
+    for i in range(n):
+        store.update(keys[i % len(keys)], policy.interval, policy.tolerance, time.time())
+    dt = time.perf_counter() - t0
+    print(f"MemoryStore.update: {n / dt:,.0f} ops/s ({dt / n * 1e6:.2f} us/op)")
+
+    # generous limits so every request takes the allowed path
+    loose = [Policy(p.name, p.methods, p.path, limit=10 ** 9, period=1, burst=10 ** 9, by=p.by) for p in POLICIES]
+    limited = RateLimitMiddleware(bare_app, RateLimiter(loose, MemoryStore()))
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+    tokens = [create_access_token({"sub": str(i)}) for i in range(min(args.clients, 200))]
+
+    cases = {
+        "unmatched GET /trips/1": [_scope("GET", "/trips/1", client=ip) for ip in ips],
+        "matched GET /places/search, anonymous": [_scope("GET", "/places/search", client=ip) for ip in ips],
+        "matched POST generate_itinerary, bearer": [
+            _scope("POST", "/trips/1/generate_itinerary", [(b"authorization", f"Bearer {t}".encode())])
+            for t in tokens
+        ],
+    }
+    loop = asyncio.new_event_loop()
+    try:
+        for name, scopes in cases.items():
+            base = loop.run_until_complete(_run(bare_app, scopes, n))
+            wrapped = loop.run_until_complete(_run(limited, scopes, n))
+            print(f"{name:42s} bare {base * 1e6:6.2f} us  limited {wrapped * 1e6:6.2f} us  "
+                  f"overhead {(wrapped - base) * 1e6:6.2f} us/request")
+    finally:
+        loop.close()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        bench_postgres(url, n, args.clients, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_trip_list.py
+"""
+Trip list / relationship-load latency with and without the foreign-key and
+keyset indexes, on a synthetic data set (1M trips by default).
+
+Needs a THROWAWAY Postgres database: every table is dropped and recreated.
+
+    cd backend
+    BENCH_DATABASE_URL=postgresql://postgres:pw@localhost:5432/onetrip_bench \\
+        python -m benchmarks.bench_trip_list --trips 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+import app.models  # noqa: F401  (register every table)
+
+INDEXES = {
+    "ix_trips_user_created_id":
+        "CREATE INDEX ix_trips_user_created_id ON trips (user_id, created_at, id) "
+        "INCLUDE (title, start_date, end_date, budget)",
+    "ix_trip_segments_trip_id": "CREATE INDEX ix_trip_segments_trip_id ON trip_segments (trip_id)",
+    "ix_trip_days_segment_id": "CREATE INDEX ix_trip_days_segment_id ON trip_days (segment_id)",
+    "ix_activities_day_id": "CREATE INDEX ix_activities_day_id ON activities (day_id)",
+}
+
+SEED = [
+    "INSERT INTO users (id, email, hashed_password) "
+    "SELECT g, 'bench' || g || '@example.com', 'x' FROM generate_series(1, :users) g",
+    "INSERT INTO trips (id, user_id, title, start_date, end_date, budget, created_at, updated_at) "
+    "SELECT g, 1 + (g % :users), 'trip ' || g, DATE '2025-01-01', DATE '2025-01-10', 1000, "
+    "TIMESTAMP '2024-01-01' + g * INTERVAL '1 second', now() FROM generate_series(1, :trips) g",
+    "INSERT INTO trip_segments (trip_id, city, start_date, end_date) "
+    "SELECT t, 'City ' || s, DATE '2025-01-01', DATE '2025-01-05' "
+    "FROM generate_series(1, :trips) t, generate_series(1, :segments) s",
+    "INSERT INTO trip_days (segment_id, day_number, date) "
+    "SELECT seg.id, d, DATE '2025-01-01' + d FROM trip_segments seg, generate_series(1, :days) d",
+    "INSERT INTO activities (day_id, name) "
+    "SELECT day.id, 'activity ' || a FROM trip_days day, generate_series(1, :activities) a",
+]
+
+QUERIES = {
+    "list first page":
+        "SELECT id, title, start_date, end_date, budget, created_at FROM trips "
+        "WHERE user_id = :user ORDER BY created_at DESC, id DESC LIMIT 21",
+    "list deep page (cursor)":
+        "SELECT id, title, start_date, end_date, budget, created_at FROM trips "
+        "WHERE user_id = :user AND (created_at, id) < (:cursor_ts, :cursor_id) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+    "segments of a trip": "SELECT * FROM trip_segments WHERE trip_id = :trip",
+    "days of a segment": "SELECT * FROM trip_days WHERE segment_id = :segment",
+    "activities of a day": "SELECT * FROM activities WHERE day_id = :day",
+}
+
+
+def _time(conn, sql, params, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def _measure(conn, params, runs):
+    return {name: _time(conn, sql, params, runs) for name, sql in QUERIES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trips", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--segments", type=int, default=2, help="segments per trip")
+    parser.add_argument("--days", type=int, default=2, help="days per segment")
+    parser.add_argument("--activities", type=int, default=2, help="activities per day")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("set BENCH_DATABASE_URL to a throwaway Postgres database")
+    engine = create_engine(url)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        print(f"seeding {args.trips} trips ...")
+        t0 = time.perf_counter()
+        for sql in SEED:
+            conn.execute(text(sql), vars(args))
+        print(f"seeded in {time.perf_counter() - t0:.1f}s")
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        trip = args.trips // 2
+        segment = conn.execute(text("SELECT min(id) FROM trip_segments WHERE trip_id = :t"), {"t": trip}).scalar()
+        day = conn.execute(text("SELECT min(id) FROM trip_days WHERE segment_id = :s"), {"s": segment}).scalar()
+        user = 1 + (trip % args.users)
+        cursor_ts, cursor_id = conn.execute(text(
+            "SELECT created_at, id FROM trips WHERE user_id = :u ORDER BY created_at DESC, id DESC OFFSET 60 LIMIT 1"
+        ), {"u": user}).one()
+        params = {"user": user, "trip": trip, "segment": segment, "day": day,
+                  "cursor_ts": cursor_ts, "cursor_id": cursor_id}
+
+        before = _measure(conn, params, args.runs)
+        for sql in INDEXES.values():
+            conn.execute(text(sql))
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+        after = _measure(conn, params, args.runs)
+
+    print(f"\n{'query':<28}{'no index (ms)':>15}{'indexed (ms)':>15}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:<28}{before[name]:>15.2f}{after[name]:>15.2f}{before[name] / max(after[name], 1e-6):>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
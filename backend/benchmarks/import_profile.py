@@ -0,0 +1,75 @@
+# benchmarks/import_profile.py
+"""
+Import-time profile of the API process (what a worker pays before it can
+serve its first request), from `python -X importtime`.
+
+    cd backend
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --top 30 --budget-ms 600 --runs 5
+
+Prints the slowest modules by cumulative and self time and the median total
+over --runs fresh interpreters; exits 1 when the total is over --budget-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+TARGET = "app.main"
+
+
+def profile(module: str):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default=TARGET)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("BOOT_IMPORT_BUDGET_MS", "0")))
+    args = parser.parse_args()
+
+    totals = []
+    rows = []
+    for _ in range(args.runs):
+        rows = profile(args.module)
+        totals.append(next(c for name, _, c in rows if name.strip() == args.module) / 1000)
+
+    print(f"{'cumulative (ms)':>16}{'self (ms)':>12}  module")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cum_us / 1000:>16.1f}{self_us / 1000:>12.1f}  {name}")
+
+    print(f"\n{'self (ms)':>16}  module (top by self time)")
+    for name, self_us, _ in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"{self_us / 1000:>16.1f}  {name.strip()}")
+
+    heavy = ("numpy", "passlib", "argon2", "requests", "psycopg2")
+    loaded = sorted({name.strip() for name, _, _ in rows if name.strip() in heavy})
+    print(f"\nheavy modules imported at boot: {', '.join(loaded) or 'none'}")
+
+    total = statistics.median(totals)
+    print(f"import {args.module}: median {total:.1f} ms over {args.runs} runs")
+    if args.budget_ms and total > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# tests/conftest.py
+"""
+Shared fixtures. Tests run against a throwaway SQLite database, so no
+Postgres is needed:
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="onetrip-tests-")
+# set before anything reads them (the engine and most settings are read on first use)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "test.db")
+os.environ["EXPORT_CACHE_DIR"] = os.path.join(_tmp, "exports")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+# the limiter has its own tests; API tests must not be throttled by each other
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+
+import app.models  # noqa: E402,F401  (registers every table)
+from app.db import Base, SessionLocal, get_engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def user(db):
+    u = User(email="traveller@example.com", hashed_password="x")
+    db.add(u)
+    db.commit()
+    return u
+
+
+@pytest.fixture
+def client(db, user):
+    from fastapi.testclient import TestClient
+
+    from app.api.deps import get_current_user
+    from app.main import create_app
+
+    app = create_app()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
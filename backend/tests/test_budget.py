@@ -0,0 +1,75 @@
+# tests/test_budget.py
+import random
+from itertools import combinations
+
+import pytest
+
+from app.services.budget import COST_BUCKETS, DayBudget, knapsack
+
+
+def best_exact(values, slots, costs, max_slots, max_cost):
+    """Brute force: the best total value of any subset within both limits."""
+    best = 0.0
+    for k in range(len(values) + 1):
+        for subset in combinations(range(len(values)), k):
+            if sum(slots[i] for i in subset) <= max_slots and sum(costs[i] for i in subset) <= max_cost + 1e-9:
+                best = max(best, sum(values[i] for i in subset))
+    return best
+
+
+def instance(rng, n, bucket=None):
+    values = [rng.random() + 1.0 for _ in range(n)]
+    slots = [rng.choice([1, 1, 2]) for _ in range(n)]
+    if bucket is None:
+        costs = [rng.choice([0.0, rng.random() * 60]) for _ in range(n)]
+    else:
+        costs = [rng.randint(0, 40) * bucket for _ in range(n)]
+    return values, slots, costs
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_optimal_when_costs_fall_on_buckets(seed):
+    rng = random.Random(seed)
+    allowance = 100.0
+    values, slots, costs = instance(rng, rng.randint(1, 10), bucket=allowance / COST_BUCKETS)
+    per_day = rng.randint(1, 5)
+
+    chosen = knapsack(values, slots, costs, per_day, allowance)
+    assert sum(slots[i] for i in chosen) <= per_day
+    assert sum(costs[i] for i in chosen) <= allowance + 1e-9
+    assert sum(values[i] for i in chosen) == pytest.approx(best_exact(values, slots, costs, per_day, allowance))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_within_the_rounding_bound(seed):
+    rng = random.Random(1000 + seed)
+    allowance = rng.uniform(20, 150)
+    values, slots, costs = instance(rng, rng.randint(1, 10))
+    per_day = rng.randint(1, 5)
+
+    chosen = knapsack(values, slots, costs, per_day, allowance)
+    assert sum(slots[i] for i in chosen) <= per_day
+    assert sum(costs[i] for i in chosen) <= allowance + 1e-9
+    # at least as good as the best plan under allowance - per_day buckets
+    floor = best_exact(values, slots, costs, per_day, allowance - per_day * allowance / COST_BUCKETS)
+    assert sum(values[i] for i in chosen) >= floor - 1e-9
+
+
+def test_zero_allowance_only_takes_free_items():
+    chosen = knapsack([3.0, 2.0, 1.0], [1, 1, 1], [10.0, 0.0, 0.0], 2, 0.0)
+    assert chosen == [1, 2]
+
+
+def test_negative_costs_are_rejected():
+    with pytest.raises(ValueError):
+        knapsack([1.0], [1], [-5.0], 1, 10.0)
+
+
+def test_unspent_allowance_carries_over():
+    budget = DayBudget(100.0, 2)
+    cheap = [{"id": 1, "rating": 4.0, "estimated_cost": 10.0}]
+    assert [p["id"] for p in budget.select(cheap, 2)] == [1]
+    # day 2 gets the 90 left, not half of the original 100
+    dear = [{"id": 2, "rating": 4.0, "estimated_cost": 80.0}]
+    assert [p["id"] for p in budget.select(dear, 2)] == [2]
+    assert budget.remaining == pytest.approx(10.0)
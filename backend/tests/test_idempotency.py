@@ -0,0 +1,54 @@
+# tests/test_idempotency.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.idempotency import IdempotencyRecord
+from app.models.trip import Trip
+from app.services import idempotency
+from app.services.idempotency import IdempotencyError
+
+TRIP = {"user_id": 0, "title": "Coast", "start_date": "2025-01-01", "end_date": "2025-01-03", "segments": []}
+
+
+def test_retry_replays_the_stored_response(client, db):
+    first = client.post("/trips/", json=TRIP, headers={"Idempotency-Key": "k1"})
+    retry = client.post("/trips/", json=TRIP, headers={"Idempotency-Key": "k1"})
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert db.query(Trip).count() == 1
+
+
+def test_key_reused_with_another_payload_is_rejected(client):
+    client.post("/trips/", json=TRIP, headers={"Idempotency-Key": "k1"})
+    r = client.post("/trips/", json=dict(TRIP, title="Mountains"), headers={"Idempotency-Key": "k1"})
+    assert r.status_code == 422
+
+
+def test_claim_in_progress_is_a_conflict(db, user):
+    assert idempotency.begin(db, user.id, "POST /x", "k", {"a": 1}) is None
+    with pytest.raises(IdempotencyError) as e:
+        idempotency.begin(db, user.id, "POST /x", "k", {"a": 1})
+    assert e.value.status_code == 409
+
+
+def test_abandoned_claim_is_taken_over(db, user):
+    assert idempotency.begin(db, user.id, "POST /x", "k", {"a": 1}) is None
+    # the first request died without completing or releasing its claim
+    stale = datetime.utcnow() - timedelta(seconds=idempotency.LOCK_TIMEOUT + 1)
+    db.query(IdempotencyRecord).update({IdempotencyRecord.created_at: stale})
+    db.commit()
+
+    assert idempotency.begin(db, user.id, "POST /x", "k", {"a": 2}) is None
+    idempotency.complete(db, user.id, "POST /x", "k", 200, {"ok": True})
+    record = idempotency.begin(db, user.id, "POST /x", "k", {"a": 2})
+    assert record.response == {"ok": True}
+
+
+def test_released_claim_runs_again(db, user):
+    assert idempotency.begin(db, user.id, "POST /x", "k", {"a": 1}) is None
+    idempotency.release(db, user.id, "POST /x", "k")
+    assert idempotency.begin(db, user.id, "POST /x", "k", {"a": 1}) is None
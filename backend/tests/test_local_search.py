@@ -0,0 +1,86 @@
+# tests/test_local_search.py
+import math
+import random
+
+import pytest
+
+from app.models.trip import Place
+from app.services.geo import geohash_cover_circle, geohash_encode
+from app.services.places import local, service
+from app.services.places.local import LOCAL_MIN_RESULTS, search_local, tsquery_terms
+
+PROVIDER_RESULT = {"name": "From provider", "source": "google"}
+
+
+@pytest.mark.parametrize("query, terms", [
+    ("italian restaurant", "italian & restaurant"),
+    ("best museums in Chennai", "museums"),
+    ("café near the station", "café"),
+    ("寿司", "寿司"),
+    ("top, Paris", ""),
+])
+def test_tsquery_terms(query, terms):
+    assert tsquery_terms(query) == terms
+
+
+def test_no_terms_means_no_local_scan():
+    class NoQueries:
+        def query(self, *args):
+            raise AssertionError("searched the table without terms")
+
+    assert search_local(NoQueries(), "best near Chennai", 13.08, 80.27) == []
+
+
+@pytest.mark.parametrize("radius_m", [300, 2000, 5000, 25000])
+def test_geohash_cover_holds_the_whole_circle(radius_m):
+    lat, lon = 13.08, 80.27
+    cells = geohash_cover_circle(lat, lon, radius_m)
+    assert len(cells) <= 32
+    precision = len(cells[0])
+    rng = random.Random(radius_m)
+    for _ in range(500):
+        a, d = rng.random() * 2 * math.pi, radius_m * math.sqrt(rng.random())
+        plat = lat + d * math.cos(a) / 111_320
+        plon = lon + d * math.sin(a) / (111_320 * math.cos(math.radians(lat)))
+        assert geohash_encode(plat, plon)[:precision] in cells
+
+
+def hits(n):
+    return [(Place(id=i, name=f"Cached {i}", latitude=13.0, longitude=80.0, source="google"), 0.5) for i in range(n)]
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    calls = []
+
+    def search_once(key, query, ll, radius, limit, use_cache):
+        calls.append(query)
+        return [PROVIDER_RESULT]
+
+    monkeypatch.setattr(service, "_search_once", search_once)
+    return calls
+
+
+def test_local_results_answer_when_the_area_is_covered(db, monkeypatch, provider):
+    monkeypatch.setattr(service, "search_local", lambda *a, **kw: hits(LOCAL_MIN_RESULTS))
+    res = service.search_and_maybe_cache("museum", "13.0,80.0", limit=20, local_first=True)
+    assert len(res) == LOCAL_MIN_RESULTS
+    assert all("distance_km" in r for r in res)
+    assert provider == []
+
+
+def test_thin_local_coverage_falls_back_to_the_providers(db, monkeypatch, provider):
+    monkeypatch.setattr(service, "search_local", lambda *a, **kw: hits(LOCAL_MIN_RESULTS - 1))
+    res = service.search_and_maybe_cache("museum", "13.0,80.0", limit=20, local_first=True)
+    assert res == [PROVIDER_RESULT]
+    assert provider == ["museum"]
+
+
+def test_local_search_is_opt_in(db, monkeypatch, provider):
+    monkeypatch.setattr(service, "search_local", lambda *a, **kw: pytest.fail("local search without local_first"))
+    assert service.search_and_maybe_cache("museum", "13.0,80.0") == [PROVIDER_RESULT]
+
+
+def test_small_requests_need_only_as_many_local_results():
+    assert local.is_covered(hits(3), limit=3)
+    assert not local.is_covered(hits(2), limit=3)
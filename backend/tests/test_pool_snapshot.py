@@ -0,0 +1,68 @@
+# tests/test_pool_snapshot.py
+import random
+
+import pytest
+
+from app.models.trip import Place
+from app.services import pool_snapshot as snap
+from app.services.city_pool import get_city_pools, refresh_city_pool
+
+CATEGORIES = ["restaurant", "museum, tourist_attraction", "bar", "shopping_mall", "cafe"]
+
+
+def add_places(db, city, n, lat, lon, start=0):
+    rng = random.Random(f"{city}{start}")
+    for i in range(start, start + n):
+        db.add(Place(name=f"{city} {i}", address=f"{i} Main Road, {city}, India", category=rng.choice(CATEGORIES),
+                     latitude=lat + rng.random() * 0.1, longitude=lon + rng.random() * 0.1,
+                     rating=round(3 + rng.random() * 2, 1), price_level=rng.randint(0, 4),
+                     source="google", external_id=f"{city}-{i}"))
+    db.commit()
+
+
+@pytest.fixture
+def snapshot(db, tmp_path):
+    add_places(db, "Chennai", 80, 13.0, 80.2)
+    add_places(db, "Mumbai", 20, 19.0, 72.8)
+    refresh_city_pool(db, "Chennai")
+    refresh_city_pool(db, "Mumbai")
+    path = str(tmp_path / "pools.snap")
+    snap.build_from_db(db, path)
+    return path
+
+
+def test_snapshot_round_trips_the_pools(db, snapshot):
+    f = snap.PoolSnapshotFile(snapshot)
+    for city in ("chennai", "mumbai"):
+        assert f.pool_data(city) == get_city_pools(db, [city])[city]
+    assert f.pool_data("delhi") is None
+    assert snap.verify(snapshot)["problems"] == []
+
+
+def test_append_adds_new_places_in_a_new_chunk(db, snapshot):
+    before = len(snap.PoolSnapshotFile(snapshot).pool_data("mumbai")["places"])
+    add_places(db, "Mumbai", 5, 19.0, 72.8, start=100)
+
+    assert snap.append_from_db(db, snapshot) == 5
+    report = snap.verify(snapshot)
+    assert report["chunks"] == 2
+    assert report["problems"] == []
+    assert len(snap.PoolSnapshotFile(snapshot).pool_data("mumbai")["places"]) == before + 5
+    # nothing new: nothing appended
+    assert snap.append_from_db(db, snapshot) == 0
+
+
+def test_verify_reports_an_interrupted_append(snapshot):
+    with open(snapshot, "ab") as f:
+        f.write(b"partial chunk")
+    problems = snap.verify(snapshot)["problems"]
+    assert len(problems) == 1 and "uncommitted" in problems[0]
+
+
+def test_corrupt_chunk_fails_its_checksum(snapshot):
+    data = bytearray(open(snapshot, "rb").read())
+    data[200] ^= 1
+    with open(snapshot, "wb") as f:
+        f.write(data)
+    with pytest.raises(snap.SnapshotError):
+        snap.verify(snapshot)
@@ -0,0 +1,80 @@
+# tests/test_rate_limit.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.rate_limit import RateLimitMiddleware
+from app.services.rate_limit import MemoryStore, Policy, RateLimiter, POLICIES
+
+POLICY = Policy("test", ("GET",), r"^/limited$", limit=60, period=60, burst=5)
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter([POLICY], MemoryStore())
+
+
+def test_burst_then_steady_rate(limiter):
+    decisions = [limiter.hit(POLICY, "ip:a", now=100.0) for _ in range(6)]
+    assert [d.allowed for d in decisions] == [True] * 5 + [False]
+    assert [d.remaining for d in decisions[:5]] == [4, 3, 2, 1, 0]
+    assert decisions[-1].retry_after == pytest.approx(1.0)
+    # one request per emission interval (1s) is let through again
+    assert limiter.hit(POLICY, "ip:a", now=101.0).allowed
+    assert not limiter.hit(POLICY, "ip:a", now=101.5).allowed
+
+
+def test_clients_are_limited_separately(limiter):
+    for _ in range(5):
+        limiter.hit(POLICY, "ip:a", now=0.0)
+    assert not limiter.hit(POLICY, "ip:a", now=0.0).allowed
+    assert limiter.hit(POLICY, "ip:b", now=0.0).allowed
+
+
+def test_denied_requests_do_not_consume_allowance(limiter):
+    for _ in range(20):
+        limiter.hit(POLICY, "ip:a", now=0.0)
+    assert limiter.hit(POLICY, "ip:a", now=1.0).allowed
+
+
+def test_cost_moves_the_allowance_by_several_units(limiter):
+    assert limiter.hit(POLICY, "ip:a", now=0.0, cost=4).remaining == 1
+    assert not limiter.hit(POLICY, "ip:a", now=0.0, cost=2).allowed
+    # more than the burst only passes from a full allowance, and is charged in full
+    assert limiter.hit(POLICY, "ip:b", now=0.0, cost=8).allowed
+    assert not limiter.hit(POLICY, "ip:b", now=3.0).allowed
+    assert limiter.hit(POLICY, "ip:b", now=4.0).allowed
+
+
+def test_decision_reports_the_policy_limit(limiter):
+    assert limiter.hit(POLICY, "ip:a", now=0.0).limit == 60
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_middleware_answers_429_with_headers(limiter):
+    client = TestClient(RateLimitMiddleware(_ok, limiter))
+    responses = [client.get("/limited") for _ in range(6)]
+    assert [r.status_code for r in responses] == [200] * 5 + [429]
+    assert responses[0].headers["RateLimit-Limit"] == "60"
+    assert responses[0].headers["RateLimit-Remaining"] == "4"
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+    assert client.get("/other").status_code == 200
+
+
+def test_batch_search_is_charged_per_query(monkeypatch):
+    from app.api import places
+    from app.main import create_app
+
+    monkeypatch.setattr(places, "search_batch", lambda queries, **kw: [[] for _ in queries])
+    limiter = RateLimiter(POLICIES, MemoryStore())
+    burst = limiter.match("POST", "/places/search/batch").burst
+    client = TestClient(RateLimitMiddleware(create_app(), limiter))
+
+    body = {"queries": [{"q": f"museum {i}"} for i in range(burst - 2)]}
+    first = client.post("/places/search/batch", json=body)
+    assert first.status_code == 200
+    assert first.headers["RateLimit-Remaining"] == "2"
+    assert client.post("/places/search/batch", json=body).status_code == 429
@@ -0,0 +1,51 @@
+# tests/test_trip_patch.py
+import pytest
+
+from app.crud.trip import TripVersionConflict, get_trip_graph, patch_trip
+from app.db import SessionLocal
+from app.schemas.trip import TripPatch
+
+TRIP = {
+    "user_id": 0, "title": "Coast", "start_date": "2025-01-01", "end_date": "2025-01-02",
+    "segments": [{"city": "Chennai", "country": None, "start_date": "2025-01-01", "end_date": "2025-01-02",
+                  "days": [{"day_number": 1, "date": "2025-01-01", "activities": []}]}],
+}
+
+
+@pytest.fixture
+def trip_id(client):
+    return client.post("/trips/", json=TRIP).json()["id"]
+
+
+def test_patch_bumps_the_version(client, trip_id):
+    r = client.patch(f"/trips/{trip_id}", json={"version": 1, "title": "Coast and hills"})
+    assert r.status_code == 200
+    assert r.json()["version"] == 2
+    assert client.get(f"/trips/{trip_id}?fields=title").json()["title"] == "Coast and hills"
+
+
+def test_patch_with_a_stale_version_is_a_conflict(client, trip_id):
+    client.patch(f"/trips/{trip_id}", json={"version": 1, "title": "First"})
+    r = client.patch(f"/trips/{trip_id}", json={"version": 1, "title": "Second"})
+    assert r.status_code == 409
+    assert r.json()["detail"]["version"] == 2
+    assert client.get(f"/trips/{trip_id}?fields=title").json()["title"] == "First"
+
+
+def test_concurrent_writers_from_the_same_version(trip_id):
+    # both sessions read version 1 before either writes: the second write must fail
+    s1, s2 = SessionLocal(), SessionLocal()
+    try:
+        t1, t2 = get_trip_graph(s1, trip_id), get_trip_graph(s2, trip_id)
+        assert patch_trip(s1, t1, TripPatch(version=1, title="one"))["version"] == 2
+        with pytest.raises(TripVersionConflict) as e:
+            patch_trip(s2, t2, TripPatch(version=1, title="two"))
+        assert e.value.current_version == 2
+    finally:
+        s1.close()
+        s2.close()
+
+
+def test_patch_of_a_foreign_segment_is_rejected(client, trip_id):
+    r = client.patch(f"/trips/{trip_id}", json={"version": 1, "segments": [{"id": 999}]})
+    assert r.status_code == 422